@@ -478,7 +478,7 @@ class APIOptimizer:
 class RequestDeduplicator:
     """请求去重器"""
 
-    def def __init__(self):
+    def __init__(self):
         self.processing_requests = set()
         self.request_results = {}
         self.request_timestamps = {}
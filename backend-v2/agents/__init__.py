@@ -3,23 +3,35 @@
 方案A：集中式路由架构
 """
 
-from .base_agent import BaseVisualizationAgent
-from .mathematics_agent import MathematicsAgent
-from .astronomy_agent import AstronomyAgent
-from .physics_agent import PhysicsAgent
-from .router_manager import VisualizationRouter, SubjectClassifier
-from .template_engine import UnifiedTemplateEngine
-
-# 导出主要类
-__all__ = [
-    "BaseVisualizationAgent",
-    "MathematicsAgent",
-    "AstronomyAgent",
-    "PhysicsAgent",
-    "VisualizationRouter",
-    "SubjectClassifier",
-    "UnifiedTemplateEngine"
-]
-
-print("🤖 万物可视化 Agent 系统 v2.0 已加载")
-print("📋 架构: 方案A - 集中式路由架构")
\ No newline at end of file
+import importlib
+
+from services.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# 导出主要类（按需导入，避免加载包时导入所有Agent及numpy等依赖）
+_EXPORTS = {
+    "BaseVisualizationAgent": ".base_agent",
+    "MathematicsAgent": ".mathematics_agent",
+    "AstronomyAgent": ".astronomy_agent",
+    "PhysicsAgent": ".physics_agent",
+    "AgentRegistry": ".agent_registry",
+    "VisualizationRouter": ".router_manager",
+    "SubjectClassifier": ".router_manager",
+    "PromptAnalysis": ".prompt_analysis",
+    "UnifiedTemplateEngine": ".template_engine"
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+logger.debug("Agent 系统 v2.0 已加载", architecture="方案A - 集中式路由架构")
@@ -0,0 +1,105 @@
+"""
+万物可视化 v2.0 - 学科Agent注册表
+按学科登记Agent类的导入路径，首次使用时才导入模块并创建实例，
+避免启动时加载所有Agent及其依赖（numpy等）
+"""
+
+from typing import Dict, List, Optional, Any, Iterator
+from collections.abc import Mapping
+import importlib
+import threading
+
+from services.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# 学科 -> "模块:类名"
+DEFAULT_AGENTS: Dict[str, str] = {
+    "mathematics": "agents.mathematics_agent:MathematicsAgent",
+    "astronomy": "agents.astronomy_agent:AstronomyAgent",
+    "physics": "agents.physics_agent:PhysicsAgent",
+    "chemistry": "agents.chemistry_agent:ChemistryAgent",
+    "biology": "agents.biology_agent:BiologyAgent"
+}
+
+
+class AgentRegistry(Mapping):
+    """
+    延迟创建的Agent注册表
+
+    按字典方式使用：keys()、len()、in 只读取登记信息，
+    通过下标或 get() 访问某个学科时才创建对应的Agent。
+    """
+
+    def __init__(self, specs: Optional[Dict[str, str]] = None):
+        """
+        初始化注册表
+
+        Args:
+            specs: 学科到 "模块:类名" 的映射，默认为 DEFAULT_AGENTS
+        """
+        self._specs: Dict[str, str] = dict(DEFAULT_AGENTS if specs is None else specs)
+        self._instances: Dict[str, Any] = {}
+        self._template_engine = None
+        # 批量分类等在线程池中执行的代码也会访问注册表，创建实例时加锁，保证每个学科只创建一次
+        self._lock = threading.Lock()
+
+    def register(self, subject: str, spec: str) -> None:
+        """
+        登记学科Agent（已创建的旧实例会被替换）
+
+        Args:
+            subject: 学科
+            spec: "模块:类名"
+        """
+        self._specs[subject] = spec
+        self._instances.pop(subject, None)
+
+    def set_template_engine(self, template_engine) -> None:
+        """设置模板引擎：注入已创建的Agent，之后创建的Agent也会自动注入"""
+        with self._lock:
+            self._template_engine = template_engine
+            for agent in self._instances.values():
+                agent.template_engine = template_engine
+
+    def specs(self) -> Dict[str, str]:
+        """学科 -> "模块:类名" 登记信息（不创建Agent）"""
+        return dict(self._specs)
+
+    def loaded(self) -> List[str]:
+        """已创建实例的学科"""
+        return list(self._instances)
+
+    def __getitem__(self, subject: str):
+        agent = self._instances.get(subject)
+        if agent is None:
+            agent = self._create(subject)
+        return agent
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._specs)
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def __contains__(self, subject: object) -> bool:
+        return subject in self._specs
+
+    def _create(self, subject: str):
+        with self._lock:
+            agent = self._instances.get(subject)
+            if agent is None:
+                agent = self._instantiate(subject)
+        return agent
+
+    def _instantiate(self, subject: str):
+        spec = self._specs[subject]
+        module_name, _, class_name = spec.partition(":")
+        agent_class = getattr(importlib.import_module(module_name), class_name)
+
+        agent = agent_class()
+        if self._template_engine is not None:
+            agent.template_engine = self._template_engine
+        self._instances[subject] = agent
+        logger.info("学科Agent已创建", subject=subject)
+        return agent
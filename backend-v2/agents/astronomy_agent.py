@@ -4,11 +4,13 @@
 """
 
 from typing import Dict, List, Optional, Any
-import json
 import math
 import numpy as np
 from datetime import datetime, timedelta
 from .base_agent import BaseVisualizationAgent, VisualizationError, RequirementParseError
+from services.fast_json import dumps_str
+from services.deadline import Deadline, sample_count
+from .prompt_analysis import PromptAnalysis
 
 class AstronomyAgent(BaseVisualizationAgent):
     """天文学科可视化Agent"""
@@ -36,17 +38,26 @@ class AstronomyAgent(BaseVisualizationAgent):
             }
         })
 
-    async def parse_requirement(self, prompt: str) -> Dict[str, Any]:
+    async def parse_requirement(
+        self,
+        prompt: str,
+        deadline: Optional[Deadline] = None,
+        analysis: Optional[PromptAnalysis] = None
+    ) -> Dict[str, Any]:
         """
         解析天文需求
 
         Args:
             prompt: 用户输入的天文需求描述
+            deadline: 请求截止时间
+            analysis: 提示词分析结果（路由器传入时复用其归一化文本、数字和关键词命中）
 
         Returns:
             Dict: 解析后的天文需求结构
         """
         try:
+            analysis = self._analyze(prompt, analysis)
+
             requirement = {
                 "subject": "astronomy",
                 "original": prompt,
@@ -81,7 +92,7 @@ class AstronomyAgent(BaseVisualizationAgent):
             }
 
             for pattern, obj_type in object_patterns.items():
-                if pattern in prompt:
+                if analysis.mentions(pattern):
                     requirement["objects"].append(obj_type)
 
             # 2. 识别天文现象
@@ -102,7 +113,7 @@ class AstronomyAgent(BaseVisualizationAgent):
             }
 
             for pattern, phen_type in phenomenon_patterns.items():
-                if pattern in prompt:
+                if analysis.mentions(pattern):
                     requirement["phenomena"].append(phen_type)
 
             # 3. 识别概念类型
@@ -146,12 +157,12 @@ class AstronomyAgent(BaseVisualizationAgent):
             # 5. 地理位置提取
             location_patterns = ["北京", "上海", "纽约", "伦敦", "东京", "北极", "南极", "赤道"]
             for location in location_patterns:
-                if location in prompt:
+                if analysis.mentions(location):
                     requirement["region"] = location
                     break
 
             # 6. 数值参数提取
-            numbers = self._extract_numbers(prompt)
+            numbers = list(analysis.numbers)
             if numbers:
                 requirement["numbers"] = numbers
 
@@ -169,19 +180,20 @@ class AstronomyAgent(BaseVisualizationAgent):
             all_keywords.extend(time_patterns.keys())
             all_keywords.extend(location_patterns)
 
-            requirement["keywords"] = self._extract_keywords(prompt, all_keywords)
+            requirement["keywords"] = self._extract_keywords(analysis, all_keywords)
 
             return requirement
 
         except Exception as e:
             raise RequirementParseError(f"天文需求解析失败: {str(e)}")
 
-    async def match_template(self, requirement: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def match_template(self, requirement: Dict[str, Any], deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
         """
         匹配天文模板
 
         Args:
             requirement: 解析后的天文需求
+            deadline: 请求截止时间
 
         Returns:
             Dict: 匹配的模板配置
@@ -226,7 +238,7 @@ class AstronomyAgent(BaseVisualizationAgent):
         except Exception as e:
             raise VisualizationError(f"模板匹配失败: {str(e)}")
 
-    async def generate_config(self, requirement: Dict[str, Any], template: Dict[str, Any], user_preferences: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_config(self, requirement: Dict[str, Any], template: Dict[str, Any], user_preferences: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         生成天文可视化配置
 
@@ -234,6 +246,7 @@ class AstronomyAgent(BaseVisualizationAgent):
             requirement: 天文需求
             template: 匹配的模板
             user_preferences: 用户偏好
+            deadline: 请求截止时间
 
         Returns:
             Dict: 可视化配置
@@ -287,19 +300,20 @@ class AstronomyAgent(BaseVisualizationAgent):
         except Exception as e:
             raise VisualizationError(f"配置生成失败: {str(e)}")
 
-    async def generate_visualization(self, config: Dict[str, Any]) -> str:
+    async def generate_visualization(self, config: Dict[str, Any], deadline: Optional[Deadline] = None) -> str:
         """
         生成天文可视化HTML
 
         Args:
             config: 可视化配置
+            deadline: 请求截止时间
 
         Returns:
             str: HTML内容
         """
         try:
-            # 优先使用模板引擎
-            if hasattr(self, 'template_engine') and self.template_engine:
+            # 优先使用模板引擎（降级渲染时直接使用内置模板）
+            if hasattr(self, 'template_engine') and self.template_engine and not config.get("degraded"):
                 template_id = config.get("template_id", "default")
 
                 # 准备渲染配置
@@ -344,9 +358,9 @@ class AstronomyAgent(BaseVisualizationAgent):
 
             # 使用安全的字符串替换，避免与CSS花括号冲突
             html_content = template_content.replace("__TITLE__", str(config["title"]))
-            html_content = html_content.replace("__PLOTLY_CONFIG__", json.dumps(plotly_config, ensure_ascii=False))
-            html_content = html_content.replace("__PARAMETERS__", json.dumps(config["parameters"], ensure_ascii=False))
-            html_content = html_content.replace("__DATA__", json.dumps(data, ensure_ascii=False))
+            html_content = html_content.replace("__PLOTLY_CONFIG__", dumps_str(plotly_config))
+            html_content = html_content.replace("__PARAMETERS__", dumps_str(config["parameters"]))
+            html_content = html_content.replace("__DATA__", dumps_str(data))
 
             return html_content
 
@@ -401,7 +415,7 @@ class AstronomyAgent(BaseVisualizationAgent):
 
             for planet in planets_data:
                 # 生成轨道点
-                theta = np.linspace(0, 2*np.pi, 100)
+                theta = np.linspace(0, 2*np.pi, sample_count(config, 100))
                 r = planet["a"]
                 x = r * np.cos(theta)
                 y = r * np.sin(theta)
@@ -409,9 +423,9 @@ class AstronomyAgent(BaseVisualizationAgent):
 
                 data["orbits"].append({
                     "name": planet["name"],
-                    "x": x.tolist(),
-                    "y": y.tolist(),
-                    "z": z.tolist(),
+                    "x": x,
+                    "y": y,
+                    "z": z,
                     "color": planet["color"]
                 })
 
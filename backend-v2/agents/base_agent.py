@@ -6,13 +6,19 @@
 from abc import ABC, abstractmethod
 from typing import Dict, List, Optional, Any, Union
 import json
-import re
 import uuid
 from datetime import datetime
 
+from services.deadline import Deadline
+from .prompt_analysis import PromptAnalysis, extract_numbers
+from .concept_matcher import ConceptMatcher, ConceptHits
+
 class BaseVisualizationAgent(ABC):
     """可视化Agent基类 - 方案A核心组件"""
 
+    # 概念词表匹配器（使用概念词表的Agent在构造时编译）
+    concept_matcher: Optional[ConceptMatcher] = None
+
     def __init__(self, subject: str, config: Dict[str, Any]):
         """
         初始化Agent
@@ -28,12 +34,19 @@ class BaseVisualizationAgent(ABC):
         self.agent_id = str(uuid.uuid4())
 
     @abstractmethod
-    async def parse_requirement(self, prompt: str) -> Dict[str, Any]:
+    async def parse_requirement(
+        self,
+        prompt: str,
+        deadline: Optional[Deadline] = None,
+        analysis: Optional[PromptAnalysis] = None
+    ) -> Dict[str, Any]:
         """
         解析学科特定需求
 
         Args:
             prompt: 用户输入的自然语言描述
+            deadline: 请求截止时间（剩余预算不足时应改走廉价路径）
+            analysis: 路由器已完成的提示词分析（归一化文本、数字、关键词命中），应直接复用
 
         Returns:
             Dict: 解析后的结构化需求
@@ -41,12 +54,13 @@ class BaseVisualizationAgent(ABC):
         pass
 
     @abstractmethod
-    async def match_template(self, requirement: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def match_template(self, requirement: Dict[str, Any], deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
         """
         匹配学科特定模板
 
         Args:
             requirement: 解析后的需求结构
+            deadline: 请求截止时间（剩余预算不足时跳过耗时的模板搜索）
 
         Returns:
             Dict: 匹配的模板配置，如果没有匹配则返回None
@@ -54,7 +68,13 @@ class BaseVisualizationAgent(ABC):
         pass
 
     @abstractmethod
-    async def generate_config(self, requirement: Dict[str, Any], template: Dict[str, Any], user_preferences: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_config(
+        self,
+        requirement: Dict[str, Any],
+        template: Dict[str, Any],
+        user_preferences: Dict[str, Any],
+        deadline: Optional[Deadline] = None
+    ) -> Dict[str, Any]:
         """
         生成可视化配置
 
@@ -62,6 +82,7 @@ class BaseVisualizationAgent(ABC):
             requirement: 需求结构
             template: 模板配置
             user_preferences: 用户偏好
+            deadline: 请求截止时间
 
         Returns:
             Dict: 最终的可视化配置
@@ -69,12 +90,16 @@ class BaseVisualizationAgent(ABC):
         pass
 
     @abstractmethod
-    async def generate_visualization(self, config: Dict[str, Any]) -> str:
+    async def generate_visualization(self, config: Dict[str, Any], deadline: Optional[Deadline] = None) -> str:
         """
         生成可视化HTML
 
+        配置中 degraded 为真或剩余预算不足时，应使用内置默认模板，
+        并按 sampling 比例减少数据点数（见 services.deadline.sample_count）
+
         Args:
             config: 可视化配置
+            deadline: 请求截止时间
 
         Returns:
             str: 生成的HTML内容
@@ -91,6 +116,15 @@ class BaseVisualizationAgent(ABC):
         """
         pass
 
+    def default_template(self) -> Dict[str, Any]:
+        """
+        内置默认模板（降级路径和未匹配到模板时使用，不访问模板引擎）
+
+        Returns:
+            Dict: 模板配置
+        """
+        return {"id": "default", "name": "默认模板"}
+
     def _load_templates(self) -> Dict[str, Any]:
         """
         加载学科模板 (可被子类重写)
@@ -109,6 +143,59 @@ class BaseVisualizationAgent(ABC):
         """
         return {}
 
+    def _analyze(self, prompt: str, analysis: Optional[PromptAnalysis] = None) -> PromptAnalysis:
+        """
+        获取提示词分析结果：复用路由器传入的分析，单独调用时现场分析（不含学科关键词命中）
+
+        Args:
+            prompt: 用户输入
+            analysis: 路由器已完成的分析
+
+        Returns:
+            PromptAnalysis: 分析结果
+        """
+        return analysis if analysis is not None else PromptAnalysis(prompt)
+
+    def _scan_concepts(self, prompt: str, analysis: Optional[PromptAnalysis] = None) -> ConceptHits:
+        """
+        对完整提示词扫描一次概念词表
+
+        Args:
+            prompt: 用户输入（可含调用方附加的标注）
+            analysis: 提示词分析结果（针对同一文本时复用其小写文本）
+
+        Returns:
+            ConceptHits: 各类别命中的概念
+        """
+        text = analysis.text if analysis is not None and analysis.original == prompt else None
+        return self.concept_matcher.scan(prompt, text)
+
+    def _first_concept_in_analysis(
+        self,
+        prompt: str,
+        analysis: PromptAnalysis,
+        hits: ConceptHits,
+        category: str
+    ) -> Optional[Any]:
+        """
+        只在分析覆盖的用户输入范围内取类别的第一个命中概念
+
+        路由器的分析可不含调用方附加在提示词末尾的标注，此时只统计落在原始输入内的命中，
+        不必再扫描一次
+
+        Args:
+            prompt: 用户输入（可含调用方附加的标注）
+            analysis: 提示词分析结果
+            hits: 完整提示词的扫描结果
+            category: 类别
+
+        Returns:
+            Any: 第一个命中的概念，无命中时返回None
+        """
+        if prompt.startswith(analysis.original):
+            return hits.first(category, within=len(analysis.text))
+        return self.concept_matcher.scan(analysis.original, analysis.text).first(category)
+
     def _extract_numbers(self, text: str) -> List[float]:
         """
         从文本中提取数字
@@ -119,22 +206,21 @@ class BaseVisualizationAgent(ABC):
         Returns:
             List[float]: 提取的数字列表
         """
-        # 匹配整数、小数、负数、科学计数法
-        pattern = r'[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?'
-        numbers = re.findall(pattern, text)
-        return [float(num) for num in numbers]
+        return extract_numbers(text)
 
-    def _extract_keywords(self, text: str, keywords: List[str]) -> List[str]:
+    def _extract_keywords(self, text: Union[str, PromptAnalysis], keywords: List[str]) -> List[str]:
         """
         从文本中提取关键词
 
         Args:
-            text: 输入文本
+            text: 输入文本，或提示词分析结果（已扫描的关键词直接查命中集合）
             keywords: 关键词列表
 
         Returns:
             List[str]: 匹配的关键词
         """
+        if isinstance(text, PromptAnalysis):
+            return text.matched(keywords)
         text_lower = text.lower()
         matched = []
         for keyword in keywords:
@@ -7,6 +7,122 @@ from typing import Dict, List, Optional, Any, Union
 import json
 import re
 from agents.base_agent import BaseVisualizationAgent
+from services.deadline import Deadline
+from agents.prompt_analysis import PromptAnalysis
+from agents.concept_matcher import ConceptMatcher, ConceptHits, MATCH_LOWER, MATCH_EXACT
+
+# 人体系统 -> 关键词
+BODY_SYSTEMS = {
+    "循环系统": ["循环系统", "心血管", "heart", "blood", "circulatory"],
+    "呼吸系统": ["呼吸系统", "肺", "lung", "respiratory"],
+    "消化系统": ["消化系统", "胃", "肠", "digestive"],
+    "神经系统": ["神经系统", "神经", "大脑", "nervous", "brain"],
+    "内分泌系统": ["内分泌", "激素", "endocrine", "hormone"],
+    "骨骼系统": ["骨骼", "骨头", "skeletal", "bone"],
+    "肌肉系统": ["肌肉", "muscular", "muscle"]
+}
+
+# 生物概念词表：类别 -> [(概念, 匹配方式, 关键词)]，构造Agent时编译为一个匹配器；
+# 同一类别内按声明顺序输出概念（visualization_type、grade_level、detail_level 取第一个命中）
+CONCEPT_VOCABULARY = {
+    "visualization_type": [
+        ("cell_structure", MATCH_LOWER, ["细胞", "细胞结构", "cell", "cell structure"]),
+        ("dna_structure", MATCH_LOWER, ["DNA", "双螺旋", "遗传物质", "脱氧核糖核酸"]),
+        ("protein_synthesis", MATCH_LOWER, ["蛋白质", "protein", "合成", "translation"]),
+        ("photosynthesis", MATCH_LOWER, ["光合作用", "photosynthesis", "植物", "叶绿体"]),
+        ("cell_respiration", MATCH_LOWER, ["呼吸作用", "respiration", "细胞呼吸", "有氧呼吸"]),
+        ("genetics_inheritance", MATCH_LOWER, ["遗传", "基因", "gene", "genetics", "孟德尔"]),
+        ("ecosystem_food_chain", MATCH_LOWER, ["生态", "食物链", "ecosystem", "food chain", "生产者"]),
+        ("human_body_systems", MATCH_LOWER, ["人体", "器官", "系统", "human body", "organ system"]),
+        ("evolution_tree", MATCH_LOWER, ["进化", "evolution", "达尔文", "物种起源"]),
+        ("plant_structure", MATCH_LOWER, ["植物", "plant", "根", "茎", "叶", "花", "果实"])
+    ],
+    "grade_level": [
+        ("middle_school", MATCH_EXACT, ["初中", "基础", "简单"]),
+        ("high_school", MATCH_EXACT, ["高中", "进阶", "复杂"]),
+        ("university", MATCH_EXACT, ["大学", "专业", "研究"])
+    ],
+    "cell": [
+        # 细胞类型
+        ("animal_cell", MATCH_EXACT, ["动物细胞", "animal cell"]),
+        ("plant_cell", MATCH_EXACT, ["植物细胞", "plant cell"]),
+        ("prokaryotic_cell", MATCH_EXACT, ["细菌", "bacteria", "原核细胞"]),
+        # 细胞器
+        ("nucleus", MATCH_EXACT, ["细胞核", "nucleus"]),
+        ("mitochondria", MATCH_EXACT, ["线粒体", "mitochondria"]),
+        ("chloroplast", MATCH_EXACT, ["叶绿体", "chloroplast"]),
+        ("ribosome", MATCH_EXACT, ["核糖体", "ribosome"]),
+        ("endoplasmic_reticulum", MATCH_EXACT, ["内质网", "endoplasmic reticulum", "ER"]),
+        ("golgi_apparatus", MATCH_EXACT, ["高尔基体", "golgi apparatus", "golgi body"]),
+        ("lysosome", MATCH_EXACT, ["溶酶体", "lysosome"]),
+        ("vacuole", MATCH_EXACT, ["液泡", "vacuole"])
+    ],
+    "dna": [
+        ("double_helix", MATCH_EXACT, ["双螺旋", "double helix"]),
+        ("replication", MATCH_EXACT, ["复制", "replication"]),
+        ("transcription", MATCH_EXACT, ["转录", "transcription"]),
+        ("base_pairs", MATCH_EXACT, ["碱基", "base", "ATCG"])
+    ],
+    "protein": [
+        ("translation", MATCH_EXACT, ["翻译", "translation"]),
+        ("amino_acids", MATCH_EXACT, ["氨基酸", "amino acid"]),
+        ("protein_folding", MATCH_EXACT, ["折叠", "folding"]),
+        ("enzyme", MATCH_EXACT, ["酶", "enzyme"])
+    ],
+    "photosynthesis": [
+        ("light_reactions", MATCH_EXACT, ["光反应", "light reactions"]),
+        ("dark_reactions", MATCH_EXACT, ["暗反应", "dark reactions", "calvin cycle"]),
+        ("chlorophyll", MATCH_EXACT, ["叶绿素", "chlorophyll"]),
+        ("carbon_dioxide", MATCH_EXACT, ["二氧化碳", "CO2"]),
+        ("oxygen", MATCH_EXACT, ["氧气", "O2"])
+    ],
+    "respiration": [
+        ("aerobic_respiration", MATCH_EXACT, ["有氧呼吸", "aerobic respiration"]),
+        ("anaerobic_respiration", MATCH_EXACT, ["无氧呼吸", "anaerobic respiration"]),
+        ("glycolysis", MATCH_EXACT, ["糖酵解", "glycolysis"]),
+        ("citric_acid_cycle", MATCH_EXACT, ["三羧酸循环", "citric acid cycle", "Krebs cycle"]),
+        ("electron_transport", MATCH_EXACT, ["电子传递链", "electron transport chain"])
+    ],
+    "genetics": [
+        ("mendelian_genetics", MATCH_EXACT, ["孟德尔", "Mendel", "遗传定律"]),
+        ("dominant", MATCH_EXACT, ["显性", "dominant"]),
+        ("recessive", MATCH_EXACT, ["隐性", "recessive"]),
+        ("genotype", MATCH_EXACT, ["基因型", "genotype"]),
+        ("phenotype", MATCH_EXACT, ["表现型", "phenotype"]),
+        ("mutation", MATCH_EXACT, ["突变", "mutation"])
+    ],
+    "ecosystem": [
+        ("producer", MATCH_EXACT, ["生产者", "producer"]),
+        ("consumer", MATCH_EXACT, ["消费者", "consumer"]),
+        ("decomposer", MATCH_EXACT, ["分解者", "decomposer"]),
+        ("food_chain", MATCH_EXACT, ["食物链", "food chain"]),
+        ("food_web", MATCH_EXACT, ["食物网", "food web"])
+    ],
+    "body_systems": [
+        (system.lower().replace("系统", ""), MATCH_EXACT, keywords) for system, keywords in BODY_SYSTEMS.items()
+    ],
+    "evolution": [
+        ("natural_selection", MATCH_EXACT, ["自然选择", "natural selection"]),
+        ("adaptation", MATCH_EXACT, ["适应性", "adaptation"]),
+        ("speciation", MATCH_EXACT, ["物种", "species"]),
+        ("common_ancestor", MATCH_EXACT, ["共同祖先", "common ancestor"])
+    ],
+    "plant": [
+        ("根", MATCH_EXACT, ["根", "root"]),
+        ("茎", MATCH_EXACT, ["茎", "stem"]),
+        ("叶", MATCH_EXACT, ["叶", "leaf"]),
+        ("花", MATCH_EXACT, ["花", "flower"]),
+        ("果实", MATCH_EXACT, ["果实", "fruit"]),
+        ("种子", MATCH_EXACT, ["种子", "seed"])
+    ],
+    "render_3d": [("3d", MATCH_EXACT, ["3D", "三维", "立体"])],
+    "animation": [("animation", MATCH_EXACT, ["动画", "动态", "animation", "过程"])],
+    "interactive": [("interactive", MATCH_EXACT, ["交互", "interactive", "点击", "hover"])],
+    "detail_level": [
+        ("high", MATCH_EXACT, ["详细", "detail", "深入"]),
+        ("low", MATCH_EXACT, ["简单", "基础", "basic"])
+    ]
+}
 
 class BiologyAgent(BaseVisualizationAgent):
     """生物学科可视化Agent"""
@@ -48,85 +164,67 @@ class BiologyAgent(BaseVisualizationAgent):
             default_config.update(config)
 
         super().__init__("biology", default_config)
-
-    async def parse_requirement(self, prompt: str) -> Dict[str, Any]:
+        self.concept_matcher = ConceptMatcher(CONCEPT_VOCABULARY)
+
+    async def parse_requirement(
+        self,
+        prompt: str,
+        deadline: Optional[Deadline] = None,
+        analysis: Optional[PromptAnalysis] = None
+    ) -> Dict[str, Any]:
         """
         解析生物学科需求
 
         Args:
             prompt: 用户输入的自然语言描述
+            deadline: 请求截止时间
+            analysis: 提示词分析结果（路由器传入时复用其归一化文本、数字和关键词命中）
 
         Returns:
             Dict: 解析后的结构化需求
         """
+        # 概念词表只扫描一次，各提取函数复用扫描结果
+        analysis = self._analyze(prompt, analysis)
+        hits = self._scan_concepts(prompt, analysis)
+
         requirement = {
             "subject": "biology",
-            "grade_level": self._detect_grade_level(prompt),
+            "grade_level": self._detect_grade_level(prompt, hits),
             "visualization_type": None,
             "concepts": [],
             "parameters": {},
             "difficulty": "intermediate"
         }
 
-        # 识别可视化类型
-        prompt_lower = prompt.lower()
-
-        if any(keyword in prompt_lower for keyword in ["细胞", "细胞结构", "cell", "cell structure"]):
-            requirement["visualization_type"] = "cell_structure"
-            requirement["concepts"] = self._extract_cell_concepts(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["DNA", "双螺旋", "遗传物质", "脱氧核糖核酸"]):
-            requirement["visualization_type"] = "dna_structure"
-            requirement["concepts"] = self._extract_dna_concepts(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["蛋白质", "protein", "合成", "translation"]):
-            requirement["visualization_type"] = "protein_synthesis"
-            requirement["concepts"] = self._extract_protein_concepts(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["光合作用", "photosynthesis", "植物", "叶绿体"]):
-            requirement["visualization_type"] = "photosynthesis"
-            requirement["concepts"] = self._extract_photosynthesis_concepts(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["呼吸作用", "respiration", "细胞呼吸", "有氧呼吸"]):
-            requirement["visualization_type"] = "cell_respiration"
-            requirement["concepts"] = self._extract_respiration_concepts(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["遗传", "基因", "gene", "genetics", "孟德尔"]):
-            requirement["visualization_type"] = "genetics_inheritance"
-            requirement["concepts"] = self._extract_genetics_concepts(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["生态", "食物链", "ecosystem", "food chain", "生产者"]):
-            requirement["visualization_type"] = "ecosystem_food_chain"
-            requirement["concepts"] = self._extract_ecosystem_concepts(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["人体", "器官", "系统", "human body", "organ system"]):
-            requirement["visualization_type"] = "human_body_systems"
-            requirement["concepts"] = self._extract_body_systems_concepts(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["进化", "evolution", "达尔文", "物种起源"]):
-            requirement["visualization_type"] = "evolution_tree"
-            requirement["concepts"] = self._extract_evolution_concepts(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["植物", "plant", "根", "茎", "叶", "花", "果实"]):
-            requirement["visualization_type"] = "plant_structure"
-            requirement["concepts"] = self._extract_plant_concepts(prompt)
-
-        else:
-            # 默认为细胞结构
-            requirement["visualization_type"] = "cell_structure"
-            requirement["concepts"] = self._extract_cell_concepts(prompt)
+        # 识别可视化类型（按用户输入的小写文本，词表声明顺序即优先级；默认为细胞结构）
+        viz_type = self._first_concept_in_analysis(prompt, analysis, hits, "visualization_type") or "cell_structure"
+        extractors = {
+            "cell_structure": self._extract_cell_concepts,
+            "dna_structure": self._extract_dna_concepts,
+            "protein_synthesis": self._extract_protein_concepts,
+            "photosynthesis": self._extract_photosynthesis_concepts,
+            "cell_respiration": self._extract_respiration_concepts,
+            "genetics_inheritance": self._extract_genetics_concepts,
+            "ecosystem_food_chain": self._extract_ecosystem_concepts,
+            "human_body_systems": self._extract_body_systems_concepts,
+            "evolution_tree": self._extract_evolution_concepts,
+            "plant_structure": self._extract_plant_concepts
+        }
+        requirement["visualization_type"] = viz_type
+        requirement["concepts"] = extractors[viz_type](prompt, hits)
 
         # 提取参数
-        requirement["parameters"] = self._extract_parameters(prompt, requirement["visualization_type"])
+        requirement["parameters"] = self._extract_parameters(prompt, requirement["visualization_type"], hits)
 
         return requirement
 
-    async def match_template(self, requirement: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def match_template(self, requirement: Dict[str, Any], deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
         """
         匹配生物学科模板
 
         Args:
             requirement: 解析后的需求结构
+            deadline: 请求截止时间
 
         Returns:
             Dict: 匹配的模板配置
@@ -180,234 +278,70 @@ class BiologyAgent(BaseVisualizationAgent):
             ]
         }
 
-    def _detect_grade_level(self, prompt: str) -> str:
+    def _detect_grade_level(self, prompt: str, hits: Optional[ConceptHits] = None) -> str:
         """检测年级水平"""
-        if any(keyword in prompt for keyword in ["初中", "基础", "简单"]):
-            return "middle_school"
-        elif any(keyword in prompt for keyword in ["高中", "进阶", "复杂"]):
-            return "high_school"
-        elif any(keyword in prompt for keyword in ["大学", "专业", "研究"]):
-            return "university"
-        return "high_school"
-
-    def _extract_cell_concepts(self, prompt: str) -> List[str]:
-        """提取细胞相关概念"""
-        concepts = []
-
-        # 检测细胞类型
-        if any(keyword in prompt for keyword in ["动物细胞", "animal cell"]):
-            concepts.append("animal_cell")
-        if any(keyword in prompt for keyword in ["植物细胞", "plant cell"]):
-            concepts.append("plant_cell")
-        if any(keyword in prompt for keyword in ["细菌", "bacteria", "原核细胞"]):
-            concepts.append("prokaryotic_cell")
-
-        # 检测细胞器
-        organelles = ["nucleus", "mitochondria", "chloroplast", "ribosome",
-                     "endoplasmic_reticulum", "golgi_apparatus", "lysosome", "vacuole"]
-
-        organelle_keywords = {
-            "nucleus": ["细胞核", "nucleus"],
-            "mitochondria": ["线粒体", "mitochondria"],
-            "chloroplast": ["叶绿体", "chloroplast"],
-            "ribosome": ["核糖体", "ribosome"],
-            "endoplasmic_reticulum": ["内质网", "endoplasmic reticulum", "ER"],
-            "golgi_apparatus": ["高尔基体", "golgi apparatus", "golgi body"],
-            "lysosome": ["溶酶体", "lysosome"],
-            "vacuole": ["液泡", "vacuole"]
-        }
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.first("grade_level") or "high_school"
 
-        for organelle, keywords in organelle_keywords.items():
-            if any(keyword in prompt for keyword in keywords):
-                concepts.append(organelle)
-
-        return concepts if concepts else ["animal_cell", "nucleus"]
+    def _extract_cell_concepts(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
+        """提取细胞相关概念"""
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("cell") or ["animal_cell", "nucleus"]
 
-    def _extract_dna_concepts(self, prompt: str) -> List[str]:
+    def _extract_dna_concepts(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
         """提取DNA相关概念"""
-        concepts = []
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("dna") or ["double_helix", "base_pairs"]
 
-        if any(keyword in prompt for keyword in ["双螺旋", "double helix"]):
-            concepts.append("double_helix")
-        if any(keyword in prompt for keyword in ["复制", "replication"]):
-            concepts.append("replication")
-        if any(keyword in prompt for keyword in ["转录", "transcription"]):
-            concepts.append("transcription")
-        if any(keyword in prompt for keyword in ["碱基", "base", "ATCG"]):
-            concepts.append("base_pairs")
-
-        return concepts if concepts else ["double_helix", "base_pairs"]
-
-    def _extract_protein_concepts(self, prompt: str) -> List[str]:
+    def _extract_protein_concepts(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
         """提取蛋白质相关概念"""
-        concepts = []
-
-        if any(keyword in prompt for keyword in ["翻译", "translation"]):
-            concepts.append("translation")
-        if any(keyword in prompt for keyword in ["氨基酸", "amino acid"]):
-            concepts.append("amino_acids")
-        if any(keyword in prompt for keyword in ["折叠", "folding"]):
-            concepts.append("protein_folding")
-        if any(keyword in prompt for keyword in ["酶", "enzyme"]):
-            concepts.append("enzyme")
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("protein") or ["translation", "amino_acids"]
 
-        return concepts if concepts else ["translation", "amino_acids"]
-
-    def _extract_photosynthesis_concepts(self, prompt: str) -> List[str]:
+    def _extract_photosynthesis_concepts(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
         """提取光合作用相关概念"""
-        concepts = []
-
-        if any(keyword in prompt for keyword in ["光反应", "light reactions"]):
-            concepts.append("light_reactions")
-        if any(keyword in prompt for keyword in ["暗反应", "dark reactions", "calvin cycle"]):
-            concepts.append("dark_reactions")
-        if any(keyword in prompt for keyword in ["叶绿素", "chlorophyll"]):
-            concepts.append("chlorophyll")
-        if any(keyword in prompt for keyword in ["二氧化碳", "CO2"]):
-            concepts.append("carbon_dioxide")
-        if any(keyword in prompt for keyword in ["氧气", "O2"]):
-            concepts.append("oxygen")
-
-        return concepts if concepts else ["light_reactions", "dark_reactions"]
-
-    def _extract_respiration_concepts(self, prompt: str) -> List[str]:
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("photosynthesis") or ["light_reactions", "dark_reactions"]
+
+    def _extract_respiration_concepts(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
         """提取呼吸作用相关概念"""
-        concepts = []
-
-        if any(keyword in prompt for keyword in ["有氧呼吸", "aerobic respiration"]):
-            concepts.append("aerobic_respiration")
-        if any(keyword in prompt for keyword in ["无氧呼吸", "anaerobic respiration"]):
-            concepts.append("anaerobic_respiration")
-        if any(keyword in prompt for keyword in ["糖酵解", "glycolysis"]):
-            concepts.append("glycolysis")
-        if any(keyword in prompt for keyword in ["三羧酸循环", "citric acid cycle", "Krebs cycle"]):
-            concepts.append("citric_acid_cycle")
-        if any(keyword in prompt for keyword in ["电子传递链", "electron transport chain"]):
-            concepts.append("electron_transport")
-
-        return concepts if concepts else ["aerobic_respiration"]
-
-    def _extract_genetics_concepts(self, prompt: str) -> List[str]:
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("respiration") or ["aerobic_respiration"]
+
+    def _extract_genetics_concepts(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
         """提取遗传学相关概念"""
-        concepts = []
-
-        if any(keyword in prompt for keyword in ["孟德尔", "Mendel", "遗传定律"]):
-            concepts.append("mendelian_genetics")
-        if any(keyword in prompt for keyword in ["显性", "dominant"]):
-            concepts.append("dominant")
-        if any(keyword in prompt for keyword in ["隐性", "recessive"]):
-            concepts.append("recessive")
-        if any(keyword in prompt for keyword in ["基因型", "genotype"]):
-            concepts.append("genotype")
-        if any(keyword in prompt for keyword in ["表现型", "phenotype"]):
-            concepts.append("phenotype")
-        if any(keyword in prompt for keyword in ["突变", "mutation"]):
-            concepts.append("mutation")
-
-        return concepts if concepts else ["mendelian_genetics"]
-
-    def _extract_ecosystem_concepts(self, prompt: str) -> List[str]:
-        """提取生态系统相关概念"""
-        concepts = []
-
-        if any(keyword in prompt for keyword in ["生产者", "producer"]):
-            concepts.append("producer")
-        if any(keyword in prompt for keyword in ["消费者", "consumer"]):
-            concepts.append("consumer")
-        if any(keyword in prompt for keyword in ["分解者", "decomposer"]):
-            concepts.append("decomposer")
-        if any(keyword in prompt for keyword in ["食物链", "food chain"]):
-            concepts.append("food_chain")
-        if any(keyword in prompt for keyword in ["食物网", "food web"]):
-            concepts.append("food_web")
-
-        return concepts if concepts else ["food_chain", "producer", "consumer"]
-
-    def _extract_body_systems_concepts(self, prompt: str) -> List[str]:
-        """提取人体系统相关概念"""
-        concepts = []
-
-        systems = {
-            "循环系统": ["循环系统", "心血管", "heart", "blood", "circulatory"],
-            "呼吸系统": ["呼吸系统", "肺", "lung", "respiratory"],
-            "消化系统": ["消化系统", "胃", "肠", "digestive"],
-            "神经系统": ["神经系统", "神经", "大脑", "nervous", "brain"],
-            "内分泌系统": ["内分泌", "激素", "endocrine", "hormone"],
-            "骨骼系统": ["骨骼", "骨头", "skeletal", "bone"],
-            "肌肉系统": ["肌肉", "muscular", "muscle"]
-        }
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("genetics") or ["mendelian_genetics"]
 
-        for system, keywords in systems.items():
-            if any(keyword in prompt for keyword in keywords):
-                concepts.append(system.lower().replace("系统", ""))
+    def _extract_ecosystem_concepts(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
+        """提取生态系统相关概念"""
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("ecosystem") or ["food_chain", "producer", "consumer"]
 
-        return concepts if concepts else ["循环系统", "呼吸系统"]
+    def _extract_body_systems_concepts(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
+        """提取人体系统相关概念"""
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("body_systems") or ["循环系统", "呼吸系统"]
 
-    def _extract_evolution_concepts(self, prompt: str) -> List[str]:
+    def _extract_evolution_concepts(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
         """提取进化相关概念"""
-        concepts = []
-
-        if any(keyword in prompt for keyword in ["自然选择", "natural selection"]):
-            concepts.append("natural_selection")
-        if any(keyword in prompt for keyword in ["适应性", "adaptation"]):
-            concepts.append("adaptation")
-        if any(keyword in prompt for keyword in ["物种", "species"]):
-            concepts.append("speciation")
-        if any(keyword in prompt for keyword in ["共同祖先", "common ancestor"]):
-            concepts.append("common_ancestor")
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("evolution") or ["natural_selection", "evolution"]
 
-        return concepts if concepts else ["natural_selection", "evolution"]
-
-    def _extract_plant_concepts(self, prompt: str) -> List[str]:
+    def _extract_plant_concepts(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
         """提取植物相关概念"""
-        concepts = []
-
-        plant_parts = {
-            "根": ["根", "root"],
-            "茎": ["茎", "stem"],
-            "叶": ["叶", "leaf"],
-            "花": ["花", "flower"],
-            "果实": ["果实", "fruit"],
-            "种子": ["种子", "seed"]
-        }
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("plant") or ["根", "茎", "叶", "花"]
 
-        for part, keywords in plant_parts.items():
-            if any(keyword in prompt for keyword in keywords):
-                concepts.append(part)
-
-        return concepts if concepts else ["根", "茎", "叶", "花"]
-
-    def _extract_parameters(self, prompt: str, viz_type: str) -> Dict[str, Any]:
+    def _extract_parameters(self, prompt: str, viz_type: str, hits: Optional[ConceptHits] = None) -> Dict[str, Any]:
         """提取可视化参数"""
-        params = {}
-
-        # 检测3D需求
-        if any(keyword in prompt for keyword in ["3D", "三维", "立体"]):
-            params["render_mode"] = "3d"
-        else:
-            params["render_mode"] = "2d"
-
-        # 检测动画需求
-        if any(keyword in prompt for keyword in ["动画", "动态", "animation", "过程"]):
-            params["animation"] = True
-        else:
-            params["animation"] = False
-
-        # 检测交互需求
-        if any(keyword in prompt for keyword in ["交互", "interactive", "点击", "hover"]):
-            params["interactive"] = True
-        else:
-            params["interactive"] = False
-
-        # 检测详细程度
-        if any(keyword in prompt for keyword in ["详细", "detail", "深入"]):
-            params["detail_level"] = "high"
-        elif any(keyword in prompt for keyword in ["简单", "基础", "basic"]):
-            params["detail_level"] = "low"
-        else:
-            params["detail_level"] = "medium"
-
-        return params
+        hits = hits or self.concept_matcher.scan(prompt)
+        return {
+            "render_mode": "3d" if hits.has("render_3d") else "2d",  # 检测3D需求
+            "animation": hits.has("animation"),                       # 检测动画需求
+            "interactive": hits.has("interactive"),                   # 检测交互需求
+            "detail_level": hits.first("detail_level") or "medium"    # 检测详细程度
+        }
 
     def _concept_match(self, user_concepts: List[str], template_concepts: List[str]) -> bool:
         """检查概念匹配度"""
@@ -527,7 +461,7 @@ class BiologyAgent(BaseVisualizationAgent):
             "concepts": concepts
         }
 
-    async def generate_config(self, requirement: Dict[str, Any], template: Dict[str, Any], user_preferences: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_config(self, requirement: Dict[str, Any], template: Dict[str, Any], user_preferences: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         生成生物可视化配置
 
@@ -535,6 +469,7 @@ class BiologyAgent(BaseVisualizationAgent):
             requirement: 生物需求
             template: 匹配的模板
             user_preferences: 用户偏好
+            deadline: 请求截止时间
 
         Returns:
             Dict: 可视化配置
@@ -580,12 +515,13 @@ class BiologyAgent(BaseVisualizationAgent):
                 "difficulty": "intermediate"
             }
 
-    async def generate_visualization(self, config: Dict[str, Any]) -> str:
+    async def generate_visualization(self, config: Dict[str, Any], deadline: Optional[Deadline] = None) -> str:
         """
         生成可视化HTML内容
 
         Args:
             config: 可视化配置
+            deadline: 请求截止时间
 
         Returns:
             str: 生成的HTML内容
@@ -5,8 +5,69 @@
 
 from typing import Dict, List, Optional, Any, Union
 import json
-import re
 from agents.base_agent import BaseVisualizationAgent
+from services.deadline import Deadline
+from agents.prompt_analysis import PromptAnalysis
+from agents.concept_matcher import ConceptMatcher, ConceptHits, MATCH_LOWER, MATCH_EXACT, MATCH_UPPER, MATCH_WORD
+
+# 化学概念词表：类别 -> [(概念, 匹配方式, 关键词)]，构造Agent时编译为一个匹配器；
+# 同一类别内按声明顺序输出概念（visualization_type、grade_level 取第一个命中）
+CONCEPT_VOCABULARY = {
+    "visualization_type": [
+        ("molecule_structure", MATCH_LOWER, ["分子结构", "分子", "molecule", "分子式"]),
+        ("chemical_reaction", MATCH_LOWER, ["反应", "反应式", "reaction", "化学方程式"]),
+        ("periodic_table", MATCH_LOWER, ["周期表", "元素", "periodic table", "element"]),
+        ("chemical_bonds", MATCH_LOWER, ["化学键", "键", "bond", "共价", "离子"]),
+        ("acid_base_reaction", MATCH_LOWER, ["酸碱", "酸", "碱", "acid", "base", "ph"]),
+        ("oxidation_reduction", MATCH_LOWER, ["氧化还原", "氧化", "还原", "oxidation", "reduction"])
+    ],
+    "grade_level": [
+        ("middle_school", MATCH_EXACT, ["初中", "基础", "简单"]),
+        ("high_school", MATCH_EXACT, ["高中", "进阶", "复杂"]),
+        ("university", MATCH_EXACT, ["大学", "专业", "研究"])
+    ],
+    "molecules": [
+        # 常见分子式（在大写化的文本中检测）
+        *[(formula, MATCH_UPPER, [formula]) for formula in [
+            "H2O", "CO2", "CH4", "NH3", "NaCl", "C6H12O6", "C2H5OH",
+            "H2SO4", "HNO3", "HCl", "NaOH", "KOH", "CaCO3"
+        ]],
+        # 水、二氧化碳、甲烷的多种表达
+        ("H2O", MATCH_EXACT, ["水", "water"]),
+        ("CO2", MATCH_EXACT, ["二氧化碳", "carbon dioxide"]),
+        ("CH4", MATCH_EXACT, ["甲烷", "methane"])
+    ],
+    "reactions": [
+        ("acid_base_neutralization", MATCH_EXACT, ["酸碱", "中和", "neutralization"]),
+        ("combustion", MATCH_EXACT, ["燃烧", "combustion"]),
+        ("redox", MATCH_EXACT, ["氧化", "还原", "oxidation", "reduction"]),
+        ("decomposition", MATCH_EXACT, ["分解", "decomposition"])
+    ],
+    "elements": [
+        # 常见元素符号（按单词边界匹配）
+        (symbol, MATCH_WORD, [symbol]) for symbol in ["H", "O", "C", "N", "Na", "Cl", "Fe", "Cu", "Zn", "Ca"]
+    ],
+    "bonds": [
+        ("covalent", MATCH_EXACT, ["共价键", "covalent"]),
+        ("ionic", MATCH_EXACT, ["离子键", "ionic"]),
+        ("hydrogen", MATCH_EXACT, ["氢键", "hydrogen bond"])
+    ],
+    "acid_base": [
+        ("strong_acid", MATCH_EXACT, ["强酸", "strong acid"]),
+        ("weak_acid", MATCH_EXACT, ["弱酸", "weak acid"]),
+        ("strong_base", MATCH_EXACT, ["强碱", "strong base"]),
+        ("weak_base", MATCH_EXACT, ["弱碱", "weak base"]),
+        ("ph_scale", MATCH_EXACT, ["PH值", "pH"])
+    ],
+    "redox": [
+        ("oxidizing_agent", MATCH_EXACT, ["氧化剂", "oxidizing agent"]),
+        ("reducing_agent", MATCH_EXACT, ["还原剂", "reducing agent"]),
+        ("electron_transfer", MATCH_EXACT, ["电子转移", "electron transfer"])
+    ],
+    "render_3d": [("3d", MATCH_EXACT, ["3D", "三维", "立体"])],
+    "animation": [("animation", MATCH_EXACT, ["动画", "动态", "animation"])],
+    "interactive": [("interactive", MATCH_EXACT, ["交互", "interactive", "旋转"])]
+}
 
 class ChemistryAgent(BaseVisualizationAgent):
     """化学学科可视化Agent"""
@@ -44,69 +105,63 @@ class ChemistryAgent(BaseVisualizationAgent):
             default_config.update(config)
 
         super().__init__("chemistry", default_config)
-
-    async def parse_requirement(self, prompt: str) -> Dict[str, Any]:
+        self.concept_matcher = ConceptMatcher(CONCEPT_VOCABULARY)
+
+    async def parse_requirement(
+        self,
+        prompt: str,
+        deadline: Optional[Deadline] = None,
+        analysis: Optional[PromptAnalysis] = None
+    ) -> Dict[str, Any]:
         """
         解析化学学科需求
 
         Args:
             prompt: 用户输入的自然语言描述
+            deadline: 请求截止时间
+            analysis: 提示词分析结果（路由器传入时复用其归一化文本、数字和关键词命中）
 
         Returns:
             Dict: 解析后的结构化需求
         """
+        # 概念词表只扫描一次，各提取函数复用扫描结果
+        analysis = self._analyze(prompt, analysis)
+        hits = self._scan_concepts(prompt, analysis)
+
         requirement = {
             "subject": "chemistry",
-            "grade_level": self._detect_grade_level(prompt),
+            "grade_level": self._detect_grade_level(prompt, hits),
             "visualization_type": None,
             "concepts": [],
             "parameters": {},
             "difficulty": "intermediate"
         }
 
-        # 识别可视化类型
-        prompt_lower = prompt.lower()
-
-        if any(keyword in prompt_lower for keyword in ["分子结构", "分子", "molecule", "分子式"]):
-            requirement["visualization_type"] = "molecule_structure"
-            requirement["concepts"] = self._extract_molecules(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["反应", "反应式", "reaction", "化学方程式"]):
-            requirement["visualization_type"] = "chemical_reaction"
-            requirement["concepts"] = self._extract_reactions(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["周期表", "元素", "periodic table", "element"]):
-            requirement["visualization_type"] = "periodic_table"
-            requirement["concepts"] = self._extract_elements(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["化学键", "键", "bond", "共价", "离子"]):
-            requirement["visualization_type"] = "chemical_bonds"
-            requirement["concepts"] = self._extract_bonds(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["酸碱", "酸", "碱", "acid", "base", "ph"]):
-            requirement["visualization_type"] = "acid_base_reaction"
-            requirement["concepts"] = self._extract_acid_base(prompt)
-
-        elif any(keyword in prompt_lower for keyword in ["氧化还原", "氧化", "还原", "oxidation", "reduction"]):
-            requirement["visualization_type"] = "oxidation_reduction"
-            requirement["concepts"] = self._extract_redox(prompt)
-
-        else:
-            # 默认为分子结构
-            requirement["visualization_type"] = "molecule_structure"
-            requirement["concepts"] = self._extract_molecules(prompt)
+        # 识别可视化类型（按用户输入的小写文本，词表声明顺序即优先级；默认为分子结构）
+        viz_type = self._first_concept_in_analysis(prompt, analysis, hits, "visualization_type") or "molecule_structure"
+        extractors = {
+            "molecule_structure": self._extract_molecules,
+            "chemical_reaction": self._extract_reactions,
+            "periodic_table": self._extract_elements,
+            "chemical_bonds": self._extract_bonds,
+            "acid_base_reaction": self._extract_acid_base,
+            "oxidation_reduction": self._extract_redox
+        }
+        requirement["visualization_type"] = viz_type
+        requirement["concepts"] = extractors[viz_type](prompt, hits)
 
         # 提取参数
-        requirement["parameters"] = self._extract_parameters(prompt, requirement["visualization_type"])
+        requirement["parameters"] = self._extract_parameters(prompt, requirement["visualization_type"], hits)
 
         return requirement
 
-    async def match_template(self, requirement: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def match_template(self, requirement: Dict[str, Any], deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
         """
         匹配化学学科模板
 
         Args:
             requirement: 解析后的需求结构
+            deadline: 请求截止时间
 
         Returns:
             Dict: 匹配的模板配置
@@ -158,153 +213,49 @@ class ChemistryAgent(BaseVisualizationAgent):
             ]
         }
 
-    def _detect_grade_level(self, prompt: str) -> str:
+    def _detect_grade_level(self, prompt: str, hits: Optional[ConceptHits] = None) -> str:
         """检测年级水平"""
-        if any(keyword in prompt for keyword in ["初中", "基础", "简单"]):
-            return "middle_school"
-        elif any(keyword in prompt for keyword in ["高中", "进阶", "复杂"]):
-            return "high_school"
-        elif any(keyword in prompt for keyword in ["大学", "专业", "研究"]):
-            return "university"
-        return "high_school"
-
-    def _extract_molecules(self, prompt: str) -> List[str]:
-        """提取分子相关的概念"""
-        molecules = []
-        prompt_upper = prompt.upper()
-
-        # 常见分子式检测
-        common_patterns = [
-            r'H2O', r'CO2', r'CH4', r'NH3', r'NaCl', r'C6H12O6', r'C2H5OH',
-            r'H2SO4', r'HNO3', r'HCl', r'NaOH', r'KOH', r'CaCO3'
-        ]
-
-        for pattern in common_patterns:
-            if re.search(pattern, prompt_upper):
-                molecules.append(pattern)
-
-        # 水的多种表达
-        if any(keyword in prompt for keyword in ["水", "water"]):
-            molecules.append("H2O")
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.first("grade_level") or "high_school"
 
-        # 二氧化碳
-        if any(keyword in prompt for keyword in ["二氧化碳", "carbon dioxide"]):
-            molecules.append("CO2")
-
-        # 甲烷
-        if any(keyword in prompt for keyword in ["甲烷", "methane"]):
-            molecules.append("CH4")
-
-        return molecules if molecules else ["H2O"]  # 默认为水分子
+    def _extract_molecules(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
+        """提取分子相关的概念"""
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("molecules") or ["H2O"]  # 默认为水分子
 
-    def _extract_reactions(self, prompt: str) -> List[str]:
+    def _extract_reactions(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
         """提取化学反应相关的概念"""
-        reactions = []
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("reactions") or ["acid_base_neutralization"]
 
-        if any(keyword in prompt for keyword in ["酸碱", "中和", "neutralization"]):
-            reactions.append("acid_base_neutralization")
-
-        if any(keyword in prompt for keyword in ["燃烧", "combustion"]):
-            reactions.append("combustion")
-
-        if any(keyword in prompt for keyword in ["氧化", "还原", "oxidation", "reduction"]):
-            reactions.append("redox")
-
-        if any(keyword in prompt for keyword in ["分解", "decomposition"]):
-            reactions.append("decomposition")
-
-        return reactions if reactions else ["acid_base_neutralization"]
-
-    def _extract_elements(self, prompt: str) -> List[str]:
+    def _extract_elements(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
         """提取元素相关的概念"""
-        elements = []
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("elements") or ["H", "O", "C"]
 
-        # 检测常见元素符号
-        element_patterns = [
-            r'\bH\b', r'\bO\b', r'\bC\b', r'\bN\b', r'\bNa\b',
-            r'\bCl\b', r'\bFe\b', r'\bCu\b', r'\bZn\b', r'\bCa\b'
-        ]
-
-        for pattern in element_patterns:
-            if re.search(pattern, prompt):
-                elements.append(pattern.strip('\\b'))
-
-        return elements if elements else ["H", "O", "C"]
-
-    def _extract_bonds(self, prompt: str) -> List[str]:
+    def _extract_bonds(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
         """提取化学键相关的概念"""
-        bonds = []
-
-        if any(keyword in prompt for keyword in ["共价键", "covalent"]):
-            bonds.append("covalent")
-
-        if any(keyword in prompt for keyword in ["离子键", "ionic"]):
-            bonds.append("ionic")
-
-        if any(keyword in prompt for keyword in ["氢键", "hydrogen bond"]):
-            bonds.append("hydrogen")
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("bonds") or ["covalent"]
 
-        return bonds if bonds else ["covalent"]
-
-    def _extract_acid_base(self, prompt: str) -> List[str]:
+    def _extract_acid_base(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
         """提取酸碱反应相关的概念"""
-        concepts = []
-
-        if any(keyword in prompt for keyword in ["强酸", "strong acid"]):
-            concepts.append("strong_acid")
-
-        if any(keyword in prompt for keyword in ["弱酸", "weak acid"]):
-            concepts.append("weak_acid")
-
-        if any(keyword in prompt for keyword in ["强碱", "strong base"]):
-            concepts.append("strong_base")
-
-        if any(keyword in prompt for keyword in ["弱碱", "weak base"]):
-            concepts.append("weak_base")
-
-        if any(keyword in prompt for keyword in ["PH值", "pH"]):
-            concepts.append("ph_scale")
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("acid_base") or ["acid_base_neutralization"]
 
-        return concepts if concepts else ["acid_base_neutralization"]
-
-    def _extract_redox(self, prompt: str) -> List[str]:
+    def _extract_redox(self, prompt: str, hits: Optional[ConceptHits] = None) -> List[str]:
         """提取氧化还原反应相关的概念"""
-        concepts = []
-
-        if any(keyword in prompt for keyword in ["氧化剂", "oxidizing agent"]):
-            concepts.append("oxidizing_agent")
-
-        if any(keyword in prompt for keyword in ["还原剂", "reducing agent"]):
-            concepts.append("reducing_agent")
+        hits = hits or self.concept_matcher.scan(prompt)
+        return hits.concepts("redox") or ["oxidation_reduction"]
 
-        if any(keyword in prompt for keyword in ["电子转移", "electron transfer"]):
-            concepts.append("electron_transfer")
-
-        return concepts if concepts else ["oxidation_reduction"]
-
-    def _extract_parameters(self, prompt: str, viz_type: str) -> Dict[str, Any]:
+    def _extract_parameters(self, prompt: str, viz_type: str, hits: Optional[ConceptHits] = None) -> Dict[str, Any]:
         """提取可视化参数"""
-        params = {}
-
-        # 检测3D需求
-        if any(keyword in prompt for keyword in ["3D", "三维", "立体"]):
-            params["render_mode"] = "3d"
-        else:
-            params["render_mode"] = "2d"
-
-        # 检测动画需求
-        if any(keyword in prompt for keyword in ["动画", "动态", "animation"]):
-            params["animation"] = True
-        else:
-            params["animation"] = False
-
-        # 检测交互需求
-        if any(keyword in prompt for keyword in ["交互", "interactive", "旋转"]):
-            params["interactive"] = True
-        else:
-            params["interactive"] = False
-
-        return params
+        hits = hits or self.concept_matcher.scan(prompt)
+        return {
+            "render_mode": "3d" if hits.has("render_3d") else "2d",  # 检测3D需求
+            "animation": hits.has("animation"),                       # 检测动画需求
+            "interactive": hits.has("interactive")                    # 检测交互需求
+        }
 
     def _concept_match(self, user_concepts: List[str], template_concepts: List[str]) -> bool:
         """检查概念匹配度"""
@@ -385,7 +336,7 @@ class ChemistryAgent(BaseVisualizationAgent):
             "concepts": concepts
         }
 
-    async def generate_config(self, requirement: Dict[str, Any], template: Dict[str, Any], user_preferences: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_config(self, requirement: Dict[str, Any], template: Dict[str, Any], user_preferences: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         生成化学可视化配置
 
@@ -393,6 +344,7 @@ class ChemistryAgent(BaseVisualizationAgent):
             requirement: 化学需求
             template: 匹配的模板
             user_preferences: 用户偏好
+            deadline: 请求截止时间
 
         Returns:
             Dict: 可视化配置
@@ -437,12 +389,13 @@ class ChemistryAgent(BaseVisualizationAgent):
                 "difficulty": "intermediate"
             }
 
-    async def generate_visualization(self, config: Dict[str, Any]) -> str:
+    async def generate_visualization(self, config: Dict[str, Any], deadline: Optional[Deadline] = None) -> str:
         """
         生成可视化HTML内容
 
         Args:
             config: 可视化配置
+            deadline: 请求截止时间
 
         Returns:
             str: 生成的HTML内容
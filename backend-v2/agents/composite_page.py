@@ -0,0 +1,84 @@
+"""
+万物可视化 v2.0 - 跨学科组合页面
+把多个学科Agent各自生成的完整HTML页面组合为一个多面板页面；
+每个面板放在独立的 iframe（srcdoc）中，各页面的脚本和样式互不干扰
+"""
+
+from typing import Dict, List, Any
+from html import escape
+
+SUBJECT_NAMES = {
+    "mathematics": "数学",
+    "astronomy": "天文",
+    "physics": "物理",
+    "chemistry": "化学",
+    "biology": "生物"
+}
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    <style>
+        body {{ margin: 0; padding: 16px; font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", "PingFang SC", sans-serif; background: #f5f7fa; }}
+        h1 {{ margin: 0 0 12px; font-size: 20px; color: #303133; }}
+        .panels {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(480px, 1fr)); gap: 16px; }}
+        .panel {{ background: #fff; border-radius: 8px; box-shadow: 0 1px 4px rgba(0, 0, 0, 0.08); overflow: hidden; }}
+        .panel h2 {{ margin: 0; padding: 10px 14px; font-size: 15px; color: #409eff; border-bottom: 1px solid #ebeef5; }}
+        .panel iframe {{ display: block; width: 100%; height: 640px; border: 0; }}
+        .notice {{ margin-top: 12px; color: #909399; font-size: 13px; }}
+    </style>
+</head>
+<body>
+    <h1>{title}</h1>
+    <div class="panels">
+{panels}
+    </div>
+{notice}
+</body>
+</html>
+"""
+
+PANEL_TEMPLATE = """        <section class="panel" data-subject="{subject}">
+            <h2>{heading}</h2>
+            <iframe title="{heading}" sandbox="allow-scripts" srcdoc="{srcdoc}"></iframe>
+        </section>"""
+
+
+def subject_name(subject: str) -> str:
+    """学科显示名称"""
+    return SUBJECT_NAMES.get(subject, subject)
+
+
+def compose_panels(title: str, panels: List[Dict[str, Any]], failed: List[str] = None) -> str:
+    """
+    组合多面板页面
+
+    Args:
+        title: 页面标题
+        panels: 面板列表，每项包含 subject、html_content 和可选的 template（含 name）
+        failed: 未能生成的学科（在页面底部说明）
+
+    Returns:
+        str: 组合后的HTML
+    """
+    rendered = []
+    for panel in panels:
+        template_name = (panel.get("template") or {}).get("name")
+        heading = subject_name(panel["subject"])
+        if template_name:
+            heading = f"{heading} · {template_name}"
+        rendered.append(PANEL_TEMPLATE.format(
+            subject=escape(panel["subject"]),
+            heading=escape(heading),
+            srcdoc=escape(panel["html_content"], quote=True)
+        ))
+
+    notice = ""
+    if failed:
+        names = "、".join(subject_name(subject) for subject in failed)
+        notice = f'    <p class="notice">{escape(names)} 部分未能生成</p>'
+
+    return PAGE_TEMPLATE.format(title=escape(title), panels="\n".join(rendered), notice=notice)
@@ -0,0 +1,281 @@
+"""
+万物可视化 v2.0 - 学科概念词表匹配器
+把Agent的各类概念词表（可视化类型、分子、细胞器、参数等）在构造时编译为按公共前缀合并的正则
+（见 KeywordPattern），扫描时由正则引擎在C层一次遍历文本，所有类别的命中及最早结束位置一次得出，
+替代各提取函数逐个关键词的重复扫描
+"""
+
+from typing import Dict, List, Optional, Any, Iterable, Sequence, Set, Tuple
+import re
+
+# 匹配方式，与各Agent原有逐词检查的语义一一对应
+MATCH_LOWER = "lower"   # keyword in prompt.lower()
+MATCH_EXACT = "exact"   # keyword in prompt（区分大小写）
+MATCH_UPPER = "upper"   # keyword in prompt.upper()
+MATCH_WORD = "word"     # re.search(r"\bkeyword\b", prompt)
+
+# 词表规则: (概念, 匹配方式, 关键词列表)；同一类别内按声明顺序输出概念
+ConceptRule = Tuple[Any, str, Sequence[str]]
+
+class KeywordPattern:
+    """
+    多关键词预筛 - 关键词按公共前缀合并为一个正则，由正则引擎在C层遍历一次文本，找出可能出现的关键词
+
+    正则在每个位置取最长的关键词且匹配之间不重叠；起点落在某个匹配内部的关键词
+    （前缀、子串或跨越匹配结尾的关键词）在构造时按所在的关键词预先列出一并作为候选，
+    因此实际出现的关键词一定在候选中，调用方再逐个查找候选确认并取得最早位置
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        """
+        编译关键词
+
+        Args:
+            keywords: 关键词（非空字符串，重复的只保留一个）
+        """
+        self.keywords: Tuple[str, ...] = tuple(dict.fromkeys(keyword for keyword in keywords if keyword))
+        self.pattern = re.compile(_trie_regex(self.keywords)) if self.keywords else None
+
+        # 关键词 -> 起点落在它内部（含起点相同的更短关键词）的其他关键词
+        keyword_set = set(self.keywords)
+        by_prefix: Dict[str, List[str]] = {}
+        for keyword in self.keywords:
+            for end in range(1, len(keyword)):
+                by_prefix.setdefault(keyword[:end], []).append(keyword)
+        self.nested: Dict[str, Tuple[str, ...]] = {}
+        for keyword in self.keywords:
+            nested = set()
+            for offset in range(len(keyword)):
+                # 完全落在关键词内部的关键词
+                nested.update(
+                    keyword[offset:end] for end in range(offset + 1, len(keyword) + 1)
+                    if keyword[offset:end] in keyword_set
+                )
+                # 从关键词内部开始、越过其结尾的关键词
+                if offset:
+                    nested.update(by_prefix.get(keyword[offset:], ()))
+            nested.discard(keyword)
+            self.nested[keyword] = tuple(nested)
+
+    def candidates(self, text: str) -> Set[str]:
+        """
+        可能出现在文本中的关键词
+
+        Args:
+            text: 文本
+
+        Returns:
+            Set[str]: 候选关键词（包含所有实际出现的关键词）
+        """
+        if self.pattern is None:
+            return set()
+        found = set(self.pattern.findall(text))
+        for keyword in tuple(found):
+            found.update(self.nested[keyword])
+        return found
+
+
+def _trie_regex(keywords: Iterable[str]) -> str:
+    """把关键词按公共前缀合并为正则（贪婪的可选分支使每个位置匹配最长的关键词）"""
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            body = "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+class ConceptHits:
+    """一次扫描的结果 - 各类别中命中的规则及其最早命中的结束位置"""
+
+    __slots__ = ("_rules", "_matched")
+
+    def __init__(self, rules: Dict[str, List[ConceptRule]], matched: Dict[str, Dict[int, int]]):
+        self._rules = rules
+        self._matched = matched
+
+    def _indexes(self, category: str, within: Optional[int]) -> List[int]:
+        matched = self._matched.get(category)
+        if not matched:
+            return []
+        return sorted(index for index, end in matched.items() if within is None or end <= within)
+
+    def concepts(self, category: str, within: Optional[int] = None) -> List[Any]:
+        """
+        类别中命中的概念（按规则声明顺序，同一概念由多条规则声明时可重复出现）
+
+        Args:
+            category: 类别
+            within: 只统计在前 within 个字符内结束的命中（None 表示全文）
+
+        Returns:
+            List[Any]: 命中的概念
+        """
+        rules = self._rules.get(category, [])
+        return [rules[index][0] for index in self._indexes(category, within)]
+
+    def first(self, category: str, within: Optional[int] = None) -> Optional[Any]:
+        """类别中按声明顺序第一个命中的概念（相当于 if/elif 链），无命中时返回None"""
+        indexes = self._indexes(category, within)
+        return self._rules[category][indexes[0]][0] if indexes else None
+
+    def has(self, category: str) -> bool:
+        """类别中是否有任一规则命中"""
+        return bool(self._matched.get(category))
+
+
+class ConceptMatcher:
+    """
+    概念词表匹配器 - 所有类别共用合并后的关键词正则，单次扫描
+
+    大小写转换逐字符一一对应的提示词（绝大多数）只扫描一遍小写文本：MATCH_EXACT / MATCH_UPPER
+    的关键词以小写形式参与预筛，候选关键词再在各自匹配方式对应的文本中查找一次得到最早位置；
+    含长度会变化或大小写不对称的字符（如 İ、ß、ſ、Σ）时，改为每种匹配方式各扫描对应的文本，
+    结果与逐词检查完全一致
+    """
+
+    def __init__(self, vocabulary: Dict[str, Iterable[ConceptRule]]):
+        """
+        编译词表
+
+        Args:
+            vocabulary: 类别 -> 规则列表 [(概念, 匹配方式, 关键词列表)]
+        """
+        self.rules: Dict[str, List[ConceptRule]] = {
+            category: [(concept, mode, tuple(keywords)) for concept, mode, keywords in rules]
+            for category, rules in vocabulary.items()
+        }
+
+        # 单次扫描用: 小写关键词 -> [(类别, 规则序号, 匹配方式, 原关键词)]
+        self._folded: Dict[str, List[Tuple[str, int, str, str]]] = {}
+        # 逐方式扫描用: 匹配方式 -> 关键词 -> [(类别, 规则序号)]
+        self._by_mode: Dict[str, Dict[str, List[Tuple[str, int]]]] = {
+            MATCH_LOWER: {}, MATCH_EXACT: {}, MATCH_UPPER: {}
+        }
+        # 单词边界匹配: 关键词 -> [(类别, 规则序号)]
+        self._words: Dict[str, List[Tuple[str, int]]] = {}
+
+        for category, rules in self.rules.items():
+            for index, (_, mode, keywords) in enumerate(rules):
+                for keyword in keywords:
+                    # 与原实现一致：含大写字母的词在小写文本中、含小写字母的词在大写文本中永远不会出现
+                    if not keyword or (mode == MATCH_LOWER and keyword != keyword.lower()):
+                        continue
+                    if mode == MATCH_UPPER and keyword != keyword.upper():
+                        continue
+                    if mode == MATCH_WORD:
+                        self._words.setdefault(keyword, []).append((category, index))
+                        continue
+                    self._folded.setdefault(keyword.lower(), []).append((category, index, mode, keyword))
+                    self._by_mode[mode].setdefault(keyword, []).append((category, index))
+
+        self._folded_pattern = KeywordPattern(self._folded)
+        self._mode_patterns = {
+            mode: KeywordPattern(keywords) for mode, keywords in self._by_mode.items() if keywords
+        }
+
+    def scan(self, prompt: str, text: Optional[str] = None) -> ConceptHits:
+        """
+        扫描提示词
+
+        Args:
+            prompt: 原始提示词
+            text: prompt.lower()（调用方已有时传入，避免重复转换）
+
+        Returns:
+            ConceptHits: 各类别命中的规则
+        """
+        if text is None:
+            text = prompt.lower()
+        upper = prompt.upper()
+
+        # 类别 -> 规则序号 -> 最早命中的结束位置（MATCH_LOWER 为小写文本中的位置）
+        matched: Dict[str, Dict[int, int]] = {}
+
+        # 大小写转换逐字符一一对应（且不含按上下文转换的 Σ）时，三种文本的同一位置互相对应，
+        # 出现在原文或大写文本中的关键词，其小写形式必然出现在小写文本中，扫描一遍小写文本即可得到全部候选
+        if len(text) == len(prompt) == len(upper) and "Σ" not in upper and upper.lower() == text:
+            self._scan_folded(prompt, text, upper, matched)
+        else:
+            self._scan_by_mode(prompt, text, upper, matched)
+
+        for keyword, entries in self._words.items():
+            end = _find_word(prompt, keyword)
+            if end >= 0:
+                for category, index in entries:
+                    _record(matched, category, index, end)
+
+        return ConceptHits(self.rules, matched)
+
+    def _scan_folded(self, prompt: str, text: str, upper: str, matched: Dict[str, Dict[int, int]]) -> None:
+        """扫描一遍小写文本得到候选关键词，再在各自匹配方式对应的文本中查找最早位置"""
+        haystacks = {MATCH_LOWER: text, MATCH_EXACT: prompt, MATCH_UPPER: upper}
+        folded = self._folded
+        for keyword in self._folded_pattern.candidates(text):
+            for category, index, mode, original in folded[keyword]:
+                start = haystacks[mode].find(original)
+                if start >= 0:
+                    _record(matched, category, index, start + len(original))
+
+    def _scan_by_mode(self, prompt: str, text: str, upper: str, matched: Dict[str, Dict[int, int]]) -> None:
+        """每种匹配方式各扫描对应的文本（大小写转换改变长度等少见情况）"""
+        haystacks = {MATCH_LOWER: text, MATCH_EXACT: prompt, MATCH_UPPER: upper}
+        for mode, pattern in self._mode_patterns.items():
+            haystack = haystacks[mode]
+            keywords = self._by_mode[mode]
+            for keyword in pattern.candidates(haystack):
+                start = haystack.find(keyword)
+                if start >= 0:
+                    for category, index in keywords[keyword]:
+                        _record(matched, category, index, start + len(keyword))
+
+
+def _find_word(text: str, keyword: str) -> int:
+    """
+    re.search(r"\bkeyword\b", text) 的等价实现：str.find 定位出现处，再逐处核对两侧的单词边界
+
+    以 \b 开头的正则无法用字面前缀跳过文本，每次都要逐字符尝试；元素符号等短关键词
+    在提示词中出现的次数很少，逐处核对比正则快一个数量级
+
+    Returns:
+        int: 第一个满足单词边界的出现处的结束位置，没有时返回 -1
+    """
+    length = len(keyword)
+    start = text.find(keyword)
+    while start >= 0:
+        end = start + length
+        if _is_boundary(text, start) and _is_boundary(text, end):
+            return end
+        start = text.find(keyword, start + 1)
+    return -1
+
+
+def _is_boundary(text: str, position: int) -> bool:
+    """position 处是否为 \b 单词边界（两侧恰有一侧是 \w 字符，与 re 的 Unicode 规则一致）"""
+    before = position > 0 and _is_word_char(text[position - 1])
+    after = position < len(text) and _is_word_char(text[position])
+    return before != after
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _record(matched: Dict[str, Dict[int, int]], category: str, index: int, end: int) -> None:
+    """记录规则命中，保留最早的结束位置"""
+    found = matched.get(category)
+    if found is None:
+        matched[category] = {index: end}
+    elif end < found.get(index, end + 1):
+        found[index] = end
@@ -0,0 +1,146 @@
+"""
+万物可视化 v2.0 - 关键词多模式匹配自动机
+Aho–Corasick 自动机：关键词表编译一次，之后对输入文本单次扫描即可找出所有出现的关键词，
+每个关键词的终止节点携带预先计算好的负载（如 (学科, 权重)）
+"""
+
+from typing import Dict, List, Any, Iterable, Iterator, Set, Tuple
+from collections import deque
+
+
+class KeywordAutomaton:
+    """Aho–Corasick 关键词自动机"""
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]]):
+        """
+        编译关键词表
+
+        Args:
+            patterns: (关键词, 负载) 序列；同一关键词出现多次时负载按出现顺序合并
+        """
+        # 关键词ID -> 关键词 / 负载元组，关键词 -> 关键词ID
+        self.patterns: List[str] = []
+        self.payloads: List[Tuple[Any, ...]] = []
+        self._ids: Dict[str, int] = {}
+
+        # 节点转移表、失败指针、节点输出（以该节点结尾的所有关键词ID，含失败链上的）
+        self._delta: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        outputs: List[List[int]] = [[]]
+
+        for pattern, payload in patterns:
+            if not pattern:
+                continue
+            pattern_id = self._ids.get(pattern)
+            if pattern_id is not None:
+                self.payloads[pattern_id] += (payload,)
+                continue
+
+            pattern_id = self._ids[pattern] = len(self.patterns)
+            self.patterns.append(pattern)
+            self.payloads.append((payload,))
+
+            node = 0
+            for char in pattern:
+                child = self._delta[node].get(char)
+                if child is None:
+                    child = len(self._delta)
+                    self._delta.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                    self._delta[node][char] = child
+                node = child
+            outputs[node].append(pattern_id)
+
+        # 按层次计算失败指针，并把失败链上的输出合并到节点上
+        queue = deque(self._delta[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._delta[node].items():
+                queue.append(child)
+                state = self._fail[node]
+                while state and char not in self._delta[state]:
+                    state = self._fail[state]
+                target = self._delta[state].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                outputs[child].extend(outputs[self._fail[child]])
+
+        self._outputs: List[Tuple[int, ...]] = [tuple(output) for output in outputs]
+        # 出现在关键词中的字符；其他字符总是回到根节点
+        self._alphabet: Set[str] = {char for pattern in self.patterns for char in pattern}
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def __contains__(self, pattern: object) -> bool:
+        return pattern in self._ids
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, Tuple[int, ...]]]:
+        """
+        单次扫描文本，依次产出关键词出现的位置
+
+        Args:
+            text: 输入文本（调用方负责大小写归一化）
+
+        Yields:
+            Tuple[int, Tuple[int, ...]]: (结束位置（不含）, 在该位置结束的关键词ID)
+        """
+        delta = self._delta
+        fail = self._fail
+        outputs = self._outputs
+        alphabet = self._alphabet
+        node = 0
+
+        for index, char in enumerate(text):
+            child = delta[node].get(char)
+            if child is None:
+                if char not in alphabet:
+                    node = 0
+                    continue
+                # 沿失败链求转移，并缓存到当前节点（转移表逐步补全为DFA，规模不超过 节点数×字母表）
+                state = node
+                while child is None and state:
+                    state = fail[state]
+                    child = delta[state].get(char)
+                if child is None:
+                    child = 0
+                delta[node][char] = child
+            node = child
+            if outputs[node]:
+                yield index + 1, outputs[node]
+
+    def find(self, text: str) -> Set[int]:
+        """
+        找出文本中出现过的所有关键词（每个关键词只计一次）
+
+        Args:
+            text: 输入文本（调用方负责大小写归一化）
+
+        Returns:
+            Set[int]: 出现过的关键词ID
+        """
+        delta = self._delta
+        fail = self._fail
+        outputs = self._outputs
+        alphabet = self._alphabet
+        found: Set[int] = set()
+        node = 0
+
+        # 与 iter_matches 相同的扫描，内联以避免生成器开销（分类的热路径）
+        for char in text:
+            child = delta[node].get(char)
+            if child is None:
+                if char not in alphabet:
+                    node = 0
+                    continue
+                state = node
+                while child is None and state:
+                    state = fail[state]
+                    child = delta[state].get(char)
+                if child is None:
+                    child = 0
+                delta[node][char] = child
+            node = child
+            if outputs[node]:
+                found.update(outputs[node])
+        return found
@@ -4,11 +4,13 @@
 """
 
 from typing import Dict, List, Optional, Any
-import json
 import math
 import datetime
 import numpy as np
 from .base_agent import BaseVisualizationAgent, VisualizationError, RequirementParseError
+from services.fast_json import dumps_str
+from services.deadline import Deadline, is_tight, sample_count
+from .prompt_analysis import PromptAnalysis
 
 class MathematicsAgent(BaseVisualizationAgent):
     """数学学科可视化Agent"""
@@ -36,17 +38,26 @@ class MathematicsAgent(BaseVisualizationAgent):
             }
         })
 
-    async def parse_requirement(self, prompt: str) -> Dict[str, Any]:
+    async def parse_requirement(
+        self,
+        prompt: str,
+        deadline: Optional[Deadline] = None,
+        analysis: Optional[PromptAnalysis] = None
+    ) -> Dict[str, Any]:
         """
         解析数学需求
 
         Args:
             prompt: 用户输入的数学需求描述
+            deadline: 请求截止时间
+            analysis: 提示词分析结果（路由器传入时复用其归一化文本、数字和关键词命中）
 
         Returns:
             Dict: 解析后的数学需求结构
         """
         try:
+            analysis = self._analyze(prompt, analysis)
+
             requirement = {
                 "subject": "mathematics",
                 "original": prompt,
@@ -68,7 +79,7 @@ class MathematicsAgent(BaseVisualizationAgent):
             }
 
             for field, patterns in field_patterns.items():
-                if any(pattern in prompt for pattern in patterns):
+                if any(analysis.mentions(pattern) for pattern in patterns):
                     requirement["field"] = field
                     break
 
@@ -97,7 +108,7 @@ class MathematicsAgent(BaseVisualizationAgent):
                 }
 
                 for pattern, dist_type in distribution_patterns.items():
-                    if pattern in prompt.lower():
+                    if pattern in analysis.text:
                         requirement["concept_type"] = "distribution"
                         requirement["distribution_type"] = dist_type
                         break
@@ -128,7 +139,7 @@ class MathematicsAgent(BaseVisualizationAgent):
 
                 # 精确匹配
                 for concept in la_concepts:
-                    if concept in prompt:
+                    if analysis.mentions(concept):
                         requirement["concept_type"] = "linear_algebra"
                         requirement["template_id"] = concept_mapping.get(concept, concept)
                         requirement["la_concept"] = concept
@@ -137,14 +148,14 @@ class MathematicsAgent(BaseVisualizationAgent):
                 # 关键词映射（如果没有精确匹配）
                 if not requirement.get("template_id"):
                     for keyword, template_id in concept_mapping.items():
-                        if keyword in prompt:
+                        if analysis.mentions(keyword):
                             requirement["concept_type"] = "linear_algebra"
                             requirement["template_id"] = template_id
                             requirement["la_concept"] = keyword
                             break
 
             # 4. 提取数值参数
-            numbers = self._extract_numbers(prompt)
+            numbers = list(analysis.numbers)
             if numbers:
                 requirement["numbers"] = numbers
 
@@ -169,26 +180,27 @@ class MathematicsAgent(BaseVisualizationAgent):
             all_keywords = []
             for patterns in field_patterns.values():
                 all_keywords.extend(patterns)
-            requirement["keywords"] = self._extract_keywords(prompt, all_keywords)
+            requirement["keywords"] = self._extract_keywords(analysis, all_keywords)
 
             return requirement
 
         except Exception as e:
             raise RequirementParseError(f"数学需求解析失败: {str(e)}")
 
-    async def match_template(self, requirement: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def match_template(self, requirement: Dict[str, Any], deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
         """
         匹配数学模板
 
         Args:
             requirement: 解析后的数学需求
+            deadline: 请求截止时间
 
         Returns:
             Dict: 匹配的模板配置
         """
         try:
-            # 使用模板引擎进行匹配
-            if hasattr(self, 'template_engine') and self.template_engine:
+            # 使用模板引擎进行匹配（剩余预算不足时跳过模板搜索，直接使用内置模板）
+            if hasattr(self, 'template_engine') and self.template_engine and not is_tight(deadline):
                 # 搜索匹配的模板
                 search_query = requirement.get("original", "")
                 dist_type = requirement.get("distribution_type")
@@ -242,7 +254,7 @@ class MathematicsAgent(BaseVisualizationAgent):
         except Exception as e:
             raise VisualizationError(f"内置模板匹配失败: {str(e)}")
 
-    async def generate_config(self, requirement: Dict[str, Any], template: Dict[str, Any], user_preferences: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_config(self, requirement: Dict[str, Any], template: Dict[str, Any], user_preferences: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         生成数学可视化配置
 
@@ -250,6 +262,7 @@ class MathematicsAgent(BaseVisualizationAgent):
             requirement: 数学需求
             template: 匹配的模板
             user_preferences: 用户偏好
+            deadline: 请求截止时间
 
         Returns:
             Dict: 可视化配置
@@ -290,12 +303,13 @@ class MathematicsAgent(BaseVisualizationAgent):
         except Exception as e:
             raise VisualizationError(f"配置生成失败: {str(e)}")
 
-    async def generate_visualization(self, config: Dict[str, Any]) -> str:
+    async def generate_visualization(self, config: Dict[str, Any], deadline: Optional[Deadline] = None) -> str:
         """
         生成数学可视化HTML
 
         Args:
             config: 可视化配置
+            deadline: 请求截止时间
 
         Returns:
             str: HTML内容
@@ -457,8 +471,8 @@ class MathematicsAgent(BaseVisualizationAgent):
             str: HTML内容
         """
         try:
-            # 优先使用模板引擎
-            if hasattr(self, 'template_engine') and self.template_engine:
+            # 优先使用模板引擎（降级渲染时直接使用内置模板）
+            if hasattr(self, 'template_engine') and self.template_engine and not config.get("degraded"):
                 template_id = config.get("template_id", "default")
 
                 # 准备渲染配置
@@ -490,9 +504,9 @@ class MathematicsAgent(BaseVisualizationAgent):
 
             # 使用安全的字符串替换
             html_content = template_content.replace("{title}", str(config["title"]))
-            html_content = html_content.replace("{plotly_config}", json.dumps(plotly_config, ensure_ascii=False))
-            html_content = html_content.replace("{parameters}", json.dumps(config["parameters"], ensure_ascii=False))
-            html_content = html_content.replace("{data}", json.dumps(data, ensure_ascii=False))
+            html_content = html_content.replace("{plotly_config}", dumps_str(plotly_config))
+            html_content = html_content.replace("{parameters}", dumps_str(config["parameters"]))
+            html_content = html_content.replace("{data}", dumps_str(data))
 
             return html_content
 
@@ -535,7 +549,7 @@ class MathematicsAgent(BaseVisualizationAgent):
             if dist_type == "normal":
                 mu = params.get("mu", 0)
                 sigma = params.get("sigma", 1)
-                x = np.linspace(mu - 4*sigma, mu + 4*sigma, 1000)
+                x = np.linspace(mu - 4*sigma, mu + 4*sigma, sample_count(config, 1000))
                 y = (1/(sigma * np.sqrt(2*np.pi))) * np.exp(-0.5 * ((x - mu)/sigma)**2)
 
             elif dist_type == "binomial":
@@ -547,11 +561,12 @@ class MathematicsAgent(BaseVisualizationAgent):
 
             else:
                 # 其他分布的默认实现
-                x = np.linspace(-5, 5, 100)
+                x = np.linspace(-5, 5, sample_count(config, 100))
                 y = np.exp(-x**2)  # 高斯形状
 
-            data["x"] = x.tolist() if hasattr(x, 'tolist') else x
-            data["y"] = y.tolist() if hasattr(y, 'tolist') else y
+            # numpy数组由 dumps_str 直接序列化
+            data["x"] = x
+            data["y"] = y
             data["metadata"]["type"] = dist_type
 
         return data
@@ -0,0 +1,409 @@
+"""
+万物可视化 v2.0 - 字符n-gram朴素贝叶斯分类器
+关键词全部未命中时的统计后备分类：由学科关键词表、Agent支持的主题和模板的关键词/示例训练，
+模型以紧凑的数组文件（.npz）保存，加载只需毫秒级，分类在本地完成，无网络或LLM调用
+"""
+
+from typing import Dict, List, Optional, Any, Iterable, Sequence, Tuple
+from pathlib import Path
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from services.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# 使用的n-gram长度范围（中文以字为单位，一到三字覆盖绝大多数术语）
+NGRAM_RANGE = (1, 3)
+
+# 拉普拉斯平滑系数
+SMOOTHING = 0.5
+
+# 英文单词/数字整体作为一个特征，其他（中文）连续片段提取字符n-gram；空白和ASCII标点作为分隔
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[^\x00-\x7f\s]+")
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = NGRAM_RANGE) -> List[str]:
+    """
+    提取特征：中文片段的字符n-gram（不跨越分隔符），英文单词整体作为一个特征
+
+    Args:
+        text: 输入文本
+        ngram_range: (最短, 最长) n-gram 长度
+
+    Returns:
+        List[str]: 特征列表（可能重复）
+    """
+    low, high = ngram_range
+    grams = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token.isascii():
+            grams.append(token)
+            continue
+        length = len(token)
+        for n in range(low, min(high, length) + 1):
+            grams.extend(token[i:i + n] for i in range(length - n + 1))
+    return grams
+
+
+class NgramClassifier:
+    """字符n-gram多项式朴素贝叶斯分类器"""
+
+    def __init__(
+        self,
+        subjects: Sequence[str],
+        vocabulary: Sequence[str],
+        log_likelihood: np.ndarray,
+        ngram_range: Tuple[int, int] = NGRAM_RANGE,
+        fingerprint: str = ""
+    ):
+        """
+        初始化分类器
+
+        Args:
+            subjects: 学科列表（矩阵的列）
+            vocabulary: n-gram 列表（矩阵的行）
+            log_likelihood: n-gram×学科 的对数似然矩阵
+            ngram_range: 训练时使用的 n-gram 长度范围
+            fingerprint: 训练语料指纹（用于判断模型是否过期）
+        """
+        self.subjects = list(subjects)
+        self.vocabulary: Dict[str, int] = {gram: index for index, gram in enumerate(vocabulary)}
+        self.log_likelihood = np.asarray(log_likelihood, dtype=np.float32)
+        self.ngram_range = tuple(ngram_range)
+        self.fingerprint = fingerprint
+
+    def __len__(self) -> int:
+        return len(self.vocabulary)
+
+    @classmethod
+    def train(
+        cls,
+        samples: Iterable[Tuple[str, str]],
+        subjects: Sequence[str],
+        ngram_range: Tuple[int, int] = NGRAM_RANGE,
+        smoothing: float = SMOOTHING,
+        fingerprint: str = ""
+    ) -> "NgramClassifier":
+        """
+        训练分类器（学科先验取均匀分布，训练样本数量不代表真实请求分布）
+
+        Args:
+            samples: (文本, 学科) 训练样本
+            subjects: 学科列表
+            ngram_range: n-gram 长度范围
+            smoothing: 拉普拉斯平滑系数
+            fingerprint: 训练语料指纹
+
+        Returns:
+            NgramClassifier: 训练好的分类器
+        """
+        columns = {subject: column for column, subject in enumerate(subjects)}
+        vocabulary: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+
+        for text, subject in samples:
+            column = columns.get(subject)
+            if column is None:
+                continue
+            for gram in char_ngrams(text, ngram_range):
+                rows.append(vocabulary.setdefault(gram, len(vocabulary)))
+                cols.append(column)
+
+        counts = np.zeros((len(vocabulary), len(subjects)), dtype=np.float64)
+        np.add.at(counts, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)), 1.0)
+
+        totals = counts.sum(axis=0) + smoothing * max(1, len(vocabulary))
+        log_likelihood = np.log(counts + smoothing) - np.log(totals)
+
+        return cls(subjects, list(vocabulary), log_likelihood, ngram_range, fingerprint)
+
+    @classmethod
+    def load(cls, path: Path) -> "NgramClassifier":
+        """
+        从 .npz 文件加载
+
+        Args:
+            path: 模型文件路径
+
+        Returns:
+            NgramClassifier: 分类器
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["subjects"].tolist(),
+                data["vocabulary"].tolist(),
+                data["log_likelihood"],
+                tuple(data["ngram_range"].tolist()),
+                str(data["fingerprint"])
+            )
+
+    def save(self, path: Path) -> None:
+        """
+        保存为压缩的 .npz 文件（每次写入独立的临时文件再 os.replace，
+        多个worker同时训练保存时不会互相覆盖临时文件，读取方只会看到完整的文件）
+
+        Args:
+            path: 模型文件路径
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    subjects=np.array(self.subjects),
+                    vocabulary=np.array(list(self.vocabulary)),
+                    log_likelihood=self.log_likelihood,
+                    ngram_range=np.array(self.ngram_range),
+                    fingerprint=np.array(self.fingerprint)
+                )
+            os.chmod(tmp_name, 0o644)
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _known_grams(self, text: str) -> Tuple[List[int], int]:
+        """文本中出现在词表里的特征ID，以及其中长度大于1的个数（单字证据不足以单独判断）"""
+        vocabulary = self.vocabulary
+        ids = []
+        multi_char = 0
+        for gram in char_ngrams(text, self.ngram_range):
+            index = vocabulary.get(gram)
+            if index is not None:
+                ids.append(index)
+                if len(gram) > 1:
+                    multi_char += 1
+        return ids, multi_char
+
+    @staticmethod
+    def _posterior(log_scores: np.ndarray, gram_counts: Any) -> np.ndarray:
+        """
+        对数得分 -> 后验概率（按行softmax）
+
+        相互重叠的n-gram并不独立，直接相加会使后验概率几乎总接近1；
+        对数得分除以 sqrt(命中的n-gram数) 作为温度校准，使阈值有区分度。
+        """
+        log_scores = log_scores / np.sqrt(np.maximum(gram_counts, 1))
+        shifted = log_scores - log_scores.max(axis=-1, keepdims=True)
+        weights = np.exp(shifted)
+        return weights / weights.sum(axis=-1, keepdims=True)
+
+    def predict(self, text: str) -> Optional[Tuple[str, float]]:
+        """
+        预测单个文本的学科
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            Optional[Tuple[str, float]]: (学科, 校准后的后验概率)；没有命中任何多字 n-gram 时为 None（证据不足）
+        """
+        ids, multi_char = self._known_grams(text)
+        if not multi_char:
+            return None
+        posterior = self._posterior(self.log_likelihood[ids].sum(axis=0), len(ids))
+        best = int(posterior.argmax())
+        return self.subjects[best], float(posterior[best])
+
+    def predict_many(self, texts: Sequence[str]) -> List[Optional[Tuple[str, float]]]:
+        """
+        批量预测（n-gram 命中汇总后用一次矩阵运算得到所有文本的后验）
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            List[Optional[Tuple[str, float]]]: 与输入顺序一致的预测结果
+        """
+        rows: List[int] = []
+        columns: List[int] = []
+        evident = np.zeros(len(texts), dtype=bool)
+        for row, text in enumerate(texts):
+            ids, multi_char = self._known_grams(text)
+            rows.extend([row] * len(ids))
+            columns.extend(ids)
+            evident[row] = multi_char > 0
+
+        if not evident.any():
+            return [None] * len(texts)
+
+        rows_array = np.asarray(rows, dtype=np.int64)
+        hits = self.log_likelihood[np.asarray(columns, dtype=np.int64)]
+        log_scores = np.column_stack([
+            np.bincount(rows_array, weights=hits[:, column], minlength=len(texts))
+            for column in range(len(self.subjects))
+        ])
+        gram_counts = np.bincount(rows_array, minlength=len(texts))
+        posterior = self._posterior(log_scores, gram_counts[:, None])
+        best = posterior.argmax(axis=1)
+
+        return [
+            (self.subjects[best[row]], float(posterior[row, best[row]])) if evident[row] else None
+            for row in range(len(texts))
+        ]
+
+
+def agent_sources(agents: Any) -> Dict[str, Path]:
+    """
+    各学科Agent类所在的源文件（Agent的主题、概念和内置模板都定义在其中）
+
+    注册表按登记信息定位模块文件，不导入模块也不创建Agent；其他映射按已有实例的类定位
+
+    Args:
+        agents: 学科 -> Agent 的映射（AgentRegistry 或普通字典）
+
+    Returns:
+        Dict[str, Path]: 学科 -> 源文件
+    """
+    if hasattr(agents, "specs"):
+        modules = {subject: spec.partition(":")[0] for subject, spec in agents.specs().items()}
+    else:
+        modules = {subject: type(agent).__module__ for subject, agent in agents.items()}
+
+    sources = {}
+    for subject, module_name in modules.items():
+        try:
+            module_spec = importlib.util.find_spec(module_name)
+        except (ImportError, ValueError):
+            module_spec = None
+        if module_spec is not None and module_spec.origin and Path(module_spec.origin).is_file():
+            sources[subject] = Path(module_spec.origin)
+    return sources
+
+
+def corpus_fingerprint(
+    subject_keywords: Dict[str, List[str]],
+    templates_dir: Optional[Path] = None,
+    agents: Optional[Any] = None
+) -> str:
+    """
+    训练语料指纹：学科关键词表、Agent源文件或模板文件变化后需要重新训练
+
+    Args:
+        subject_keywords: 学科 -> 关键词列表
+        templates_dir: 模板目录
+        agents: 学科 -> Agent 的映射（只读取源文件信息，不创建Agent）
+
+    Returns:
+        str: 指纹
+    """
+    digest = hashlib.sha1(json.dumps(subject_keywords, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    if agents is not None:
+        for subject, source in sorted(agent_sources(agents).items()):
+            stat = source.stat()
+            digest.update(f"{subject}:{source.name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    if templates_dir is not None and Path(templates_dir).is_dir():
+        for json_file in sorted(Path(templates_dir).glob("*/*.json")):
+            stat = json_file.stat()
+            digest.update(f"{json_file.name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _texts(value: Any) -> List[str]:
+    """把配置中的字符串/列表/字典展开为文本列表"""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        return [text for item in value.values() for text in _texts(item)]
+    if isinstance(value, (list, tuple)):
+        return [text for item in value for text in _texts(item)]
+    return []
+
+
+def training_corpus(
+    subject_keywords: Dict[str, List[str]],
+    agents: Optional[Any] = None,
+    templates_dir: Optional[Path] = None
+) -> List[Tuple[str, str]]:
+    """
+    构建训练语料
+
+    Args:
+        subject_keywords: 分类器的学科关键词表
+        agents: 学科 -> Agent 的映射（使用其支持的主题、概念、关键词和内置模板名称）
+        templates_dir: 模板目录（<学科>/<模板>.json，使用 keywords/examples/name/description）
+
+    Returns:
+        List[Tuple[str, str]]: (文本, 学科) 样本
+    """
+    samples = [(keyword, subject) for subject, keywords in subject_keywords.items() for keyword in keywords]
+
+    for subject in list(agents or ()):
+        try:
+            agent = agents[subject]
+            texts = _texts(agent.get_supported_topics())
+            texts += _texts(agent.config.get("supported_concepts"))
+            texts += _texts(agent.config.get("keywords"))
+            for template in agent.templates.values():
+                if isinstance(template, dict):
+                    texts += _texts([template.get("name"), template.get("description")])
+        except Exception as e:
+            logger.warning("读取Agent训练语料失败", subject=subject, error=str(e))
+            continue
+        samples.extend((text, subject) for text in texts)
+
+    if templates_dir is not None and Path(templates_dir).is_dir():
+        for json_file in Path(templates_dir).glob("*/*.json"):
+            try:
+                template = json.loads(json_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                logger.warning("读取模板训练语料失败", path=str(json_file), error=str(e))
+                continue
+            subject = template.get("subject") or json_file.parent.name
+            texts = _texts([template.get(field) for field in ("name", "description", "keywords", "examples")])
+            samples.extend((text, subject) for text in texts)
+
+    return samples
+
+
+def build_classifier(
+    subject_keywords: Dict[str, List[str]],
+    agents: Optional[Any] = None,
+    templates_dir: Optional[Path] = None
+) -> NgramClassifier:
+    """
+    由关键词表、Agent和模板训练分类器
+
+    Args:
+        subject_keywords: 分类器的学科关键词表
+        agents: 学科 -> Agent 的映射
+        templates_dir: 模板目录
+
+    Returns:
+        NgramClassifier: 训练好的分类器
+    """
+    samples = training_corpus(subject_keywords, agents, templates_dir)
+    return NgramClassifier.train(
+        samples,
+        list(subject_keywords),
+        fingerprint=corpus_fingerprint(subject_keywords, templates_dir, agents)
+    )
+
+
+if __name__ == "__main__":
+    # 重新训练并保存模型：python -m agents.ngram_classifier
+    import time
+
+    from config import settings
+    from agents.agent_registry import AgentRegistry
+    from agents.router_manager import SubjectClassifier
+
+    started = time.perf_counter()
+    classifier = build_classifier(SubjectClassifier().subject_keywords, AgentRegistry(), settings.TEMPLATES_DIR)
+    classifier.save(settings.FALLBACK_CLASSIFIER_PATH)
+    elapsed = time.perf_counter() - started
+    size = settings.FALLBACK_CLASSIFIER_PATH.stat().st_size
+    print(f"✅ 已保存 {settings.FALLBACK_CLASSIFIER_PATH}（{len(classifier)} 个n-gram，{size / 1024:.1f} KB，{elapsed * 1000:.0f} ms）")
@@ -4,10 +4,12 @@
 """
 
 from typing import Dict, List, Optional, Any
-import json
 import math
 import numpy as np
 from .base_agent import BaseVisualizationAgent, VisualizationError, RequirementParseError
+from services.fast_json import dumps_str
+from services.deadline import Deadline, sample_count
+from .prompt_analysis import PromptAnalysis
 
 class PhysicsAgent(BaseVisualizationAgent):
     """物理学科可视化Agent"""
@@ -38,17 +40,26 @@ class PhysicsAgent(BaseVisualizationAgent):
             }
         })
 
-    async def parse_requirement(self, prompt: str) -> Dict[str, Any]:
+    async def parse_requirement(
+        self,
+        prompt: str,
+        deadline: Optional[Deadline] = None,
+        analysis: Optional[PromptAnalysis] = None
+    ) -> Dict[str, Any]:
         """
         解析物理需求
 
         Args:
             prompt: 用户输入的物理需求描述
+            deadline: 请求截止时间
+            analysis: 提示词分析结果（路由器传入时复用其归一化文本、数字和关键词命中）
 
         Returns:
             Dict: 解析后的物理需求结构
         """
         try:
+            analysis = self._analyze(prompt, analysis)
+
             requirement = {
                 "subject": "physics",
                 "original": prompt,
@@ -74,14 +85,14 @@ class PhysicsAgent(BaseVisualizationAgent):
             }
 
             for field, patterns in field_patterns.items():
-                if any(pattern in prompt for pattern in patterns):
+                if any(analysis.mentions(pattern) for pattern in patterns):
                     requirement["field"] = field
                     break
 
             # 2. 识别具体物理概念
             for field, concepts in self.config["supported_concepts"].items():
                 for concept in concepts:
-                    if concept in prompt:
+                    if analysis.mentions(concept):
                         requirement["concept_type"] = concept
                         requirement["field"] = field
                         break
@@ -99,12 +110,12 @@ class PhysicsAgent(BaseVisualizationAgent):
             }
 
             for concept, patterns in concept_patterns.items():
-                if any(pattern in prompt for pattern in patterns):
+                if any(analysis.mentions(pattern) for pattern in patterns):
                     requirement["concept_type"] = concept
                     break
 
             # 4. 提取数值参数
-            numbers = self._extract_numbers(prompt)
+            numbers = list(analysis.numbers)
             if numbers:
                 requirement["numbers"] = numbers
 
@@ -146,7 +157,7 @@ class PhysicsAgent(BaseVisualizationAgent):
             }
 
             for condition, patterns in condition_patterns.items():
-                if any(pattern in prompt for pattern in patterns):
+                if any(analysis.mentions(pattern) for pattern in patterns):
                     requirement["conditions"].append(condition)
 
             # 6. 提取变量和参数名称
@@ -171,19 +182,20 @@ class PhysicsAgent(BaseVisualizationAgent):
                 all_keywords.extend(patterns)
             all_keywords.extend(list(concept_patterns.keys()))
 
-            requirement["keywords"] = self._extract_keywords(prompt, all_keywords)
+            requirement["keywords"] = self._extract_keywords(analysis, all_keywords)
 
             return requirement
 
         except Exception as e:
             raise RequirementParseError(f"物理需求解析失败: {str(e)}")
 
-    async def match_template(self, requirement: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def match_template(self, requirement: Dict[str, Any], deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
         """
         匹配物理模板
 
         Args:
             requirement: 解析后的物理需求
+            deadline: 请求截止时间
 
         Returns:
             Dict: 匹配的模板配置
@@ -210,7 +222,7 @@ class PhysicsAgent(BaseVisualizationAgent):
         except Exception as e:
             raise VisualizationError(f"模板匹配失败: {str(e)}")
 
-    async def generate_config(self, requirement: Dict[str, Any], template: Dict[str, Any], user_preferences: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_config(self, requirement: Dict[str, Any], template: Dict[str, Any], user_preferences: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         生成物理可视化配置
 
@@ -218,6 +230,7 @@ class PhysicsAgent(BaseVisualizationAgent):
             requirement: 物理需求
             template: 匹配的模板
             user_preferences: 用户偏好
+            deadline: 请求截止时间
 
         Returns:
             Dict: 可视化配置
@@ -288,20 +301,23 @@ class PhysicsAgent(BaseVisualizationAgent):
         except Exception as e:
             raise VisualizationError(f"配置生成失败: {str(e)}")
 
-    async def generate_visualization(self, config: Dict[str, Any]) -> str:
+    async def generate_visualization(self, config: Dict[str, Any], deadline: Optional[Deadline] = None) -> str:
         """
         生成物理可视化HTML
 
         Args:
             config: 可视化配置
+            deadline: 请求截止时间
 
         Returns:
             str: HTML内容
         """
         try:
-            # 获取模板HTML
+            # 获取模板HTML（降级渲染时直接使用内置默认模板）
             template_id = config.get("template_id", "physics_general")
-            template_content = self.templates.get(template_id, {}).get("html_template")
+            template_content = None
+            if not config.get("degraded"):
+                template_content = self.templates.get(template_id, {}).get("html_template")
 
             if not template_content:
                 template_content = self._get_default_physics_template()
@@ -315,9 +331,9 @@ class PhysicsAgent(BaseVisualizationAgent):
             # 渲染HTML
             html_content = template_content.format(
                 title=config["title"],
-                plotly_config=json.dumps(plotly_config, ensure_ascii=False),
-                parameters=json.dumps(config["parameters"], ensure_ascii=False),
-                data=json.dumps(data, ensure_ascii=False)
+                plotly_config=dumps_str(plotly_config),
+                parameters=dumps_str(config["parameters"]),
+                data=dumps_str(data)
             )
 
             return html_content
@@ -374,14 +390,14 @@ class PhysicsAgent(BaseVisualizationAgent):
 
             # 计算飞行时间
             t_total = 2 * vy / g
-            t = np.linspace(0, t_total, 100)
+            t = np.linspace(0, t_total, sample_count(config, 100))
 
             x = vx * t
             y = vy * t - 0.5 * g * t**2
 
-            data["time"] = t.tolist()
-            data["position"] = {"x": x.tolist(), "y": y.tolist()}
-            data["velocity"] = {"x": [vx] * len(t), "y": (vy - g * t).tolist()}
+            data["time"] = t
+            data["position"] = {"x": x, "y": y}
+            data["velocity"] = {"x": [vx] * len(t), "y": vy - g * t}
             data["metadata"]["type"] = "projectile"
 
         elif concept_type == "简谐振动":
@@ -390,13 +406,13 @@ class PhysicsAgent(BaseVisualizationAgent):
             frequency = params.get("frequency", 1)  # 频率 Hz
             omega = 2 * math.pi * frequency  # 角频率
 
-            t = np.linspace(0, 10, 200)
+            t = np.linspace(0, 10, sample_count(config, 200))
             x = amplitude * np.sin(omega * t)
             v = amplitude * omega * np.cos(omega * t)
 
-            data["time"] = t.tolist()
-            data["position"] = {"x": t.tolist(), "y": x.tolist()}
-            data["velocity"] = {"x": t.tolist(), "y": v.tolist()}
+            data["time"] = t
+            data["position"] = {"x": t, "y": x}
+            data["velocity"] = {"x": t, "y": v}
             data["metadata"]["type"] = "oscillation"
 
         elif concept_type == "圆周运动":
@@ -404,26 +420,26 @@ class PhysicsAgent(BaseVisualizationAgent):
             radius = params.get("radius", 2)  # 半径 m
             angular_velocity = params.get("angular_velocity", 1)  # 角速度 rad/s
 
-            t = np.linspace(0, 4 * math.pi / angular_velocity, 100)
+            t = np.linspace(0, 4 * math.pi / angular_velocity, sample_count(config, 100))
             x = radius * np.cos(angular_velocity * t)
             y = radius * np.sin(angular_velocity * t)
 
             vx = -radius * angular_velocity * np.sin(angular_velocity * t)
             vy = radius * angular_velocity * np.cos(angular_velocity * t)
 
-            data["time"] = t.tolist()
-            data["position"] = {"x": x.tolist(), "y": y.tolist()}
-            data["velocity"] = {"x": vx.tolist(), "y": vy.tolist()}
+            data["time"] = t
+            data["position"] = {"x": x, "y": y}
+            data["velocity"] = {"x": vx, "y": vy}
             data["metadata"]["type"] = "circular"
 
         else:
             # 默认物理数据
-            t = np.linspace(0, 10, 100)
+            t = np.linspace(0, 10, sample_count(config, 100))
             x = np.sin(t)
             y = np.cos(t)
 
-            data["time"] = t.tolist()
-            data["position"] = {"x": x.tolist(), "y": y.tolist()}
+            data["time"] = t
+            data["position"] = {"x": x, "y": y}
             data["metadata"]["type"] = "general"
 
         return data
@@ -0,0 +1,108 @@
+"""
+万物可视化 v2.0 - 提示词分析结果
+每个请求只分析一次提示词（小写归一化、数字提取、关键词命中及位置、学科得分），
+由路由器传给学科Agent复用，避免各阶段重复扫描
+"""
+
+from typing import Dict, List, Optional, Any, Container, Iterable, Tuple
+import re
+
+# 整数、小数、负数、科学计数法
+NUMBER_PATTERN = re.compile(r'[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?')
+
+
+def extract_numbers(text: str) -> List[float]:
+    """
+    从文本中提取数字
+
+    Args:
+        text: 输入文本
+
+    Returns:
+        List[float]: 提取的数字列表
+    """
+    return [float(num) for num in NUMBER_PATTERN.findall(text)]
+
+
+class PromptAnalysis:
+    """提示词分析结果 - 一次请求内共享，各字段视为只读"""
+
+    __slots__ = (
+        "original", "text", "numbers", "hits", "scores", "subject", "fallback_probability",
+        "_vocabulary", "_matched"
+    )
+
+    def __init__(
+        self,
+        prompt: str,
+        hits: Iterable[Tuple[int, int, str]] = (),
+        scores: Optional[Dict[str, int]] = None,
+        subject: Optional[str] = None,
+        vocabulary: Container[str] = (),
+        fallback_probability: Optional[float] = None
+    ):
+        """
+        初始化分析结果
+
+        Args:
+            prompt: 原始提示词
+            hits: 关键词命中 (起始位置, 结束位置（不含）, 小写关键词)，按结束位置排列
+            scores: 学科 -> 得分
+            subject: 分类结果
+            vocabulary: 已完整扫描过的小写关键词集合（其中的词是否出现直接由 hits 判断）
+            fallback_probability: 关键词未命中、由统计分类器判断学科时的后验概率
+        """
+        self.original = prompt
+        self.text = prompt.lower()
+        self.numbers = extract_numbers(prompt)
+        self.hits: List[Tuple[int, int, str]] = list(hits)
+        self.scores: Dict[str, int] = scores or {}
+        self.subject = subject
+        self.fallback_probability = fallback_probability
+        self._vocabulary = vocabulary
+        self._matched = {keyword for _, _, keyword in self.hits}
+
+    def mentions(self, keyword: str) -> bool:
+        """
+        关键词是否出现在提示词中（不区分大小写）
+
+        已扫描的关键词直接查命中集合，其他关键词在归一化文本中查找
+
+        Args:
+            keyword: 关键词
+
+        Returns:
+            bool: 是否出现
+        """
+        keyword = keyword.lower()
+        if keyword in self._matched:
+            return True
+        if keyword in self._vocabulary:
+            return False
+        return keyword in self.text
+
+    def matched(self, keywords: Iterable[str]) -> List[str]:
+        """
+        按给定顺序筛选出现在提示词中的关键词
+
+        Args:
+            keywords: 关键词列表
+
+        Returns:
+            List[str]: 出现过的关键词（保持原样）
+        """
+        return [keyword for keyword in keywords if self.mentions(keyword)]
+
+    def positions(self, keyword: str) -> List[Tuple[int, int]]:
+        """已扫描关键词在归一化文本中的出现位置 [(起始, 结束)]"""
+        keyword = keyword.lower()
+        return [(start, end) for start, end, hit in self.hits if hit == keyword]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "subject": self.subject,
+            "scores": dict(self.scores),
+            "fallback_probability": self.fallback_probability,
+            "numbers": list(self.numbers),
+            "hits": [{"keyword": keyword, "start": start, "end": end} for start, end, keyword in self.hits]
+        }
@@ -3,16 +3,34 @@
 方案A核心组件：负责将用户请求智能路由到合适的学科Agent
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable, Sequence, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
 import asyncio
+import contextvars
+import json
+import logging
 import re
+import threading
+import time
 from datetime import datetime
 
-from .mathematics_agent import MathematicsAgent
-from .astronomy_agent import AstronomyAgent
-from .physics_agent import PhysicsAgent
-from .chemistry_agent import ChemistryAgent
-from .biology_agent import BiologyAgent
+from services.structured_logging import get_logger
+from services.metrics import LatencyHistogram, stage_metrics, timed_stage
+from services.generation_scheduler import GenerationCancelled
+from services.deadline import Deadline, DEGRADED_SAMPLING, is_tight
+from services.request_coalescer import make_request_key
+from services.render_cache import RenderCache
+
+from .agent_registry import AgentRegistry
+from .keyword_automaton import KeywordAutomaton
+from .prompt_analysis import PromptAnalysis
+from .composite_page import compose_panels, subject_name
+
+logger = get_logger(__name__)
+
+# 置信度中的证据先验：最高分等于该值时证据项为0.5（约一个高优先级关键词）
+CONFIDENCE_PRIOR = 3.0
 
 class SubjectClassifier:
     """智能学科分类器"""
@@ -122,6 +140,105 @@ class SubjectClassifier:
             }
         }
 
+        # 关键词表编译为自动机，分类时单次扫描提示词
+        self.automaton = self.build_automaton()
+
+        # 批量分类用的 关键词×学科 权重矩阵（首次批量分类时按当前自动机构建）
+        self._weight_matrix = None
+
+        # 关键词全部未命中时的统计后备分类器（首次需要时加载或训练，见 set_fallback）
+        self.fallback_enabled = True
+        self.fallback_path: Optional[Path] = None
+        self.fallback_min_probability = 0.6
+        self.fallback_agents = None
+        self.fallback_templates_dir: Optional[Path] = None
+        self._fallback = None
+        self._fallback_loaded = False
+        self._fallback_lock = threading.Lock()
+        self.fallback_stats = {"predicted": 0, "undecided": 0}
+
+    def keyword_weight(self, subject: str, keyword: str) -> int:
+        """关键词得分：高优先级3分，中优先级2分，其他1分"""
+        weights = self.subject_weights.get(subject)
+        if weights is None:
+            return 1
+        if keyword in weights["high_priority"]:
+            return 3
+        if keyword in weights["medium_priority"]:
+            return 2
+        return 1
+
+    def build_automaton(self) -> KeywordAutomaton:
+        """
+        把关键词表编译为自动机（修改 subject_keywords / subject_weights 后需重新编译）
+
+        终止节点的负载为 (学科, 权重, 关键词在该学科列表中的序号)；
+        关键词按小写匹配，同一关键词在多个学科（或同一学科重复）出现时各自计分，与逐个扫描一致。
+
+        Returns:
+            KeywordAutomaton: 编译后的自动机
+        """
+        return KeywordAutomaton(
+            (keyword.lower(), (subject, self.keyword_weight(subject, keyword), index))
+            for subject, keywords in self.subject_keywords.items()
+            for index, keyword in enumerate(keywords)
+        )
+
+    def score(self, prompt: str) -> Dict[str, int]:
+        """
+        计算各学科得分（每个出现过的关键词按权重计分一次）
+
+        Args:
+            prompt: 用户输入的文本
+
+        Returns:
+            Dict[str, int]: 学科 -> 得分，按 subject_keywords 的顺序排列
+        """
+        scores = dict.fromkeys(self.subject_keywords, 0)
+        payloads = self.automaton.payloads
+        for pattern_id in self.automaton.find(prompt.lower()):
+            for subject, weight, _ in payloads[pattern_id]:
+                scores[subject] += weight
+        return scores
+
+    def analyze(self, prompt: str) -> PromptAnalysis:
+        """
+        分析提示词：单次扫描得到关键词命中位置和各学科得分，并完成分类
+
+        结果由路由器传给学科Agent，整个请求只分析一次。
+
+        Args:
+            prompt: 用户输入的文本
+
+        Returns:
+            PromptAnalysis: 分析结果（subject 为分类结果）
+        """
+        scores = dict.fromkeys(self.subject_keywords, 0)
+        hits: List[Tuple[int, int, str]] = []
+        counted = set()
+        patterns = self.automaton.patterns
+        payloads = self.automaton.payloads
+
+        for end, pattern_ids in self.automaton.iter_matches(prompt.lower()):
+            for pattern_id in pattern_ids:
+                keyword = patterns[pattern_id]
+                hits.append((end - len(keyword), end, keyword))
+                # 每个关键词只计分一次
+                if pattern_id not in counted:
+                    counted.add(pattern_id)
+                    for subject, weight, _ in payloads[pattern_id]:
+                        scores[subject] += weight
+
+        subject, fallback_probability = self.resolve(prompt, scores)
+        return PromptAnalysis(
+            prompt,
+            hits=hits,
+            scores=scores,
+            subject=subject,
+            vocabulary=self.automaton,
+            fallback_probability=fallback_probability
+        )
+
     async def classify(self, prompt: str) -> str:
         """
         分类输入文本到对应学科
@@ -132,38 +249,39 @@ class SubjectClassifier:
         Returns:
             str: 分类结果 (mathematics, astronomy, physics, chemistry, biology, general)
         """
-        try:
-            prompt_lower = prompt.lower()
-            scores = {}
-            detailed_scores = {}
-
-            # 计算每个学科的得分
-            for subject, keywords in self.subject_keywords.items():
-                score = 0
-                matched_keywords = []
-
-                # 基础关键词匹配
-                for keyword in keywords:
-                    if keyword.lower() in prompt_lower:
-                        # 高优先级词汇权重更高
-                        if subject in self.subject_weights:
-                            if keyword in self.subject_weights[subject]["high_priority"]:
-                                score += 3
-                            elif keyword in self.subject_weights[subject]["medium_priority"]:
-                                score += 2
-                            else:
-                                score += 1
-                        else:
-                            score += 1
-                        matched_keywords.append(keyword)
-
-                scores[subject] = score
-                detailed_scores[subject] = {
-                    "score": score,
-                    "matched_keywords": matched_keywords
-                }
+        # 单次扫描计算每个学科的得分，全部未命中时由统计分类器判断
+        return self.resolve(prompt, self.score(prompt))[0]
+
+    def resolve(self, prompt: str, scores: Dict[str, int]) -> Tuple[str, Optional[float]]:
+        """
+        确定分类结果：有关键词命中时按得分选取，否则尝试统计后备分类
+
+        Args:
+            prompt: 用户输入的文本
+            scores: 学科 -> 关键词得分
+
+        Returns:
+            Tuple[str, Optional[float]]: (学科, 统计分类的后验概率；按关键词分类时为 None)
+        """
+        subject = self.pick_subject(prompt, scores)
+        if subject == "general" and self.fallback_enabled:
+            guess = self.fallback_subject(prompt)
+            if guess is not None:
+                return guess
+        return subject, None
+
+    def pick_subject(self, prompt: str, scores: Dict[str, int]) -> str:
+        """
+        根据各学科得分选出分类结果
 
-            # 找出得分最高的学科
+        Args:
+            prompt: 用户输入的文本（用于调试日志）
+            scores: 学科 -> 得分
+
+        Returns:
+            str: 得分最高的学科（同分时取 subject_keywords 中靠前的学科），全为0时为general
+        """
+        try:
             if max(scores.values()) == 0:
                 return "general"
 
@@ -173,147 +291,937 @@ class SubjectClassifier:
             if best_subject[1] < 1:
                 return "general"
 
-            # 记录分类详细信息（用于调试）
-            self._log_classification(prompt, detailed_scores)
+            # 记录分类详细信息（用于调试，只在DEBUG级别启用时收集）
+            if logger.is_enabled(logging.DEBUG):
+                self._log_classification(prompt, self._detailed_scores(prompt, scores))
 
             return best_subject[0]
 
         except Exception as e:
-            print(f"学科分类错误: {str(e)}")
+            logger.error("学科分类错误", error=str(e))
             return "general"
 
+    @staticmethod
+    def confidence(scores: Dict[str, int]) -> float:
+        """
+        由各学科得分推导分类置信度
+
+        置信度 = 最高分占总分的比例 × 证据强度 top / (top + CONFIDENCE_PRIOR)：
+        命中关键词集中在一个学科且数量越多越接近1，没有命中时为0。
+
+        Args:
+            scores: 学科 -> 得分
+
+        Returns:
+            float: 0~1 之间的置信度
+        """
+        top = max(scores.values(), default=0)
+        if top <= 0:
+            return 0.0
+        return round(top / sum(scores.values()) * top / (top + CONFIDENCE_PRIOR), 4)
+
+    def describe(
+        self,
+        subject: str,
+        scores: Dict[str, int],
+        fallback_probability: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        构建分类结果
+
+        Args:
+            subject: 分类结果
+            scores: 学科 -> 得分
+            fallback_probability: 统计后备分类的后验概率（由统计分类器判断时）
+
+        Returns:
+            Dict: subject、method（keywords / ngram / none）、confidence、
+                scores（原始得分）和 all_scores（各学科得分占比）
+        """
+        total = sum(scores.values())
+        if fallback_probability is not None:
+            method, confidence = "ngram", round(fallback_probability, 4)
+        else:
+            method, confidence = ("keywords" if total else "none"), self.confidence(scores)
+        return {
+            "subject": subject,
+            "method": method,
+            "confidence": confidence,
+            "scores": dict(scores),
+            "all_scores": {
+                name: round(score / total, 4) if total else 0.0
+                for name, score in scores.items()
+            }
+        }
+
+    def weight_matrix(self):
+        """关键词×学科 权重矩阵（同一关键词在多个学科或重复出现时权重累加，与逐个计分一致）"""
+        cached = self._weight_matrix
+        if cached is not None and cached[0] is self.automaton:
+            return cached[1]
+
+        import numpy as np
+
+        subjects = {subject: column for column, subject in enumerate(self.subject_keywords)}
+        matrix = np.zeros((len(self.automaton), len(subjects)), dtype=np.int64)
+        for pattern_id, payloads in enumerate(self.automaton.payloads):
+            for subject, weight, _ in payloads:
+                matrix[pattern_id, subjects[subject]] += weight
+
+        self._weight_matrix = (self.automaton, matrix)
+        return matrix
+
+    def classify_many(self, prompts: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        批量分类：共享同一自动机逐条扫描出命中的关键词，
+        再用 numpy 一次性计算 提示词×学科 得分矩阵、分类结果和置信度
+
+        Args:
+            prompts: 提示词列表
+
+        Returns:
+            List[Dict]: 与输入顺序一致的分类结果（格式同 describe），分类规则与 classify 相同
+        """
+        if not prompts:
+            return []
+
+        import numpy as np
+
+        subjects = list(self.subject_keywords)
+
+        # 1. 命中矩阵的稀疏表示：(提示词序号, 关键词ID)
+        rows: List[int] = []
+        columns: List[int] = []
+        find = self.automaton.find
+        for row, prompt in enumerate(prompts):
+            found = find(prompt.lower())
+            rows.extend([row] * len(found))
+            columns.extend(found)
+
+        # 2. 得分矩阵 = 命中矩阵 × 权重矩阵（按学科逐列累加）
+        weights = self.weight_matrix()
+        rows_array = np.asarray(rows, dtype=np.int64)
+        hit_weights = weights[np.asarray(columns, dtype=np.int64)]
+        scores = np.column_stack([
+            np.bincount(rows_array, weights=hit_weights[:, column], minlength=len(prompts))
+            for column in range(len(subjects))
+        ]).astype(np.int64)
+
+        # 3. 分类结果（argmax 取第一个最大值，与 classify 同分时的选取一致）和置信度
+        top = scores.max(axis=1)
+        total = scores.sum(axis=1)
+        best = scores.argmax(axis=1)
+        safe_total = np.maximum(total, 1)
+        confidence = np.where(top > 0, top / safe_total * top / (top + CONFIDENCE_PRIOR), 0.0)
+        shares = scores / safe_total[:, None]
+
+        # 4. 没有关键词命中的提示词批量交给统计后备分类器
+        guesses: Dict[int, Tuple[str, float]] = {}
+        unmatched = np.flatnonzero(top == 0).tolist()
+        if unmatched and self.fallback_enabled:
+            predicted = self.fallback_subject_many([prompts[row] for row in unmatched])
+            guesses = {row: guess for row, guess in zip(unmatched, predicted) if guess is not None}
+
+        results = []
+        for row in range(len(prompts)):
+            guess = guesses.get(row)
+            if guess is not None:
+                subject, method, row_confidence = guess[0], "ngram", round(guess[1], 4)
+            elif top[row] > 0:
+                subject, method, row_confidence = subjects[best[row]], "keywords", round(float(confidence[row]), 4)
+            else:
+                subject, method, row_confidence = "general", "none", 0.0
+            results.append({
+                "subject": subject,
+                "method": method,
+                "confidence": row_confidence,
+                "scores": dict(zip(subjects, scores[row].tolist())),
+                "all_scores": dict(zip(subjects, np.round(shares[row], 4).tolist()))
+            })
+        return results
+
+    def set_fallback(
+        self,
+        path: Optional[Path] = None,
+        min_probability: float = 0.6,
+        templates_dir: Optional[Path] = None,
+        enabled: bool = True
+    ) -> None:
+        """
+        配置统计后备分类器（之前加载的模型会在下次使用时按新配置重新加载）
+
+        Args:
+            path: 模型文件（.npz）；不存在或训练语料已变化时重新训练并保存，None 时只在内存中训练
+            min_probability: 后验概率低于该值时仍判为general
+            templates_dir: 模板目录（模板的关键词/示例参与训练）
+            enabled: 是否启用
+        """
+        with self._fallback_lock:
+            self.fallback_enabled = enabled
+            self.fallback_path = Path(path) if path else None
+            self.fallback_min_probability = min_probability
+            self.fallback_templates_dir = Path(templates_dir) if templates_dir else None
+            self._fallback = None
+            self._fallback_loaded = False
+
+    def fallback_model(self):
+        """
+        统计后备分类器（首次调用时从模型文件加载，文件缺失或过期时训练并保存）
+
+        加载和训练都是同步的（训练需创建所有学科Agent），服务启动时应在线程中预先调用，
+        避免第一个未命中关键词的请求在事件循环中训练
+
+        Returns:
+            Optional[NgramClassifier]: 分类器，加载和训练都失败时为 None
+        """
+        if self._fallback_loaded:
+            return self._fallback
+
+        with self._fallback_lock:
+            if self._fallback_loaded:
+                return self._fallback
+            try:
+                from .ngram_classifier import NgramClassifier, build_classifier, corpus_fingerprint
+
+                fingerprint = corpus_fingerprint(self.subject_keywords, self.fallback_templates_dir, self.fallback_agents)
+                model = None
+                if self.fallback_path is not None and self.fallback_path.exists():
+                    model = NgramClassifier.load(self.fallback_path)
+                    if model.fingerprint != fingerprint:
+                        logger.info("统计分类模型已过期，重新训练", path=str(self.fallback_path))
+                        model = None
+                if model is None:
+                    model = build_classifier(self.subject_keywords, self.fallback_agents, self.fallback_templates_dir)
+                    if self.fallback_path is not None:
+                        model.save(self.fallback_path)
+                    logger.info("统计分类模型已训练", ngrams=len(model), path=str(self.fallback_path))
+                self._fallback = model
+            except Exception as e:
+                logger.warning("统计分类模型不可用，未命中关键词的提示词将判为general", error=str(e))
+                self._fallback = None
+            self._fallback_loaded = True
+            return self._fallback
+
+    def fallback_subject(self, prompt: str) -> Optional[Tuple[str, float]]:
+        """
+        统计后备分类（只用于关键词全部未命中的提示词）
+
+        Args:
+            prompt: 用户输入的文本
+
+        Returns:
+            Optional[Tuple[str, float]]: (学科, 后验概率)；证据不足或概率低于阈值时为 None
+        """
+        model = self.fallback_model()
+        guess = model.predict(prompt) if model is not None else None
+        return self._accept_guess(prompt, guess)
+
+    def fallback_subject_many(self, prompts: Sequence[str]) -> List[Optional[Tuple[str, float]]]:
+        """批量统计后备分类（一次矩阵运算），结果含义同 fallback_subject"""
+        model = self.fallback_model()
+        if model is None:
+            return [None] * len(prompts)
+        return [self._accept_guess(prompt, guess) for prompt, guess in zip(prompts, model.predict_many(prompts))]
+
+    def _accept_guess(self, prompt: str, guess: Optional[Tuple[str, float]]) -> Optional[Tuple[str, float]]:
+        if guess is None or guess[1] < self.fallback_min_probability:
+            self.fallback_stats["undecided"] += 1
+            return None
+        self.fallback_stats["predicted"] += 1
+        logger.debug("统计分类", prompt=prompt[:50], subject=guess[0], probability=round(guess[1], 4))
+        return guess
+
+    def _detailed_scores(self, prompt: str, scores: Dict[str, int]) -> Dict[str, Dict]:
+        """各学科得分及命中的关键词（按关键词表顺序）"""
+        matched: Dict[str, List[Tuple[int, str]]] = {subject: [] for subject in scores}
+        for pattern_id in self.automaton.find(prompt.lower()):
+            for subject, _, index in self.automaton.payloads[pattern_id]:
+                matched[subject].append((index, self.subject_keywords[subject][index]))
+        return {
+            subject: {
+                "score": score,
+                "matched_keywords": [keyword for _, keyword in sorted(matched[subject])]
+            }
+            for subject, score in scores.items()
+        }
+
     def _log_classification(self, prompt: str, scores: Dict[str, Dict]):
         """记录分类详情用于调试"""
-        print(f"\n=== 学科分类分析 ===")
-        print(f"输入: {prompt[:50]}...")
-        print("得分详情:")
-        for subject, details in scores.items():
-            if details["score"] > 0:
-                print(f"  {subject}: {details['score']}分")
-                print(f"    匹配关键词: {', '.join(details['matched_keywords'])}")
-        print("==================\n")
+        logger.debug(
+            "学科分类分析",
+            prompt=prompt[:50],
+            scores={
+                subject: details for subject, details in scores.items()
+                if details["score"] > 0
+            }
+        )
 
 class VisualizationRouter:
     """可视化路由管理器 - 方案A核心"""
 
+    # 需求中只回显用户原文（或原文中的命中词）、不影响配置和渲染的字段，计算需求指纹时忽略
+    FINGERPRINT_IGNORED_FIELDS = frozenset({"original", "raw_text", "keywords"})
+
     def __init__(self):
         """初始化路由管理器"""
-        # 初始化所有学科Agent
-        self.agents = {
-            "mathematics": MathematicsAgent(),
-            "astronomy": AstronomyAgent(),
-            "physics": PhysicsAgent(),
-            "chemistry": ChemistryAgent(),
-            "biology": BiologyAgent()
-        }
+        # 学科Agent注册表（首次使用某学科时才创建对应Agent）
+        self.agents = AgentRegistry()
 
-        # 初始化学科分类器
+        # 初始化学科分类器（统计后备分类器训练时使用各Agent支持的主题）
         self.subject_classifier = SubjectClassifier()
+        self.subject_classifier.fallback_agents = self.agents
 
         # 路由统计
         self.routing_stats = {
             "total_requests": 0,
             "subject_counts": {subject: 0 for subject in self.agents.keys()},
-            "fallback_count": 0
+            "fallback_count": 0,
+            "degraded_count": 0,
+            "degraded_stages": {},
+            "composite_count": 0
         }
+        # 组合面板（及调度器的工作线程）并发运行路由，统计计数在锁内更新
+        self._stats_lock = threading.Lock()
+
+        # 跨学科组合模式：多个学科得分接近时并发运行这些Agent（见 set_composite）
+        self.composite_enabled = True
+        self.composite_ratio = 0.6
+        self.composite_min_score = 2
+        self.composite_max_subjects = 3
+        self.composite_agent_timeout = 10.0
+        self.composite_workers = 8
+        self._composite_executor: Optional[ThreadPoolExecutor] = None
 
-        print("🤖 智能路由管理器初始化完成")
-        print(f"📋 已加载学科Agent: {list(self.agents.keys())}")
+        # 渲染结果缓存：按需求指纹复用配置和HTML（见 set_render_cache）
+        self.render_cache = RenderCache()
+
+        logger.info("智能路由管理器初始化完成", agents=list(self.agents.keys()))
 
     def set_template_engine(self, template_engine):
-        """为所有Agent设置模板引擎"""
-        for agent in self.agents.values():
-            agent.template_engine = template_engine
-        print("🎨 模板引擎已注入所有学科Agent")
+        """为所有Agent设置模板引擎（包括之后才创建的Agent）"""
+        self.agents.set_template_engine(template_engine)
+        logger.info("模板引擎已注入所有学科Agent")
+
+    def set_composite(
+        self,
+        enabled: bool = True,
+        ratio: float = 0.6,
+        min_score: int = 2,
+        max_subjects: int = 3,
+        agent_timeout: float = 10.0,
+        workers: int = 8
+    ) -> None:
+        """
+        配置跨学科组合模式
 
-    async def route_request(self, prompt: str, user_preferences: Dict = None) -> Dict[str, Any]:
+        Args:
+            enabled: 是否启用
+            ratio: 得分不低于最高分的该比例的学科一起生成
+            min_score: 参与组合的学科的最低得分
+            max_subjects: 最多组合的学科数
+            agent_timeout: 每个Agent的超时时间（秒，另受请求截止时间限制）
+            workers: 运行各学科面板的线程数（所有组合请求共用）
+        """
+        self.composite_enabled = enabled
+        self.composite_ratio = ratio
+        self.composite_min_score = min_score
+        self.composite_max_subjects = max_subjects
+        self.composite_agent_timeout = agent_timeout
+        if workers != self.composite_workers and self._composite_executor is not None:
+            self._composite_executor.shutdown(wait=False)
+            self._composite_executor = None
+        self.composite_workers = max(1, workers)
+
+    def set_render_cache(self, max_bytes: int, ttl: float) -> None:
+        """
+        配置渲染结果缓存（替换现有缓存）
+
+        Args:
+            max_bytes: 缓存内容总字节数上限（0 表示禁用）
+            ttl: 条目有效期（秒，0 表示不过期）
+        """
+        self.render_cache = RenderCache(max_bytes=max_bytes, ttl=ttl)
+
+    def requirement_fingerprint(
+        self,
+        subject: str,
+        requirement: Dict[str, Any],
+        template: Dict[str, Any],
+        user_preferences: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        计算需求指纹：(学科, 规范化需求, 模板ID, 用户偏好) 的摘要
+
+        需求中回显原文的字段不参与计算，措辞不同但解析结果相同的请求得到相同指纹
+
+        Args:
+            subject: 学科
+            requirement: 解析后的需求
+            template: 匹配的模板
+            user_preferences: 用户偏好
+
+        Returns:
+            str: SHA-256 十六进制摘要
+        """
+        canonical = {
+            field: value for field, value in requirement.items()
+            if field not in self.FINGERPRINT_IGNORED_FIELDS
+        }
+        return make_request_key("render", subject, canonical, template.get("id"), user_preferences or {})
+
+    def composite_subjects(self, analysis: PromptAnalysis) -> List[str]:
+        """
+        判断是否需要跨学科组合
+
+        Args:
+            analysis: 提示词分析结果
+
+        Returns:
+            List[str]: 按得分从高到低排列的组合学科（第一个即分类结果）；不需要组合时为空列表
+        """
+        if not self.composite_enabled or not analysis.scores:
+            return []
+
+        top = max(analysis.scores.values())
+        if top < self.composite_min_score:
+            return []
+
+        # 稳定排序：同分时保持 subject_keywords 的顺序，与分类结果的选取一致
+        ranked = sorted(analysis.scores.items(), key=lambda item: -item[1])
+        subjects = [
+            subject for subject, score in ranked
+            if score >= self.composite_min_score and score >= top * self.composite_ratio and subject in self.agents
+        ][:self.composite_max_subjects]
+        return subjects if len(subjects) > 1 else []
+
+    def _composite_pool(self) -> ThreadPoolExecutor:
+        if self._composite_executor is None:
+            self._composite_executor = ThreadPoolExecutor(
+                max_workers=self.composite_workers, thread_name_prefix="composite-panel"
+            )
+        return self._composite_executor
+
+    def _count(self, field: str, key: Optional[str] = None) -> None:
+        """路由统计计数加一（key 不为空时计入 field 下的分项）"""
+        with self._stats_lock:
+            if key is None:
+                self.routing_stats[field] += 1
+            else:
+                counts = self.routing_stats[field]
+                counts[key] = counts.get(key, 0) + 1
+
+    @staticmethod
+    def _panel_stage(
+        loop: asyncio.AbstractEventLoop,
+        on_stage: Optional[Callable[[str, int], None]],
+        abandoned: threading.Event
+    ) -> Callable[[str, int], None]:
+        """
+        组合面板的阶段回调：在面板线程中调用，把调用方的回调交给事件循环线程执行并等待其完成
+
+        回调抛出的异常（如 GenerationCancelled）传回面板线程，在阶段之间终止该面板；
+        组合已放弃等待（超时或已取消）后面板在下一阶段停止。各面板的进度合并为单调递增的进度
+
+        Args:
+            loop: 调用方所在的事件循环
+            on_stage: 调用方的阶段回调（可为 None）
+            abandoned: 组合不再等待面板结果时置位
+
+        Returns:
+            Callable: 面板线程使用的阶段回调
+        """
+        lock = threading.Lock()
+        # 已推送的最靠后的 (进度, 阶段)
+        reported = [(0, "")]
+
+        def report(stage: str, progress: int) -> None:
+            if abandoned.is_set():
+                raise GenerationCancelled("composite")
+            if on_stage is None:
+                return
+            with lock:
+                if progress >= reported[0][0]:
+                    reported[0] = (progress, stage)
+                progress, stage = reported[0]
+            done: Future = Future()
+
+            def run() -> None:
+                try:
+                    on_stage(stage, progress)
+                    done.set_result(None)
+                except BaseException as e:
+                    done.set_exception(e)
+
+            loop.call_soon_threadsafe(run)
+            done.result()
+
+        return report
+
+    def _run_panel(
+        self,
+        prompt: str,
+        subject: str,
+        user_preferences: Optional[Dict],
+        deadline: Optional[Deadline],
+        analysis: Optional[PromptAnalysis],
+        on_stage: Optional[Callable[[str, int], None]] = None
+    ) -> Dict[str, Any]:
+        """在组合线程中运行单个学科的完整路由（线程内独立的事件循环，on_stage 须为线程安全的回调）"""
+        async def run() -> Dict[str, Any]:
+            plan = await self.prepare_route(
+                prompt, user_preferences, on_stage, subject=subject, deadline=deadline, analysis=analysis
+            )
+            if not plan["success"]:
+                return plan
+            return await self.render_route(plan)
+
+        return asyncio.run(run())
+
+    def _classification(self, analysis: PromptAnalysis) -> Dict[str, Any]:
+        """由提示词分析中的学科得分（或统计后备分类的后验概率）得出分类方式和置信度"""
+        result = self.subject_classifier.describe(analysis.subject, analysis.scores, analysis.fallback_probability)
+        return {"method": result["method"], "confidence": result["confidence"]}
+
+    def _analyze(self, prompt: str, timings: Dict[str, float]) -> PromptAnalysis:
+        """分析提示词并记录识别耗时"""
+        with timed_stage(timings, "classify"):
+            analysis = self.subject_classifier.analyze(prompt)
+        # 识别阶段与模板无关，只按学科记录
+        stage_metrics.observe("classify", timings["classify"], analysis.subject)
+        return analysis
+
+    async def route_request(
+        self,
+        prompt: str,
+        user_preferences: Dict = None,
+        on_stage: Optional[Callable[[str, int], None]] = None,
+        deadline: Optional[Deadline] = None,
+        analysis: Optional[PromptAnalysis] = None,
+        composite: Optional[bool] = None
+    ) -> Dict[str, Any]:
         """
         智能路由请求到合适的Agent - 方案A核心功能
 
         Args:
             prompt: 用户输入的自然语言描述
             user_preferences: 用户偏好设置
+            on_stage: 阶段切换回调 (stage, progress)，用于推送生成进度
+            deadline: 请求截止时间，剩余预算不足时改走降级渲染路径
+            analysis: 调用方已完成的提示词分析（针对同一用户输入，可不含调用方附加的标注），缺省时由路由器分析
+            composite: 是否允许跨学科组合（None 时按路由器配置；多个学科得分接近时并发生成多面板页面）
 
         Returns:
             Dict: 包含学科、模板、配置、HTML内容的完整响应
         """
+        timings: Dict[str, float] = {}
+        # 剩余预算不足时只走单学科的廉价路径
+        if composite is not False and self.composite_enabled and not is_tight(deadline):
+            if analysis is None:
+                analysis = self._analyze(prompt, timings)
+            subjects = self.composite_subjects(analysis)
+            if subjects:
+                return await self.route_composite(
+                    prompt, subjects, user_preferences, deadline, analysis, timings, on_stage=on_stage
+                )
+
+        plan = await self.prepare_route(prompt, user_preferences, on_stage, deadline=deadline, analysis=analysis)
+        if not plan["success"]:
+            return plan
+        if "classify" in timings:
+            plan["timings"] = {**timings, **plan["timings"]}
+
+        return await self.render_route(plan)
+
+    async def route_composite(
+        self,
+        prompt: str,
+        subjects: List[str],
+        user_preferences: Dict = None,
+        deadline: Optional[Deadline] = None,
+        analysis: Optional[PromptAnalysis] = None,
+        timings: Optional[Dict[str, float]] = None,
+        on_stage: Optional[Callable[[str, int], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        跨学科组合：每个学科Agent在组合线程池中各自运行完整路由（各自有超时），
+        把成功的结果组合为一个多面板页面
+
+        Agent的方法是不会让出事件循环的同步计算，直接 gather 协程只会依次执行，超时也无法生效；
+        放到线程中后事件循环不被占用，超时的面板按时放弃（线程在后台跑完后丢弃结果）。
+        numpy计算和阻塞I/O期间释放GIL，这部分可以真正并行；纯Python计算仍受GIL限制
+
+        Args:
+            prompt: 用户输入的自然语言描述
+            subjects: 参与组合的学科（第一个为主学科）
+            user_preferences: 用户偏好设置
+            deadline: 请求截止时间（各Agent共享，超时时间不超过剩余预算）
+            analysis: 提示词分析结果（各Agent共用）
+            timings: 调用方已记录的阶段耗时（如学科识别）
+            on_stage: 阶段切换回调 (stage, progress)，在事件循环线程中执行；
+                抛出 GenerationCancelled 时各面板在下一阶段停止，异常传给调用方
+
+        Returns:
+            Dict: 与单学科路由相同结构的响应，另含 composite、subjects 和各面板的 panels 信息
+        """
+        timings = dict(timings or {})
+        if analysis is None:
+            analysis = self._analyze(prompt, timings)
+        started = time.perf_counter()
+        self._count("composite_count")
+        timeout = self.composite_agent_timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline.remaining())
+
+        logger.info("跨学科组合路由", subjects=subjects, agent_timeout=round(timeout, 3))
+
+        loop = asyncio.get_running_loop()
+        executor = self._composite_pool()
+        abandoned = threading.Event()
+        panel_stage = self._panel_stage(loop, on_stage, abandoned)
+        try:
+            outcomes = await asyncio.gather(
+                *(
+                    asyncio.wait_for(
+                        loop.run_in_executor(
+                            executor,
+                            # 复制上下文，面板中的日志保留请求的关联ID
+                            contextvars.copy_context().run,
+                            self._run_panel, prompt, subject, user_preferences, deadline, analysis, panel_stage
+                        ),
+                        timeout
+                    )
+                    for subject in subjects
+                ),
+                return_exceptions=True
+            )
+        finally:
+            # 超时或被取消后仍在后台运行的面板在下一阶段停止
+            abandoned.set()
+
+        panels = []
+        for subject, outcome in zip(subjects, outcomes):
+            if isinstance(outcome, GenerationCancelled):
+                raise outcome
+            if isinstance(outcome, asyncio.TimeoutError):
+                logger.warning("组合路由中的Agent超时", subject=subject, timeout=round(timeout, 3))
+                outcome = self._route_failure(TimeoutError(f"{subject} 生成超时（{timeout:g}秒）"), subject, None)
+            elif isinstance(outcome, Exception):
+                outcome = self._route_failure(outcome, subject, None)
+            outcome["subject"] = subject
+            panels.append(outcome)
+
+        succeeded = [panel for panel in panels if panel["success"]]
+        failed = [panel["subject"] for panel in panels if not panel["success"]]
+        if not succeeded:
+            return {
+                **panels[0],
+                "error": "跨学科组合生成失败: " + "; ".join(str(panel.get("error")) for panel in panels),
+                "composite": True,
+                "subjects": subjects
+            }
+
+        primary = succeeded[0]
+        classification = self._classification(analysis)
+        title = " × ".join(subject_name(panel["subject"]) for panel in succeeded) + " 跨学科可视化"
+        html_content = compose_panels(title, succeeded, failed)
+        degraded = any(panel.get("degraded") for panel in succeeded)
+        elapsed = time.perf_counter() - started
+
+        response = {
+            "success": True,
+            "subject": primary["subject"],
+            "subjects": [panel["subject"] for panel in succeeded],
+            "composite": True,
+            "requirement": primary["requirement"],
+            "template": {"id": "composite", "name": title},
+            "config": {
+                "composite": True,
+                "panels": [
+                    {"subject": panel["subject"], "template_id": panel["template"].get("id"), "config": panel["config"]}
+                    for panel in succeeded
+                ]
+            },
+            "html_content": html_content,
+            "degraded": degraded,
+            "agent_info": primary["agent_info"],
+            "panels": [
+                {
+                    "subject": panel["subject"],
+                    "success": panel["success"],
+                    "template_id": panel["template"].get("id") if panel["success"] else None,
+                    "degraded": bool(panel.get("degraded")),
+                    "processing_time": panel.get("routing_info", {}).get("processing_time"),
+                    "error": panel.get("error")
+                }
+                for panel in panels
+            ],
+            "routing_info": {
+                "timestamp": datetime.now().isoformat(),
+                "processing_time": round(elapsed + sum(timings.values()), 6),
+                "stage_timings": {
+                    **timings,
+                    **{panel["subject"]: panel["routing_info"]["stage_timings"] for panel in succeeded}
+                },
+                "confidence": classification["confidence"],
+                "classification_method": classification["method"],
+                "composite": True,
+                "agent_timeout": round(timeout, 3)
+            }
+        }
+        if deadline is not None:
+            response["routing_info"]["deadline"] = deadline.to_dict()
+
+        logger.info(
+            "跨学科组合完成",
+            subjects=response["subjects"],
+            failed=failed,
+            processing_time=response["routing_info"]["processing_time"]
+        )
+        return response
+
+    async def prepare_route(
+        self,
+        prompt: str,
+        user_preferences: Dict = None,
+        on_stage: Optional[Callable[[str, int], None]] = None,
+        subject: Optional[str] = None,
+        template_id: Optional[str] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        deadline: Optional[Deadline] = None,
+        analysis: Optional[PromptAnalysis] = None
+    ) -> Dict[str, Any]:
+        """
+        执行路由的前半段：提示词分析与学科识别、需求解析、模板匹配、配置生成
+
+        调用方可以在渲染前根据配置判断是否已有可复用的结果，
+        需要HTML时再调用 render_route。
+
+        Args:
+            prompt: 用户输入的自然语言描述
+            user_preferences: 用户偏好设置
+            on_stage: 阶段切换回调 (stage, progress)，抛出 GenerationCancelled 可在阶段之间终止路由
+            subject: 已知学科（指定或已识别时跳过学科识别）
+            template_id: 指定模板ID（Agent中存在时跳过模板匹配）
+            parameters: 覆盖需求解析得到的可视化参数
+            deadline: 请求截止时间，剩余预算不足时跳过模板搜索，
+                使用Agent的内置默认模板并降低采样量
+            analysis: 调用方已完成的提示词分析（针对同一用户输入，可不含调用方附加的标注），缺省时在此分析一次；
+                分析结果同时用于学科识别和Agent的需求解析
+
+        Returns:
+            Dict: 路由计划，包含学科、Agent、需求、模板、配置、截止时间和各阶段耗时
+        """
+        requirement = None
+        timings: Dict[str, float] = {}
+
         try:
             # 更新统计
-            self.routing_stats["total_requests"] += 1
+            self._count("total_requests")
 
-            print(f"🎯 开始路由请求: {prompt[:100]}...")
+            logger.info("开始路由请求", prompt=prompt[:100])
 
-            # 1. 识别学科
-            subject = await self.subject_classifier.classify(prompt)
-            print(f"📚 识别学科: {subject}")
+            # 1. 分析提示词并识别学科（调用方已分析时直接复用）
+            if analysis is None:
+                analysis = self._analyze(prompt, timings)
+            if subject:
+                classification = {"method": "specified", "confidence": 1.0}
+            else:
+                subject = analysis.subject
+                classification = self._classification(analysis)
+                logger.debug("识别学科", subject=subject)
 
             # 2. 获取对应Agent
             agent = self.agents.get(subject)
             if not agent:
-                print(f"⚠️  学科 {subject} 暂不支持，使用数学Agent作为后备")
+                logger.warning("学科暂不支持，使用数学Agent作为后备", subject=subject)
                 agent = self.agents["mathematics"]
                 subject = "mathematics"
-                self.routing_stats["fallback_count"] += 1
+                self._count("fallback_count")
 
             # 更新学科计数
-            self.routing_stats["subject_counts"][subject] += 1
+            self._count("subject_counts", subject)
 
             # 3. 解析需求
-            print(f"🔍 开始解析 {subject} 学科需求...")
-            requirement = await agent.parse_requirement(prompt)
-            print(f"✅ 需求解析完成: {requirement.get('concept_type', '未知概念')}")
+            if on_stage:
+                on_stage("parsing", 20)
+            with timed_stage(timings, "parse_requirement"):
+                requirement = await agent.parse_requirement(prompt, deadline=deadline, analysis=analysis)
+            if parameters:
+                requirement["parameters"] = {**requirement.get("parameters", {}), **parameters}
+            logger.debug("需求解析完成", subject=subject, concept_type=requirement.get("concept_type"))
 
             # 4. 匹配模板
-            print(f"🎨 开始匹配 {subject} 学科模板...")
-            template = await agent.match_template(requirement)
+            if on_stage:
+                on_stage("matching", 40)
+            with timed_stage(timings, "match_template"):
+                template = agent.templates.get(template_id) if template_id else None
+                if not template and is_tight(deadline):
+                    # 剩余预算不足以搜索模板，直接使用内置默认模板
+                    template = agent.default_template()
+                    deadline.mark_degraded("match_template")
+                elif not template:
+                    template = await agent.match_template(requirement, deadline=deadline)
             if not template:
-                print(f"⚠️  未找到匹配模板，使用默认模板")
+                logger.debug("未找到匹配模板，使用默认模板", subject=subject)
                 template = {"id": "default", "name": "默认模板"}
 
-            print(f"✅ 模板匹配完成: {template.get('name', '未知模板')}")
+            logger.debug("模板匹配完成", template_id=template.get("id"))
 
-            # 5. 生成配置
-            print(f"⚙️  开始生成可视化配置...")
-            config = await agent.generate_config(requirement, template, user_preferences or {})
-            print(f"✅ 配置生成完成")
+            # 5. 生成配置（相同需求指纹已有渲染结果时直接复用，跳过配置生成和渲染）
+            if on_stage:
+                on_stage("generating", 70)
+            fingerprint = None
+            cached = None
+            if self.render_cache.enabled:
+                fingerprint = self.requirement_fingerprint(subject, requirement, template, user_preferences)
+                cached = self.render_cache.get(fingerprint)
+            if cached is not None:
+                config = dict(cached["config"])
+                logger.debug("渲染缓存命中", subject=subject, template_id=template.get("id"))
+            else:
+                with timed_stage(timings, "generate_config"):
+                    config = await agent.generate_config(requirement, template, user_preferences or {}, deadline=deadline)
+                if deadline is not None and deadline.degraded:
+                    config = self._degraded_config(config)
 
-            # 6. 生成可视化
-            print(f"🖼️  开始生成可视化HTML...")
-            html_content = await agent.generate_visualization(config)
-            print(f"✅ HTML生成完成，长度: {len(html_content)} 字符")
+            stage_metrics.observe_all(
+                {stage: seconds for stage, seconds in timings.items() if stage != "classify"},
+                subject,
+                template.get("id")
+            )
 
-            # 7. 构建响应
-            response = {
+            return {
                 "success": True,
                 "subject": subject,
+                "agent": agent,
                 "requirement": requirement,
                 "template": template,
                 "config": config,
+                "deadline": deadline,
+                "timings": timings,
+                "classification": classification,
+                "fingerprint": fingerprint,
+                "cached_html": cached["html_content"] if cached is not None else None
+            }
+
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            return self._route_failure(e, subject, requirement)
+
+    async def render_route(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        执行路由的后半段：生成可视化HTML并构建响应
+
+        渲染前剩余预算不足时改用降级配置（内置默认模板 + 降采样），
+        响应中的 config 为实际渲染使用的配置，degraded 标记是否走了降级路径。
+
+        Args:
+            plan: prepare_route 返回的路由计划
+
+        Returns:
+            Dict: 包含学科、模板、配置、HTML内容的完整响应
+        """
+        subject = plan["subject"]
+        agent = plan["agent"]
+        template_id = plan["template"].get("id")
+        timings = dict(plan.get("timings", {}))
+        deadline: Optional[Deadline] = plan.get("deadline")
+        config = plan["config"]
+        fingerprint = plan.get("fingerprint")
+        html_content = plan.get("cached_html")
+        cache_hit = html_content is not None
+        classification = plan.get("classification") or {"method": "none", "confidence": 0.0}
+
+        try:
+            if not cache_hit:
+                if is_tight(deadline) and not config.get("degraded"):
+                    deadline.mark_degraded("generate_visualization")
+                    config = self._degraded_config(config)
+
+                # 6. 生成可视化
+                with timed_stage(timings, "generate_visualization"):
+                    html_content = await agent.generate_visualization(config, deadline=deadline)
+                stage_metrics.observe("generate_visualization", timings["generate_visualization"], subject, template_id)
+                logger.debug("HTML生成完成", html_length=len(html_content))
+
+                # 降级结果不缓存，避免之后预算充足的请求也拿到降采样的页面
+                if fingerprint is not None and not config.get("degraded"):
+                    self._store_render(fingerprint, config, html_content)
+
+            # 7. 构建响应
+            response = {
+                "success": True,
+                "subject": subject,
+                "requirement": plan["requirement"],
+                "template": plan["template"],
+                "config": config,
                 "html_content": html_content,
+                "degraded": bool(config.get("degraded")),
                 "agent_info": agent.get_agent_info(),
                 "routing_info": {
                     "timestamp": datetime.now().isoformat(),
-                    "processing_time": "模拟处理时间",
-                    "confidence": 0.85  # 模拟置信度
+                    "processing_time": round(sum(timings.values()), 6),
+                    "stage_timings": timings,
+                    "confidence": classification["confidence"],
+                    "classification_method": classification["method"],
+                    "cache_hit": cache_hit
                 }
             }
+            if deadline is not None:
+                response["routing_info"]["deadline"] = deadline.to_dict()
+            if response["degraded"]:
+                self._record_degraded(deadline, subject)
 
-            print(f"🎉 路由请求完成: {subject} 学科")
+            logger.info("路由请求完成", subject=subject, template_id=template_id, processing_time=response["routing_info"]["processing_time"])
             return response
 
         except Exception as e:
-            error_msg = f"路由处理失败: {str(e)}"
-            print(f"❌ {error_msg}")
-            return {
-                "success": False,
-                "error": error_msg,
-                "subject": subject,
-                "requirement": requirement if 'requirement' in locals() else None,
-                "routing_info": {
-                    "timestamp": datetime.now().isoformat(),
-                    "failed": True
-                }
+            return self._route_failure(e, subject, plan["requirement"])
+
+    def _store_render(self, fingerprint: str, config: Dict[str, Any], html_content: str) -> None:
+        """把配置和HTML写入渲染缓存（按两者序列化后的字节数计入配额）"""
+        try:
+            size = len(html_content.encode("utf-8")) + len(
+                json.dumps(config, ensure_ascii=False, default=str).encode("utf-8")
+            )
+        except (TypeError, ValueError):
+            # 配置中有无法序列化的对象（如循环引用）时不缓存
+            return
+        self.render_cache.put(fingerprint, {"config": config, "html_content": html_content}, size)
+
+    @staticmethod
+    def _degraded_config(config: Dict[str, Any]) -> Dict[str, Any]:
+        """降级渲染配置：Agent据此跳过模板引擎并减少数据点数"""
+        return {**config, "degraded": True, "sampling": DEGRADED_SAMPLING}
+
+    def _record_degraded(self, deadline: Optional[Deadline], subject: str) -> None:
+        """记录一次降级渲染"""
+        self._count("degraded_count")
+        stages = deadline.degraded_stages if deadline is not None else []
+        for stage in stages:
+            self._count("degraded_stages", stage)
+        logger.warning(
+            "剩余预算不足，已降级渲染",
+            subject=subject,
+            stages=stages,
+            remaining=round(deadline.remaining(), 3) if deadline is not None else None
+        )
+
+    def _route_failure(self, error: Exception, subject: Optional[str], requirement: Optional[Dict]) -> Dict[str, Any]:
+        """构建路由失败响应"""
+        error_msg = f"路由处理失败: {str(error)}"
+        logger.error("路由处理失败", subject=subject, error=str(error))
+        return {
+            "success": False,
+            "error": error_msg,
+            "subject": subject,
+            "requirement": requirement,
+            "routing_info": {
+                "timestamp": datetime.now().isoformat(),
+                "failed": True
             }
+        }
 
     async def direct_subject_route(self, subject: str, prompt: str, user_preferences: Dict = None) -> Dict[str, Any]:
         """
@@ -378,52 +1286,87 @@ class VisualizationRouter:
 
     def get_routing_stats(self) -> Dict[str, Any]:
         """获取路由统计信息"""
+        with self._stats_lock:
+            stats = {
+                **self.routing_stats,
+                "subject_counts": dict(self.routing_stats["subject_counts"]),
+                "degraded_stages": dict(self.routing_stats["degraded_stages"])
+            }
         return {
-            "total_requests": self.routing_stats["total_requests"],
-            "subject_distribution": self.routing_stats["subject_counts"],
+            "total_requests": stats["total_requests"],
+            "subject_distribution": stats["subject_counts"],
             "fallback_rate": (
-                self.routing_stats["fallback_count"] / max(1, self.routing_stats["total_requests"])
+                stats["fallback_count"] / max(1, stats["total_requests"])
             ) * 100,
+            "degraded_count": stats["degraded_count"],
+            "degraded_stages": stats["degraded_stages"],
+            "composite_count": stats["composite_count"],
+            "render_cache": self.render_cache.get_stats(),
+            "statistical_classification": dict(self.subject_classifier.fallback_stats),
             "supported_subjects": list(self.agents.keys()),
             "timestamp": datetime.now().isoformat()
         }
 
     async def test_routing(self, test_cases: List[Dict[str, str]]) -> Dict[str, Any]:
         """
-        测试路由功能
+        测试路由功能：分类准确率、混淆矩阵、吞吐量和单条延迟分位数
 
         Args:
             test_cases: 测试用例列表 [{"prompt": "...", "expected_subject": "..."}]
 
         Returns:
-            Dict: 测试结果
+            Dict: 测试结果（延迟单位为秒）
         """
         results = []
         correct_count = 0
+        labeled_count = 0
+        # 期望学科 -> 预测学科 -> 次数
+        confusion: Dict[str, Dict[str, int]] = {}
+        latencies = LatencyHistogram(window_size=max(1, len(test_cases)))
 
+        started = time.perf_counter()
         for case in test_cases:
             prompt = case["prompt"]
             expected = case.get("expected_subject")
 
+            case_started = time.perf_counter()
             predicted = await self.subject_classifier.classify(prompt)
+            latency = time.perf_counter() - case_started
+            latencies.observe(latency)
 
             result = {
                 "prompt": prompt,
                 "expected": expected,
                 "predicted": predicted,
-                "correct": expected == predicted if expected else "unknown"
+                "correct": expected == predicted if expected else "unknown",
+                "latency": latency
             }
 
+            if expected:
+                labeled_count += 1
+                row = confusion.setdefault(expected, {})
+                row[predicted] = row.get(predicted, 0) + 1
             if result["correct"] is True:
                 correct_count += 1
 
             results.append(result)
+        elapsed = time.perf_counter() - started
 
-        accuracy = (correct_count / len([r for r in results if r["expected"]])) * 100 if results else 0
+        accuracy = (correct_count / labeled_count) * 100 if labeled_count else 0
+        quantiles = latencies.quantiles((0.5, 0.9, 0.95, 0.99))
 
         return {
             "test_cases": len(test_cases),
+            "labeled_cases": labeled_count,
             "correct_predictions": correct_count,
             "accuracy": accuracy,
+            "confusion_matrix": confusion,
+            "elapsed": elapsed,
+            "throughput": len(test_cases) / elapsed if elapsed > 0 else 0.0,
+            "latency": {
+                "mean": latencies.total / latencies.count if latencies.count else 0.0,
+                "max": max(latencies.window, default=0.0),
+                **{f"p{round(q * 100)}": seconds for q, seconds in quantiles.items()}
+            },
             "results": results
-        }
\ No newline at end of file
+        }
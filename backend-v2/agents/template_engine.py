@@ -3,12 +3,19 @@
 方案A核心组件：负责管理和渲染所有学科的可视化模板
 """
 
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Union, TYPE_CHECKING
 import json
 import os
 from pathlib import Path
 from datetime import datetime
-import jinja2
+
+if TYPE_CHECKING:
+    import jinja2
+
+from services.structured_logging import get_logger
+from services.fast_json import dumps_str
+
+logger = get_logger(__name__)
 
 class UnifiedTemplateEngine:
     """统一模板引擎 - 方案A核心组件"""
@@ -17,22 +24,38 @@ class UnifiedTemplateEngine:
         """初始化模板引擎"""
         self.templates: Dict[str, Dict[str, Any]] = {}
         self.template_cache: Dict[str, str] = {}
-        self.jinja_env = jinja2.Environment(
-            loader=jinja2.DictLoader({}),
-            autoescape=True
-        )
+        # 已编译的Jinja2模板，避免每次渲染重复解析
+        self.compiled_templates: Dict[str, "jinja2.Template"] = {}
+        # Jinja2环境在首次渲染时创建（jinja2按需导入）
+        self._jinja_env: Optional["jinja2.Environment"] = None
 
         # 模板统计
         self.template_stats = {
             "total_templates": 0,
             "subject_counts": {},
             "render_count": 0,
-            "cache_hits": 0
+            "cache_hits": 0,
+            "compile_count": 0
         }
 
-        print("🎨 统一模板引擎初始化完成")
+        logger.info("统一模板引擎初始化完成")
         # 模板加载将在startup事件中进行
 
+    @property
+    def jinja_env(self) -> "jinja2.Environment":
+        """Jinja2环境（首次访问时导入jinja2并创建）"""
+        if self._jinja_env is None:
+            import jinja2
+
+            self._jinja_env = jinja2.Environment(
+                loader=jinja2.DictLoader(self.template_cache),
+                autoescape=True
+            )
+            # tojson 过滤器使用快速序列化（支持numpy数组）
+            self._jinja_env.policies["json.dumps_function"] = dumps_str
+            self._jinja_env.policies["json.dumps_kwargs"] = {}
+        return self._jinja_env
+
     async def register_template(self, template: Dict[str, Any]) -> bool:
         """
         注册新模板
@@ -49,7 +72,7 @@ class UnifiedTemplateEngine:
                 raise ValueError("模板缺少id字段")
 
             if template_id in self.templates:
-                print(f"⚠️  模板 {template_id} 已存在，将被覆盖")
+                logger.warning("模板已存在，将被覆盖", template_id=template_id)
 
             # 验证模板必需字段
             required_fields = ["id", "name", "description", "subject"]
@@ -64,11 +87,11 @@ class UnifiedTemplateEngine:
                 "render_count": 0
             }
 
-            # 缓存HTML模板
+            # 缓存HTML模板（覆盖时旧的编译结果失效）
+            self.compiled_templates.pop(template_id, None)
             html_template = template.get("html_template")
             if html_template:
                 self.template_cache[template_id] = html_template
-                self.jinja_env.loader.mapping[template_id] = html_template
 
             # 更新统计
             subject = template["subject"]
@@ -76,11 +99,11 @@ class UnifiedTemplateEngine:
                 self.template_stats["subject_counts"].get(subject, 0) + 1
             self.template_stats["total_templates"] = len(self.templates)
 
-            print(f"✅ 模板注册成功: {template_id} ({subject})")
+            logger.debug("模板注册成功", template_id=template_id, subject=subject)
             return True
 
         except Exception as e:
-            print(f"❌ 模板注册失败: {str(e)}")
+            logger.error("模板注册失败", template_id=template.get("id"), error=str(e))
             return False
 
     async def get_template(self, template_id: str) -> Optional[Dict[str, Any]]:
@@ -185,8 +208,12 @@ class UnifiedTemplateEngine:
                 else:
                     raise ValueError(f"模板HTML内容不存在: {template_id}")
 
-            # 使用Jinja2渲染
-            jinja_template = self.jinja_env.from_string(html_template)
+            # 使用Jinja2渲染（编译结果按模板ID复用）
+            jinja_template = self.compiled_templates.get(template_id)
+            if jinja_template is None:
+                jinja_template = self.jinja_env.from_string(html_template)
+                self.compiled_templates[template_id] = jinja_template
+                self.template_stats["compile_count"] += 1
             rendered_content = jinja_template.render(**config)
 
             # 更新统计
@@ -196,7 +223,7 @@ class UnifiedTemplateEngine:
             return rendered_content
 
         except Exception as e:
-            print(f"❌ 模板渲染失败: {str(e)}")
+            logger.error("模板渲染失败", template_id=template_id, error=str(e))
             # 返回错误页面
             return await self._render_error_page(template_id, str(e))
 
@@ -227,7 +254,7 @@ class UnifiedTemplateEngine:
             return None
 
         except Exception as e:
-            print(f"⚠️  从文件加载模板失败 {template_id}: {str(e)}")
+            logger.warning("从文件加载模板失败", template_id=template_id, error=str(e))
             return None
 
     async def _render_error_page(self, template_id: str, error_message: str) -> str:
@@ -539,6 +566,7 @@ class UnifiedTemplateEngine:
         return {
             **self.template_stats,
             "cache_size": len(self.template_cache),
+            "compiled_size": len(self.compiled_templates),
             "most_used_templates": sorted(
                 self.templates.items(),
                 key=lambda x: x[1].get("render_count", 0),
@@ -559,14 +587,14 @@ class UnifiedTemplateEngine:
             loaded_count = 0
 
             if not templates_dir.exists():
-                print(f"⚠️  模板目录不存在: {templates_dir}")
+                logger.warning("模板目录不存在", path=str(templates_dir))
                 return 0
 
             # 遍历所有学科目录
             for subject_dir in templates_dir.iterdir():
                 if subject_dir.is_dir():
                     subject_name = subject_dir.name
-                    print(f"📁 正在加载学科: {subject_name}")
+                    logger.debug("正在加载学科模板", subject=subject_name)
 
                     # 加载该学科的所有JSON模板文件
                     for json_file in subject_dir.glob("*.json"):
@@ -574,13 +602,13 @@ class UnifiedTemplateEngine:
                             await self._load_template_from_json(json_file)
                             loaded_count += 1
                         except Exception as e:
-                            print(f"❌ 加载模板失败 {json_file}: {str(e)}")
+                            logger.error("加载模板失败", path=str(json_file), error=str(e))
 
-            print(f"✅ 总共加载了 {loaded_count} 个模板")
+            logger.info("模板加载完成", loaded=loaded_count)
             return loaded_count
 
         except Exception as e:
-            print(f"❌ 加载模板文件失败: {str(e)}")
+            logger.error("加载模板文件失败", error=str(e))
             return 0
 
     async def _load_template_from_json(self, json_file: Path) -> None:
@@ -597,17 +625,17 @@ class UnifiedTemplateEngine:
             # 验证并注册模板
             validation = await self.validate_template(template_data)
             if not validation["valid"]:
-                print(f"⚠️  模板验证失败 {json_file.name}: {', '.join(validation['errors'])}")
+                logger.warning("模板验证失败", path=str(json_file), errors=validation["errors"])
                 return
 
             success = await self.register_template(template_data)
             if success:
-                print(f"  ✅ 已加载模板: {template_data.get('id', json_file.stem)}")
+                logger.debug("已加载模板", template_id=template_data.get("id", json_file.stem))
 
         except json.JSONDecodeError as e:
-            print(f"❌ JSON格式错误 {json_file}: {str(e)}")
+            logger.error("模板JSON格式错误", path=str(json_file), error=str(e))
         except Exception as e:
-            print(f"❌ 加载模板失败 {json_file}: {str(e)}")
+            logger.error("加载模板失败", path=str(json_file), error=str(e))
 
     async def cleanup_cache(self) -> int:
         """
@@ -618,5 +646,6 @@ class UnifiedTemplateEngine:
         """
         cache_size = len(self.template_cache)
         self.template_cache.clear()
-        print(f"🧹 已清理 {cache_size} 个模板缓存")
+        self.compiled_templates.clear()
+        logger.info("已清理模板缓存", cleared=cache_size)
         return cache_size
\ No newline at end of file
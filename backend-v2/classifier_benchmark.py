@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+万物可视化 v2.0 - 学科分类性能测试
+对比旧实现（逐个关键词子串扫描 + 优先级列表成员检查）与关键词自动机（单次扫描）
+在不同提示词长度下的耗时，并校验两者的各学科得分和分类结果完全一致
+"""
+
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from agents.router_manager import SubjectClassifier
+
+# 测试的提示词长度（字符）
+PROMPT_LENGTHS = [20, 100, 500, 1000, 5000]
+
+# 非关键词的填充文本
+FILLER = "请帮我生成一个可以交互的图像用来给同学们讲解这个知识点，最好能够调整参数并观察变化。"
+
+
+def legacy_scores(classifier: SubjectClassifier, prompt: str) -> Dict[str, int]:
+    """旧实现：每个学科逐个关键词做子串扫描，再到优先级列表中查找权重"""
+    prompt_lower = prompt.lower()
+    scores = {}
+    for subject, keywords in classifier.subject_keywords.items():
+        score = 0
+        for keyword in keywords:
+            if keyword.lower() in prompt_lower:
+                if subject in classifier.subject_weights:
+                    if keyword in classifier.subject_weights[subject]["high_priority"]:
+                        score += 3
+                    elif keyword in classifier.subject_weights[subject]["medium_priority"]:
+                        score += 2
+                    else:
+                        score += 1
+                else:
+                    score += 1
+        scores[subject] = score
+    return scores
+
+
+def pick_subject(scores: Dict[str, int]) -> str:
+    """与 SubjectClassifier.classify 相同的选取规则"""
+    if max(scores.values()) == 0:
+        return "general"
+    return max(scores.items(), key=lambda x: x[1])[0]
+
+
+def sample_prompts(classifier: SubjectClassifier, length: int, count: int, rng: random.Random) -> List[str]:
+    """
+    构造指定长度的提示词：填充文本中随机插入各学科关键词
+
+    Args:
+        classifier: 分类器（提供关键词表）
+        length: 提示词长度
+        count: 数量
+        rng: 随机数生成器
+
+    Returns:
+        List[str]: 提示词列表
+    """
+    keywords = [keyword for keywords in classifier.subject_keywords.values() for keyword in keywords]
+    prompts = []
+    for _ in range(count):
+        parts = []
+        size = 0
+        while size < length:
+            part = rng.choice(keywords) if rng.random() < 0.05 else rng.choice(FILLER)
+            parts.append(part)
+            size += len(part)
+        prompts.append("".join(parts)[:length])
+    return prompts
+
+
+def case_prompts() -> List[str]:
+    """test_cases.md 中的示例输入（反引号内的文本）及大小写等边界情况"""
+    prompts = ["", "DNA双螺旋结构", "dna 与 RNA 的转录", "溶液的pH值和PH值", "T分布与t分布", "正态分布 均值0 标准差1"]
+    cases_file = Path(__file__).parent / "test_cases.md"
+    if cases_file.exists():
+        prompts.extend(re.findall(r"`([^`\n]+)`", cases_file.read_text(encoding="utf-8")))
+    return prompts
+
+
+def measure(func: Callable[[str], Dict[str, int]], prompts: List[str], rounds: int) -> float:
+    """测量单个提示词的平均耗时（微秒，取各轮中位数）"""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for prompt in prompts:
+            func(prompt)
+        timings.append((time.perf_counter() - start) / len(prompts))
+    return statistics.median(timings) * 1e6
+
+
+def main():
+    """主函数"""
+    classifier = SubjectClassifier()
+    rng = random.Random(42)
+
+    # 1. 一致性校验
+    checked = case_prompts()
+    for length in PROMPT_LENGTHS:
+        checked.extend(sample_prompts(classifier, length, 50, rng))
+    mismatches = [
+        prompt for prompt in checked
+        if classifier.score(prompt) != legacy_scores(classifier, prompt)
+        or pick_subject(classifier.score(prompt)) != pick_subject(legacy_scores(classifier, prompt))
+    ]
+
+    print("🚀 学科分类性能测试")
+    print(f"   关键词: {sum(len(k) for k in classifier.subject_keywords.values())} 个，自动机模式: {len(classifier.automaton)} 个")
+    print(f"   一致性校验: {len(checked) - len(mismatches)}/{len(checked)} 个提示词得分与旧实现相同")
+    print(f"{'长度':>6} | {'旧实现(µs)':>10} | {'自动机(µs)':>10} | {'加速比':>6}")
+
+    # 2. 耗时对比
+    for length in PROMPT_LENGTHS:
+        prompts = sample_prompts(classifier, length, 20, rng)
+        rounds = 50 if length <= 1000 else 10
+        legacy = measure(lambda prompt: legacy_scores(classifier, prompt), prompts, rounds)
+        automaton = measure(classifier.score, prompts, rounds)
+        print(f"{length:>6} | {legacy:>10.1f} | {automaton:>10.1f} | {legacy / automaton:>5.1f}x")
+
+    if mismatches:
+        print(f"\n❌ {len(mismatches)} 个提示词得分不一致，例如: {mismatches[0][:50]!r}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,15 @@ class Settings:
     STATIC_DIR = BASE_DIR / "static"
     TEMPLATES_DIR = BASE_DIR / "templates"
     OUTPUT_DIR = STATIC_DIR / "visualizations"
+    ARTIFACT_PRECOMPRESS = True  # 生成时同时写入 .gz/.br 预压缩文件
+    ARTIFACT_WRITE_WORKERS = 4  # 产物写入线程数
+    ARTIFACT_FSYNC_MODE = "batch"  # none / each / batch
+    ARTIFACT_FSYNC_INTERVAL = 1.0  # batch模式下的fsync间隔（秒）
+    ARTIFACT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 产物目录总字节上限，超出后按最近访问时间淘汰（0 不限制）
+    ARTIFACT_MAX_AGE = 7 * 24 * 3600  # 超过该时间未被访问的产物将被删除（秒，0 不限制）
+    ARTIFACT_RETENTION_INTERVAL = 300  # 产物清理间隔（秒）
+    ARTIFACT_RETENTION_GRACE = 300  # 刚写入或刚访问的产物的保护时间（秒）
+    ARTIFACT_ACCESS_INDEX = BASE_DIR / "data" / "artifact_access.json"  # 产物访问时间索引（多worker共享）
 
     # API配置
     API_V1_PREFIX = "/api/v1"
@@ -38,18 +47,51 @@ class Settings:
 
     # Agent配置
     AGENT_TIMEOUT = 30  # 秒
+    REQUEST_DEADLINE = AGENT_TIMEOUT  # 请求默认时间预算（秒，含排队时间），X-Request-Timeout 请求头可缩短
+    DEADLINE_DEGRADE_BELOW = 5.0  # 剩余预算低于该值时改用内置默认模板+降采样的降级渲染（秒）
     MAX_CONCURRENT_GENERATIONS = 5
+    GENERATION_QUEUE_SIZE = 50  # 每个优先级的等待队列上限，超出返回429
+    GENERATION_PRIORITY_WEIGHTS = {"interactive": 4, "bulk": 1}  # 优先级权重（从高到低），空闲worker按权重比例分配
+    GENERATION_CLIENT_LIMIT = 8  # 单个客户端排队和执行中的任务总数上限（0 不限制）
+    GENERATION_SHED_QUEUE_WAIT = 10.0  # 排队最久的任务等待超过该时间时拒绝最低优先级的新任务（秒，0 不丢弃）
+    GENERATION_STATUS_TTL = 1800  # 已完成/失败任务状态保留时间（秒）
+    GENERATION_STATUS_MAX_ENTRIES = 10000  # 状态记录上限，超出后按LRU淘汰终态记录
+    IDEMPOTENCY_KEY_TTL = 1800  # Idempotency-Key 有效期（秒），期间相同键的重试返回原任务
+    IDEMPOTENCY_KEY_MAX_LENGTH = 255  # Idempotency-Key 最大长度
+    STATUS_STREAM_HEARTBEAT = 15  # SSE/WebSocket 进度推送心跳间隔（秒）
+    COALESCE_RESULT_TTL = 5.0  # 相同请求结果的短期缓存时间（秒）
+    COALESCE_MAX_RESULTS = 256  # 短期结果缓存条目上限
+    JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "sqlite")  # memory / sqlite（多worker部署需sqlite）
+    JOB_STORE_FLUSH_INTERVAL = 0.1  # 任务状态批量写入数据库的间隔（秒）
+    JOB_STORE_ORPHAN_TIMEOUT = 120  # 其他主机上的进行中任务超过该时间未更新视为中断（秒）
+    STATUS_STREAM_POLL_INTERVAL = 1.0  # 推送连接重新读取状态的间隔（任务可能在其他worker上）
+    BATCH_MAX_ITEMS = 500  # 单个批量请求的条目上限
+    BATCH_MAX_CONCURRENCY = 5  # 单个批量请求的并发上限
+    CLASSIFY_BATCH_MAX_PROMPTS = 10000  # 单个批量分类请求的提示词上限
+    FALLBACK_CLASSIFIER_ENABLED = True  # 关键词全部未命中时使用字符n-gram统计分类器
+    FALLBACK_CLASSIFIER_PATH = BASE_DIR / "data" / "ngram_classifier.npz"  # 统计分类模型文件（缺失或过期时自动训练）
+    FALLBACK_MIN_PROBABILITY = 0.6  # 统计分类后验概率低于该值时仍判为general
+    COMPOSITE_ENABLED = True  # 多个学科得分接近时并发生成多面板的跨学科页面
+    COMPOSITE_SCORE_RATIO = 0.6  # 得分不低于最高分的该比例的学科参与组合
+    COMPOSITE_MIN_SCORE = 2  # 参与组合的学科的最低关键词得分
+    COMPOSITE_MAX_SUBJECTS = 3  # 最多组合的学科数
+    COMPOSITE_AGENT_TIMEOUT = 10.0  # 组合模式下每个学科Agent的超时时间（秒）
+    COMPOSITE_WORKERS = 8  # 运行组合面板的线程数（各学科Agent在线程中运行，不占用事件循环）
+    RENDER_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 按需求指纹缓存配置和HTML的总字节数上限（0 表示禁用）
+    RENDER_CACHE_TTL = 600.0  # 渲染缓存条目有效期（秒）
 
     # 文件上传配置
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
     ALLOWED_FILE_TYPES = [".csv", ".txt", ".json", ".xlsx"]
 
-    # 数据库配置（如果需要）
-    DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./visualization.db")
+    # 数据库配置（sqlite任务存储使用，默认放在 data 目录下，与启动目录无关）
+    DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR / 'data' / 'visualization.db'}")
 
     # 日志配置
-    LOG_LEVEL = "INFO"
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # DEBUG 级别输出学科分类详情
     LOG_FILE = BASE_DIR / "logs" / "app.log"
+    LOG_TO_FILE = False  # 是否同时写入 LOG_FILE
+    LOG_QUEUE_SIZE = 10000  # 日志队列上限，超出后丢弃并计数
 
     # 缓存配置
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
@@ -119,7 +161,7 @@ class Settings:
 # 创建全局配置实例
 settings = Settings()
 
-# 确保必要的目录存在
+# 确保必要的目录存在（应用启动时调用，导入配置不产生副作用）
 def ensure_directories():
     """确保必要的目录存在"""
     directories = [
@@ -132,6 +174,3 @@ def ensure_directories():
 
     for directory in directories:
         directory.mkdir(parents=True, exist_ok=True)
-
-# 在导入时创建目录
-ensure_directories()
\ No newline at end of file
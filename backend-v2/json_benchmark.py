@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+万物可视化 v2.0 - JSON序列化性能测试
+对比旧路径（pydantic 响应校验 + jsonable_encoder + json.dumps，numpy 先 tolist）
+与新路径（services.fast_json.dumps，numpy 数组直接序列化）在 100KB~5MB 负载下的耗时和内存峰值
+"""
+
+import json
+import statistics
+import time
+import tracemalloc
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from services.fast_json import HAS_ORJSON, dumps
+
+# 目标负载大小（字节）
+PAYLOAD_SIZES = [100 * 1024, 500 * 1024, 1024 * 1024, 5 * 1024 * 1024]
+
+
+class HighSchoolResponse(BaseModel):
+    """与 main.HighSchoolResponse 字段一致（避免导入 main 触发应用启动）"""
+    success: bool
+    subject: str
+    generation_id: str
+    message: Optional[str] = None
+    visualization: Optional[Dict[str, Any]] = None
+    metadata: Dict[str, Any] = {}
+    error: Optional[str] = None
+
+
+def build_payload(target_bytes: int) -> Dict[str, Any]:
+    """
+    构造接近目标大小的生成结果：一半为HTML文本，一半为 numpy 数据序列
+
+    Args:
+        target_bytes: 目标序列化大小（字节）
+
+    Returns:
+        Dict[str, Any]: 与 /api/v2/highschool/generate 返回结构一致的结果
+    """
+    rng = np.random.default_rng(42)
+    # 每个 float64 序列化后约 19 字节
+    points = max(1, target_bytes // 2 // 19 // 2)
+    x = np.linspace(-10, 10, points)
+    html = "<div class='plot'>函数图像</div>\n" * max(1, target_bytes // 2 // 40)
+
+    return {
+        "success": True,
+        "subject": "mathematics",
+        "generation_id": str(uuid.uuid4()),
+        "message": "生成成功",
+        "visualization": {
+            "html_content": html,
+            "data": {"x": x, "y": np.sin(x) + rng.normal(0, 0.01, points)},
+            "template_id": "function_plot"
+        },
+        "metadata": {"request_type": "highschool_visualization", "points": points}
+    }
+
+
+def legacy_serialize(payload: Dict[str, Any]) -> bytes:
+    """旧路径：numpy 先转列表，再经过 response_model 校验、jsonable_encoder 和 json.dumps"""
+    data = payload["visualization"]["data"]
+    payload = {**payload, "visualization": {
+        **payload["visualization"],
+        "data": {key: value.tolist() for key, value in data.items()}
+    }}
+    validated = HighSchoolResponse(**payload)
+    encoded = jsonable_encoder(validated)
+    return json.dumps(encoded, ensure_ascii=False).encode("utf-8")
+
+
+def fast_serialize(payload: Dict[str, Any]) -> bytes:
+    """新路径：直接序列化，numpy 数组由序列化器处理"""
+    return dumps(payload)
+
+
+def measure(func: Callable[[Dict[str, Any]], bytes], payload: Dict[str, Any], rounds: int) -> Dict[str, float]:
+    """
+    测量序列化耗时与内存峰值
+
+    Args:
+        func: 序列化函数
+        payload: 负载
+        rounds: 计时轮数
+
+    Returns:
+        Dict[str, float]: 耗时中位数（毫秒）、内存峰值（MB）、输出大小（KB）
+    """
+    timings: List[float] = []
+    output = b""
+    for _ in range(rounds):
+        start = time.perf_counter()
+        output = func(payload)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_ms": statistics.median(timings) * 1000,
+        "peak_mb": peak / 1024 / 1024,
+        "size_kb": len(output) / 1024
+    }
+
+
+def main():
+    """主函数"""
+    print("🚀 JSON序列化性能测试")
+    print(f"   序列化后端: {'orjson' if HAS_ORJSON else '标准库 json（未安装 orjson）'}")
+    print(f"{'负载':>8} | {'旧路径(ms)':>10} | {'新路径(ms)':>10} | {'加速比':>6} | {'旧峰值(MB)':>10} | {'新峰值(MB)':>10}")
+
+    for target in PAYLOAD_SIZES:
+        payload = build_payload(target)
+        rounds = 20 if target <= 1024 * 1024 else 5
+        legacy = measure(legacy_serialize, payload, rounds)
+        fast = measure(fast_serialize, payload, rounds)
+        speedup = legacy["median_ms"] / fast["median_ms"] if fast["median_ms"] else float("inf")
+        print(
+            f"{fast['size_kb']:>6.0f}KB | {legacy['median_ms']:>10.2f} | {fast['median_ms']:>10.2f} | "
+            f"{speedup:>5.1f}x | {legacy['peak_mb']:>10.2f} | {fast['peak_mb']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
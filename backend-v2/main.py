@@ -3,36 +3,53 @@
 主API网关和学科Agent管理层
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Header, Depends, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, Response, FileResponse, PlainTextResponse
 from pydantic import BaseModel, Field
-from typing import Dict, List, Optional, Any, Union
-import json
+from typing import Dict, List, Optional, Any, Union, Set
 import uuid
 import asyncio
 import datetime
 import os
-from pathlib import Path
+import time
+
+# 导入配置
+from config import settings, ensure_directories
+from services.structured_logging import (
+    configure_logging, shutdown_logging, get_logger, get_logging_stats,
+    bind_correlation_id, reset_correlation_id, new_correlation_id
+)
+
+# 日志在startup事件中配置（导入时不启动后台线程）
+logger = get_logger("main")
 
 # 导入Agent系统
-from agents.base_agent import BaseVisualizationAgent
-from agents.mathematics_agent import MathematicsAgent
-from agents.astronomy_agent import AstronomyAgent
-from agents.physics_agent import PhysicsAgent
-from agents.chemistry_agent import ChemistryAgent
-from agents.biology_agent import BiologyAgent
+# 学科Agent由路由器的注册表在首次使用时创建
 from agents.router_manager import VisualizationRouter
 from agents.template_engine import UnifiedTemplateEngine
-
-# 导入配置
-from config import settings
+from agents.prompt_analysis import PromptAnalysis
+
+# 导入服务层
+from services.generation_scheduler import GenerationScheduler, SchedulerFullError, GenerationCancelled, ensure_job_active
+from services.status_store import GenerationRecord, TERMINAL_STATUSES
+from services.job_store import create_job_store
+from services.progress_events import ProgressBroadcaster
+from services.artifact_writer import ArtifactWriter
+from services.artifact_store import ArtifactStore, content_key, etag_matches
+from services.artifact_retention import ArtifactRetentionManager
+from services.request_coalescer import RequestCoalescer, make_request_key, normalize_prompt
+from services.batch_runner import BatchRunner
+from services.metrics import stage_metrics, timed_stage
+from services.fast_json import FastJSONResponse, dumps, dumps_str
+from services.deadline import Deadline
 
 app = FastAPI(
     title="万物可视化 v2.0 API",
     description="基于集中式路由架构的智能可视化生成平台",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # CORS配置
@@ -44,8 +61,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def correlation_id_middleware(request: Request, call_next):
+    """为每个请求绑定关联ID（沿用客户端传入的 X-Request-ID）"""
+    correlation_id = (request.headers.get("X-Request-ID") or new_correlation_id())[:128]
+    token = bind_correlation_id(correlation_id)
+    try:
+        response = await call_next(request)
+    finally:
+        reset_correlation_id(token)
+
+    response.headers["X-Request-ID"] = correlation_id
+    return response
+
 # 静态文件服务
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# 目录在startup事件中创建，这里不在导入时检查
+app.mount("/static", StaticFiles(directory=settings.STATIC_DIR, check_dir=False), name="static")
 
 # 挂载前端目录
 app.mount("/frontend-v2", StaticFiles(directory="../frontend-v2", html=True), name="frontend")
@@ -53,13 +84,124 @@ app.mount("/main-app", StaticFiles(directory="../main-app", html=True), name="ma
 
 # 全局状态
 class AppState:
-    def __init__(self):
+    """应用状态 - 各组件在startup事件中创建，导入本模块不创建路由器、存储和调度器"""
+
+    def initialize(self):
+        """创建路由器、存储、调度器等组件（每次启动重新创建）"""
         self.router = VisualizationRouter()
+        self.router.subject_classifier.set_fallback(
+            settings.FALLBACK_CLASSIFIER_PATH,
+            min_probability=settings.FALLBACK_MIN_PROBABILITY,
+            templates_dir=settings.TEMPLATES_DIR,
+            enabled=settings.FALLBACK_CLASSIFIER_ENABLED
+        )
+        self.router.set_composite(
+            enabled=settings.COMPOSITE_ENABLED,
+            ratio=settings.COMPOSITE_SCORE_RATIO,
+            min_score=settings.COMPOSITE_MIN_SCORE,
+            max_subjects=settings.COMPOSITE_MAX_SUBJECTS,
+            agent_timeout=settings.COMPOSITE_AGENT_TIMEOUT,
+            workers=settings.COMPOSITE_WORKERS
+        )
+        self.router.set_render_cache(settings.RENDER_CACHE_MAX_BYTES, settings.RENDER_CACHE_TTL)
         self.template_engine = UnifiedTemplateEngine()
-        self.active_generations: Dict[str, Dict] = {}
+        self.progress_broadcaster = ProgressBroadcaster()
+        self.artifact_writer = ArtifactWriter(
+            max_workers=settings.ARTIFACT_WRITE_WORKERS,
+            fsync_mode=settings.ARTIFACT_FSYNC_MODE,
+            fsync_interval=settings.ARTIFACT_FSYNC_INTERVAL
+        )
+        self.artifact_retention = ArtifactRetentionManager(
+            settings.OUTPUT_DIR,
+            max_bytes=settings.ARTIFACT_MAX_BYTES,
+            max_age=settings.ARTIFACT_MAX_AGE,
+            sweep_interval=settings.ARTIFACT_RETENTION_INTERVAL,
+            grace_period=settings.ARTIFACT_RETENTION_GRACE,
+            index_path=settings.ARTIFACT_ACCESS_INDEX,
+            referenced_ids=self._referenced_artifacts,
+            on_evict=self._on_artifact_evicted
+        )
+        self.artifact_store = ArtifactStore(
+            settings.OUTPUT_DIR,
+            self.artifact_writer,
+            precompress=settings.ARTIFACT_PRECOMPRESS,
+            on_access=self.artifact_retention.touch
+        )
+        self.generation_store = create_job_store(
+            settings.JOB_STORE_BACKEND,
+            settings.DATABASE_URL,
+            max_entries=settings.GENERATION_STATUS_MAX_ENTRIES,
+            terminal_ttl=settings.GENERATION_STATUS_TTL,
+            on_update=self._on_generation_update,
+            idempotency_ttl=settings.IDEMPOTENCY_KEY_TTL,
+            flush_interval=settings.JOB_STORE_FLUSH_INTERVAL,
+            orphan_timeout=settings.JOB_STORE_ORPHAN_TIMEOUT
+        )
+        self.request_coalescer = RequestCoalescer(
+            result_ttl=settings.COALESCE_RESULT_TTL,
+            max_results=settings.COALESCE_MAX_RESULTS
+        )
+        self.scheduler = GenerationScheduler(
+            worker_count=settings.MAX_CONCURRENT_GENERATIONS,
+            queue_size=settings.GENERATION_QUEUE_SIZE,
+            job_timeout=settings.AGENT_TIMEOUT,
+            on_start=self._on_generation_start,
+            on_timeout=self._on_generation_timeout,
+            is_cancelled=self.generation_store.is_cancel_requested,
+            on_cancel=self._on_generation_cancelled,
+            priority_weights=settings.GENERATION_PRIORITY_WEIGHTS,
+            client_limit=settings.GENERATION_CLIENT_LIMIT,
+            shed_queue_wait=settings.GENERATION_SHED_QUEUE_WAIT
+        )
+
+    def _on_generation_update(self, record: GenerationRecord):
+        """状态变更时推送给订阅者"""
+        self.progress_broadcaster.publish(record.generation_id, build_status_payload(record))
+
+    async def _referenced_artifacts(self) -> Set[str]:
+        """未过期任务引用的可视化ID，产物清理时跳过"""
+        urls = await self.generation_store.referenced_urls()
+        return {url.rsplit("/", 1)[-1].removesuffix(".html") for url in urls}
+
+    def _on_artifact_evicted(self, viz_id: str):
+        """产物被清理后移除存储层缓存"""
+        self.artifact_store.forget(viz_id)
+
+    def _on_generation_start(self, generation_id: str, queue_wait: float):
+        """任务出队开始执行时记录排队时间"""
+        self.generation_store.update(
+            generation_id,
+            queue_wait=round(queue_wait, 3),
+            started_at=datetime.datetime.now()
+        )
+
+    def _on_generation_timeout(self, generation_id: str, timeout: float):
+        """任务超时时标记失败"""
+        self.generation_store.update(
+            generation_id,
+            status="failed",
+            error=f"生成超时（超过{timeout}秒）",
+            failed_at=datetime.datetime.now()
+        )
+
+    def _on_generation_cancelled(self, generation_id: str):
+        """任务被取消（排队中跳过或在阶段之间停止）时标记为已取消"""
+        record = self.generation_store.get(generation_id)
+        if record is not None and not record.is_terminal:
+            self.generation_store.update(generation_id, status="cancelled", error="任务已被取消")
 
 state = AppState()
 
+# 调度优先级（权重见 settings.GENERATION_PRIORITY_WEIGHTS）
+INTERACTIVE_PRIORITY = "interactive"  # 同步等待结果的交互式请求
+BULK_PRIORITY = "bulk"  # 后台任务与批量生成，过载时最先被拒绝
+
+def client_identity(request: Request, x_client_id: Optional[str] = Header(default=None)) -> str:
+    """客户端标识（单客户端并发上限用）：优先使用 X-Client-Id 请求头，否则使用客户端地址"""
+    if x_client_id:
+        return x_client_id[:128]
+    return request.client.host if request.client else "unknown"
+
 # ==============================
 # 数据模型定义
 # ==============================
@@ -71,10 +213,27 @@ class UniversalVisualizationRequest(BaseModel):
     template_id: Optional[str] = Field(default=None, description="指定模板ID")
     parameters: Optional[Dict[str, Any]] = Field(default={}, description="可视化参数")
 
+class BatchGenerationItem(BaseModel):
+    """批量生成中的单个条目"""
+    prompt: str = Field(..., description="用户输入的可视化需求", min_length=1, max_length=5000)
+    subject: Optional[str] = Field(default=None, description="指定学科，未指定时自动识别")
+    template_id: Optional[str] = Field(default=None, description="指定模板ID")
+    parameters: Optional[Dict[str, Any]] = Field(default={}, description="可视化参数")
+    user_preferences: Optional[Dict[str, Any]] = Field(default={}, description="用户偏好设置")
+
+class BatchGenerationRequest(BaseModel):
+    """批量可视化生成请求"""
+    items: List[BatchGenerationItem] = Field(..., description="生成条目列表")
+    concurrency: Optional[int] = Field(default=None, description="批次内并发数，默认使用服务端上限")
+
 class ClassificationRequest(BaseModel):
     """学科分类请求"""
     prompt: str = Field(..., description="需要分类的文本")
 
+class BatchClassificationRequest(BaseModel):
+    """批量学科分类请求"""
+    prompts: List[str] = Field(..., description="需要分类的文本列表（结果顺序与之一致）")
+
 class TemplateResponse(BaseModel):
     """模板响应"""
     id: str
@@ -132,82 +291,145 @@ class HighSchoolResponse(BaseModel):
     error: Optional[str] = None
 
 @app.post("/api/v2/highschool/generate", response_model=HighSchoolResponse)
-async def highschool_generate(request: HighSchoolRequest):
-    """茅塞顿开专用生成接口 - 高中全科可视化"""
+async def highschool_generate(
+    request: HighSchoolRequest,
+    x_request_timeout: Optional[float] = Header(default=None, gt=0),
+    client_id: str = Depends(client_identity)
+):
+    """
+    茅塞顿开专用生成接口 - 高中全科可视化
+
+    以交互优先级经调度器执行，与后台任务按权重分享worker。
+    X-Request-Timeout 请求头（秒）可缩短本次请求的时间预算，
+    剩余预算不足时返回降级渲染的结果（metadata.degraded 为真），预算耗尽仍未完成时返回504。
+    """
+    deadline = make_deadline(x_request_timeout)
     try:
-        print(f"🎓 茅塞顿开请求: {request.prompt[:50]}...")
-        print(f"📚 年级水平: {request.grade_level}")
-        print(f"🔬 指定学科: {request.subject or '自动识别'}")
-
-        # 1. 学科识别（如果未指定）
-        if request.subject:
-            subject = request.subject
-            print(f"✅ 使用指定学科: {subject}")
-        else:
-            subject = await state.router.subject_classifier.classify(request.prompt)
-            print(f"🤖 智能识别学科: {subject}")
-
-        # 2. 高中年级适配
-        user_preferences = request.user_preferences.copy()
-        user_preferences["grade_level"] = request.grade_level
-        user_preferences["interaction_mode"] = request.interaction_mode
-
-        # 3. 增强提示词（适配高中教育）
-        enhanced_prompt = f"{request.prompt} [高中{request.grade_level}年级]"
-
-        # 4. 调用路由生成
-        response = await state.router.route_request(enhanced_prompt, user_preferences)
-
-        if not response.get("success"):
-            raise HTTPException(status_code=500, detail="可视化生成失败")
-
-        # 5. 构建茅塞顿开专用响应
-        result = {
-            "success": True,
-            "subject": subject,
-            "generation_id": str(uuid.uuid4()),
-            "message": f"成功生成{subject}学科的可视化内容",
-            "visualization": {
-                "type": response.get("requirement", {}).get("visualization_type", "default"),
-                "title": response.get("template", {}).get("name", "默认可视化"),
-                "html_content": response.get("html_content", ""),
-                "interactive_elements": response.get("config", {}).get("interactive_elements", []),
-                "concepts": response.get("requirement", {}).get("concepts", []),
-                "grade_level": request.grade_level,
-                "subject": subject
-            },
-            "metadata": {
-                "processing_time": response.get("routing_info", {}).get("processing_time", "未知"),
-                "agent_id": response.get("agent_info", {}).get("agent_id", "未知"),
-                "template_id": response.get("template", {}).get("id", "default"),
-                "confidence": response.get("routing_info", {}).get("confidence", 0.85),
-                "request_type": "highschool_visualization"
-            }
-        }
+        logger.info(
+            "茅塞顿开请求",
+            prompt=request.prompt[:50],
+            grade_level=request.grade_level,
+            subject=request.subject or "auto"
+        )
 
-        print(f"✅ 茅塞顿开生成完成: {subject}学科")
-        return result
+        # 相同请求（课堂上同一提示词）合并为一次流水线执行；
+        # 预算一开始就不足以走完整路径的请求单独合并，其降级结果不会交给预算充足的调用方
+        key = make_request_key(
+            "highschool",
+            normalize_prompt(request.prompt),
+            request.grade_level,
+            request.subject,
+            request.interaction_mode,
+            request.user_preferences,
+            "degraded" if deadline.tight else "full"
+        )
+        # 降级结果不进入短期缓存，预算恢复后的请求重新走完整路径；
+        # 共享执行按发起者的截止时间运行，每个调用方只按自己的剩余预算等待，
+        # 超时只放弃本次等待（共享任务受 shield 保护，继续为其他调用方执行）
+        try:
+            result = await asyncio.wait_for(
+                state.request_coalescer.run(
+                    key,
+                    lambda: run_interactive(client_id, run_highschool_generation, request, deadline),
+                    should_cache=lambda shared: shared.get("success", False) and not shared["metadata"].get("degraded")
+                ),
+                timeout=deadline.remaining()
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"生成超时（超过{deadline.budget:g}秒）")
+
+        # 共享结果复制一份，每个调用方获得独立的 generation_id
+        # 响应由服务端构建且包含完整HTML，直接序列化，跳过 response_model 重复校验
+        return FastJSONResponse({"error": None, **result, "generation_id": str(uuid.uuid4())})
 
     except HTTPException:
         raise
     except Exception as e:
         error_msg = f"茅塞顿开生成失败: {str(e)}"
-        print(f"❌ {error_msg}")
+        logger.error("茅塞顿开生成失败", error=str(e))
 
-        return {
+        return FastJSONResponse({
             "success": False,
             "subject": request.subject or "general",
             "generation_id": str(uuid.uuid4()),
             "message": "生成过程中发生错误",
+            "visualization": None,
             "error": error_msg,
             "metadata": {
                 "request_type": "highschool_visualization",
                 "error_details": str(e)
             }
+        })
+
+async def run_highschool_generation(request: HighSchoolRequest, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """执行茅塞顿开生成流水线（由请求合并器调用）"""
+    # 1. 分析一次提示词，学科识别和路由共用同一分析结果
+    # （年级标注不含学科信息，只分析用户输入，避免干扰统计后备分类）
+    enhanced_prompt = f"{request.prompt} [高中{request.grade_level}年级]"
+    analysis = await analyze_prompt(request.prompt)
+
+    # 2. 学科识别（如果未指定）
+    if request.subject:
+        subject = request.subject
+        logger.debug("使用指定学科", subject=subject)
+    else:
+        subject = analysis.subject
+        logger.debug("智能识别学科", subject=subject)
+
+    # 3. 高中年级适配
+    user_preferences = request.user_preferences.copy()
+    user_preferences["grade_level"] = request.grade_level
+    user_preferences["interaction_mode"] = request.interaction_mode
+
+    # 4. 调用路由生成（在调度器线程中执行）
+    # 未指定学科时允许跨学科组合
+    response = await state.scheduler.offload(
+        state.router.route_request,
+        enhanced_prompt, user_preferences, deadline=deadline, analysis=analysis, composite=not request.subject
+    )
+
+    if not response.get("success"):
+        raise HTTPException(status_code=500, detail="可视化生成失败")
+
+    # 5. 构建茅塞顿开专用响应
+    result = {
+        "success": True,
+        "subject": subject,
+        "generation_id": str(uuid.uuid4()),
+        "message": f"成功生成{subject}学科的可视化内容",
+        "visualization": {
+            "type": response.get("requirement", {}).get("visualization_type", "default"),
+            "title": response.get("template", {}).get("name", "默认可视化"),
+            "html_content": response.get("html_content", ""),
+            "interactive_elements": response.get("config", {}).get("interactive_elements", []),
+            "concepts": response.get("requirement", {}).get("concepts", []),
+            "grade_level": request.grade_level,
+            "subject": subject
+        },
+        "metadata": {
+            "processing_time": response.get("routing_info", {}).get("processing_time", "未知"),
+            "stage_timings": response.get("routing_info", {}).get("stage_timings", {}),
+            "agent_id": response.get("agent_info", {}).get("agent_id", "未知"),
+            "template_id": response.get("template", {}).get("id", "default"),
+            "confidence": response.get("routing_info", {}).get("confidence", 0.0),
+            "degraded": response.get("degraded", False),
+            "composite": response.get("composite", False),
+            "subjects": response.get("subjects", [subject]),
+            "panels": response.get("panels", []),
+            "request_type": "highschool_visualization"
         }
+    }
+
+    logger.info("茅塞顿开生成完成", subject=subject)
+    return result
 
 @app.post("/api/v2/generate", response_model=GenerationResponse)
-async def universal_generate(request: UniversalVisualizationRequest, background_tasks: BackgroundTasks):
+async def universal_generate(
+    request: UniversalVisualizationRequest,
+    idempotency_key: Optional[str] = Header(default=None),
+    x_request_timeout: Optional[float] = Header(default=None, gt=0),
+    client_id: str = Depends(client_identity)
+):
     """
     通用可视化生成接口 - 方案A核心入口
 
@@ -216,41 +438,106 @@ async def universal_generate(request: UniversalVisualizationRequest, background_
     2. Agent需求解析
     3. 模板匹配
     4. 可视化生成
+
+    携带 Idempotency-Key 请求头的重试返回原任务，不会重复执行流水线。
+    时间预算从提交时开始计算（含排队时间），剩余预算不足时结果走降级渲染路径。
     """
     try:
         # 生成唯一ID
         generation_id = str(uuid.uuid4())
 
-        # 记录生成状态
-        state.active_generations[generation_id] = {
-            "status": "initializing",
-            "created_at": datetime.datetime.now(),
-            "prompt": request.prompt,
-            "progress": 0
-        }
+        # 相同幂等键的重试直接返回原任务
+        args = [request.prompt, request.user_preferences or {}, request.template_id, request.parameters or {}]
+        replayed = await claim_idempotency_key(idempotency_key, "universal", args, generation_id)
+        if replayed is not None:
+            return replayed
 
-        # 后台任务处理
-        background_tasks.add_task(
-            process_visualization_generation,
-            generation_id,
-            request.prompt,
-            request.user_preferences or {},
-            request.template_id,
-            request.parameters or {}
+        # 截止时刻随任务参数保存（不参与幂等指纹）
+        args.append(make_deadline(x_request_timeout).timestamp())
+
+        # 记录生成状态（保存请求参数，进程重启后可重新提交）
+        state.generation_store.create(
+            generation_id, "queued", prompt=request.prompt,
+            request={"kind": "universal", "args": args}
         )
 
+        # 提交到生成调度队列
+        await submit_generation(generation_id, "universal", args, idempotency_key, client_id)
+
         return GenerationResponse(
             generation_id=generation_id,
             status="processing",
             message="已开始生成可视化，请稍候...",
-            estimated_time=5
+            estimated_time=state.scheduler.estimate_retry_after()
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"生成失败: {str(e)}")
 
+@app.post("/api/v2/generate/batch")
+async def batch_generate(
+    request: BatchGenerationRequest,
+    x_request_timeout: Optional[float] = Header(default=None, gt=0),
+    client_id: str = Depends(client_identity)
+):
+    """
+    批量可视化生成接口
+
+    每个条目完成后立即以一行JSON（NDJSON）返回，最后一行为批次汇总；
+    批次内重复提示词的学科识别、相同条目的解析与渲染只执行一次。
+    条目以批量优先级经调度器执行，过载或超出客户端并发上限时该条目返回错误。
+    X-Request-Timeout（秒）为每个条目的时间预算，剩余预算不足的条目走降级渲染路径。
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="批量请求不能为空")
+    if len(request.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"批量条目过多: {len(request.items)}（上限 {settings.BATCH_MAX_ITEMS}）"
+        )
+
+    concurrency = min(request.concurrency or settings.BATCH_MAX_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+    runner = BatchRunner(concurrency)
+
+    async def result_stream():
+        started = time.perf_counter()
+        succeeded = 0
+        async for index, result in runner.run(
+            request.items,
+            lambda index, item: process_batch_item(runner, index, item, make_deadline(x_request_timeout), client_id)
+        ):
+            succeeded += result["success"]
+            yield dumps(result) + b"\n"
+
+        summary = {
+            "type": "summary",
+            "total": len(request.items),
+            "succeeded": succeeded,
+            "failed": len(request.items) - succeeded,
+            "elapsed": round(time.perf_counter() - started, 3),
+            **runner.get_stats()
+        }
+        yield dumps(summary) + b"\n"
+
+    return StreamingResponse(
+        result_stream(),
+        media_type="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.post("/api/v2/{subject}/generate", response_model=GenerationResponse)
-async def subject_specific_generate(subject: str, request: UniversalVisualizationRequest, background_tasks: BackgroundTasks):
+async def subject_specific_generate(
+    subject: str,
+    request: UniversalVisualizationRequest,
+    idempotency_key: Optional[str] = Header(default=None),
+    x_request_timeout: Optional[float] = Header(default=None, gt=0),
+    client_id: str = Depends(client_identity)
+):
     """
     学科特定可视化生成接口
     支持的学科: mathematics, astronomy, physics, chemistry, biology
@@ -266,144 +553,80 @@ async def subject_specific_generate(subject: str, request: UniversalVisualizatio
     try:
         generation_id = str(uuid.uuid4())
 
-        state.active_generations[generation_id] = {
-            "status": "initializing",
-            "created_at": datetime.datetime.now(),
-            "subject": subject,
-            "prompt": request.prompt,
-            "progress": 0
-        }
+        args = [subject, request.prompt, request.user_preferences or {}, request.template_id, request.parameters or {}]
+        replayed = await claim_idempotency_key(idempotency_key, "subject", args, generation_id)
+        if replayed is not None:
+            return replayed
 
-        background_tasks.add_task(
-            process_subject_specific_generation,
-            generation_id,
-            subject,
-            request.prompt,
-            request.user_preferences or {},
-            request.template_id,
-            request.parameters or {}
+        args.append(make_deadline(x_request_timeout).timestamp())
+
+        state.generation_store.create(
+            generation_id, "queued", prompt=request.prompt, subject=subject,
+            request={"kind": "subject", "args": args}
         )
 
+        await submit_generation(generation_id, "subject", args, idempotency_key, client_id)
+
         return GenerationResponse(
             generation_id=generation_id,
             status="processing",
             message=f"已开始生成{subject}可视化...",
-            estimated_time=5
+            estimated_time=state.scheduler.estimate_retry_after()
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"{subject}学科生成失败: {str(e)}")
 
 @app.post("/api/v2/classify")
 async def classify_subject(request: ClassificationRequest):
-    """智能学科分类接口"""
+    """智能学科分类接口（返回各学科得分及由得分推导的置信度）"""
     try:
-        subject = await state.router.subject_classifier.classify(request.prompt)
-
-        return {
-            "subject": subject,
-            "confidence": 0.85,  # 简化版，实际应该计算置信度
-            "all_scores": {
-                "mathematics": 0.9 if "数学" in request.prompt else 0.1,
-                "astronomy": 0.9 if "天文" in request.prompt else 0.1,
-                "physics": 0.9 if "物理" in request.prompt else 0.1,
-            }
-        }
+        classifier = state.router.subject_classifier
+        analysis = classifier.analyze(request.prompt)
+        return classifier.describe(analysis.subject, analysis.scores, analysis.fallback_probability)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"分类失败: {str(e)}")
 
-# 茅塞顿开专用API端点
-class HighSchoolRequest(BaseModel):
-    prompt: str = Field(..., description="用户输入的自然语言描述")
-    grade_level: str = Field(default="high_school", description="年级水平: elementary, middle_school, high_school, university")
-    subject: Optional[str] = Field(None, description="指定学科: mathematics, physics, chemistry, biology, astronomy")
-    interaction_mode: str = Field(default="visualization", description="交互模式: chat, visualization, both")
-    user_preferences: Dict[str, Any] = Field(default_factory=dict, description="用户偏好设置")
+@app.post("/api/v2/classify/batch")
+async def classify_subject_batch(request: BatchClassificationRequest):
+    """
+    批量学科分类接口（离线分析、测试集整理）
 
-class HighSchoolResponse(BaseModel):
-    success: bool
-    subject: str
-    generation_id: str
-    message: Optional[str] = None
-    visualization: Optional[Dict[str, Any]] = None
-    metadata: Dict[str, Any] = {}
-    error: Optional[str] = None
+    所有提示词共享同一关键词自动机扫描，得分矩阵由 numpy 一次性计算，
+    在线程池中执行以免阻塞事件循环。结果顺序与输入一致。
+    """
+    if len(request.prompts) > settings.CLASSIFY_BATCH_MAX_PROMPTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"批量分类条目过多: {len(request.prompts)}（上限 {settings.CLASSIFY_BATCH_MAX_PROMPTS}）"
+        )
 
-@app.post("/api/v2/highschool/generate", response_model=HighSchoolResponse)
-async def highschool_generate(request: HighSchoolRequest):
-    """茅塞顿开专用生成接口 - 高中全科可视化"""
+    started = time.perf_counter()
     try:
-        print(f"🎓 茅塞顿开请求: {request.prompt[:50]}...")
-        print(f"📚 年级水平: {request.grade_level}")
-        print(f"🔬 指定学科: {request.subject or '自动识别'}")
-
-        # 1. 学科识别（如果未指定）
-        if request.subject:
-            subject = request.subject
-            print(f"✅ 使用指定学科: {subject}")
-        else:
-            subject = await state.router.subject_classifier.classify(request.prompt)
-            print(f"🤖 智能识别学科: {subject}")
-
-        # 2. 高中年级适配
-        user_preferences = request.user_preferences.copy()
-        user_preferences["grade_level"] = request.grade_level
-        user_preferences["interaction_mode"] = request.interaction_mode
-
-        # 3. 增强提示词（适配高中教育）
-        enhanced_prompt = f"{request.prompt} [高中{request.grade_level}年级]"
-
-        # 4. 调用路由生成
-        response = await state.router.route_request(enhanced_prompt, user_preferences)
-
-        if not response.get("success"):
-            raise HTTPException(status_code=500, detail="可视化生成失败")
-
-        # 5. 构建茅塞顿开专用响应
-        result = {
-            "success": True,
-            "subject": subject,
-            "generation_id": str(uuid.uuid4()),
-            "message": f"成功生成{subject}学科的可视化内容",
-            "visualization": {
-                "type": response.get("requirement", {}).get("visualization_type", "default"),
-                "title": response.get("template", {}).get("name", "默认可视化"),
-                "html_content": response.get("html_content", ""),
-                "interactive_elements": response.get("config", {}).get("interactive_elements", []),
-                "concepts": response.get("requirement", {}).get("concepts", []),
-                "grade_level": request.grade_level,
-                "subject": subject
-            },
-            "metadata": {
-                "processing_time": response.get("routing_info", {}).get("processing_time", "未知"),
-                "agent_id": response.get("agent_info", {}).get("agent_id", "未知"),
-                "template_id": response.get("template", {}).get("id", "default"),
-                "confidence": response.get("routing_info", {}).get("confidence", 0.85),
-                "request_type": "highschool_visualization"
-            }
-        }
-
-        print(f"🎉 茅塞顿开生成完成: {subject} 学科")
-        return result
-
+        results = await asyncio.to_thread(state.router.subject_classifier.classify_many, request.prompts)
     except Exception as e:
-        error_msg = f"茅塞顿开生成失败: {str(e)}"
-        print(f"❌ {error_msg}")
+        raise HTTPException(status_code=500, detail=f"批量分类失败: {str(e)}")
 
-        return {
-            "success": False,
-            "subject": request.subject or "general",
-            "generation_id": str(uuid.uuid4()),
-            "message": "生成过程中发生错误",
-            "error": error_msg,
-            "metadata": {
-                "request_type": "highschool_visualization",
-                "error_details": str(e)
-            }
-        }
+    subject_counts: Dict[str, int] = {}
+    for result in results:
+        subject_counts[result["subject"]] = subject_counts.get(result["subject"], 0) + 1
+
+    return FastJSONResponse({
+        "results": results,
+        "total": len(results),
+        "subject_counts": subject_counts,
+        "processing_time": round(time.perf_counter() - started, 4)
+    })
 
 @app.post("/api/v2/highschool/{subject}/generate", response_model=HighSchoolResponse)
-async def highschool_subject_generate(subject: str, request: HighSchoolRequest):
+async def highschool_subject_generate(
+    subject: str,
+    request: HighSchoolRequest,
+    x_request_timeout: Optional[float] = Header(default=None, gt=0),
+    client_id: str = Depends(client_identity)
+):
     """茅塞顿开学科专用生成接口"""
     try:
         # 验证学科支持
@@ -418,7 +641,7 @@ async def highschool_subject_generate(subject: str, request: HighSchoolRequest):
         request.subject = subject
 
         # 调用主生成接口
-        return await highschool_generate(request)
+        return await highschool_generate(request, x_request_timeout, client_id)
 
     except HTTPException:
         raise
@@ -492,43 +715,201 @@ async def search_templates(query: str, subject: Optional[str] = None):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"搜索模板失败: {str(e)}")
 
+def build_status_payload(generation_info: GenerationRecord) -> Dict[str, Any]:
+    """构建生成状态响应（轮询与推送共用）"""
+    # 仍在排队的任务实时计算已等待时间
+    queue_wait = generation_info.queue_wait
+    if queue_wait is None:
+        timing = state.scheduler.get_job_timing(generation_info.generation_id)
+        if timing:
+            queue_wait = timing["queue_wait"]
+
+    return {
+        "generation_id": generation_info.generation_id,
+        "status": generation_info.status,
+        "progress": generation_info.progress,
+        "created_at": generation_info.created_at,
+        "queue_wait": queue_wait,
+        "write_time": generation_info.write_time,
+        "html_url": generation_info.html_url,
+        "degraded": generation_info.degraded,
+        "error": generation_info.error
+    }
+
 @app.get("/api/v2/status/{generation_id}")
 async def get_generation_status(generation_id: str):
-    """获取生成状态"""
-    if generation_id not in state.active_generations:
+    """获取生成状态（轮询接口，保留给旧客户端）"""
+    generation_info = await state.generation_store.fetch(generation_id)
+    if generation_info is None:
         raise HTTPException(status_code=404, detail="生成任务不存在")
 
-    generation_info = state.active_generations[generation_id]
+    return build_status_payload(generation_info)
 
-    return {
-        "generation_id": generation_id,
-        "status": generation_info["status"],
-        "progress": generation_info.get("progress", 0),
-        "created_at": generation_info["created_at"],
-        "html_url": generation_info.get("html_url"),
-        "error": generation_info.get("error")
-    }
+@app.delete("/api/v2/status/{generation_id}")
+async def cancel_generation(generation_id: str):
+    """
+    取消生成任务
+
+    排队中的任务立即取消；执行中的任务在下一个流水线阶段之间停止并释放worker。
+    任务在其他worker上执行时，取消请求经共享任务存储传递。
+    """
+    record = await state.generation_store.fetch(generation_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="生成任务不存在")
+    if record.is_terminal:
+        raise HTTPException(status_code=409, detail=f"任务已结束（{record.status}），无法取消")
+
+    await state.generation_store.request_cancel(generation_id)
+    if state.scheduler.is_queued(generation_id):
+        # 尚未开始执行，worker出队时会直接跳过
+        state.generation_store.update(generation_id, status="cancelled", error="任务已被取消")
+
+    logger.info("已请求取消生成任务", generation_id=generation_id)
+    record = state.generation_store.get(generation_id) or record
+    return FastJSONResponse(
+        {**build_status_payload(record), "cancel_requested": True},
+        status_code=202
+    )
+
+async def iter_status_updates(generation_id: str):
+    """
+    订阅生成进度，依次产出状态快照，到达终态后结束
+
+    先产出当前状态，之后每次阶段变更产出一次；
+    超过心跳间隔无变更时产出 None，供调用方发送保活消息。
+    任务在其他worker上执行时收不到本进程的推送事件，按间隔重新读取状态。
+    """
+    queue = state.progress_broadcaster.subscribe(generation_id)
+    try:
+        generation_info = await state.generation_store.fetch(generation_id)
+        if generation_info is None:
+            return
+
+        payload = build_status_payload(generation_info)
+        last_stage = (payload["status"], payload["progress"])
+        last_sent = time.monotonic()
+        yield payload
+
+        poll_interval = min(settings.STATUS_STREAM_POLL_INTERVAL, settings.STATUS_STREAM_HEARTBEAT)
+        while payload["status"] not in TERMINAL_STATUSES:
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                generation_info = await state.generation_store.fetch(generation_id)
+                if generation_info is None:
+                    return
+                payload = build_status_payload(generation_info)
+
+            # 只推送阶段/进度发生变化的事件
+            stage = (payload["status"], payload["progress"])
+            if stage == last_stage:
+                if time.monotonic() - last_sent >= settings.STATUS_STREAM_HEARTBEAT:
+                    last_sent = time.monotonic()
+                    yield None
+                continue
+            last_stage = stage
+            last_sent = time.monotonic()
+            yield payload
+
+    finally:
+        state.progress_broadcaster.unsubscribe(generation_id, queue)
+
+@app.get("/api/v2/status/{generation_id}/stream")
+async def stream_generation_status(generation_id: str):
+    """通过 Server-Sent Events 实时推送生成进度"""
+    if await state.generation_store.fetch(generation_id) is None:
+        raise HTTPException(status_code=404, detail="生成任务不存在")
+
+    async def event_stream():
+        async for payload in iter_status_updates(generation_id):
+            if payload is None:
+                yield ": keep-alive\n\n"
+                continue
+            data = dumps_str(payload)
+            yield f"event: status\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@app.websocket("/api/v2/status/{generation_id}/ws")
+async def websocket_generation_status(websocket: WebSocket, generation_id: str):
+    """通过 WebSocket 实时推送生成进度"""
+    await websocket.accept()
+
+    if await state.generation_store.fetch(generation_id) is None:
+        await websocket.send_json({"generation_id": generation_id, "error": "生成任务不存在"})
+        await websocket.close(code=4404)
+        return
 
-@app.get("/api/v2/visualizations/{viz_id}")
-async def get_visualization(viz_id: str):
-    """获取可视化结果"""
     try:
-        # 这里应该从存储中读取HTML内容
-        viz_path = Path(f"static/visualizations/{viz_id}.html")
+        async for payload in iter_status_updates(generation_id):
+            if payload is None:
+                await websocket.send_json({"type": "heartbeat"})
+                continue
+            await websocket.send_text(dumps_str(payload))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+@app.get("/api/v2/visualizations/{viz_id}.html")
+async def get_visualization_html(
+    viz_id: str,
+    if_none_match: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None)
+):
+    """直接发送可视化HTML文件（零拷贝sendfile，支持预压缩与304）"""
+    artifact = state.artifact_store.get(viz_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="可视化不存在")
+
+    path, encoding, etag = state.artifact_store.select_variant(artifact, accept_encoding)
+    if state.artifact_store.is_immutable(viz_id):
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = "no-cache"
+
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    return FileResponse(path, media_type="text/html; charset=utf-8", headers=headers)
 
-        if not viz_path.exists():
+@app.get("/api/v2/visualizations/{viz_id}")
+async def get_visualization(viz_id: str, if_none_match: Optional[str] = Header(default=None)):
+    """获取可视化结果（支持 ETag / 304 Not Modified）"""
+    try:
+        artifact = state.artifact_store.get(viz_id)
+        if artifact is None:
             raise HTTPException(status_code=404, detail="可视化不存在")
 
-        with open(viz_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
+        cache_headers = {"ETag": artifact.etag, "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, artifact.etag):
+            return Response(status_code=304, headers=cache_headers)
 
-        return {
-            "visualization_id": viz_id,
-            "html_content": html_content,
-            "title": f"可视化 - {viz_id}",
-            "created_at": datetime.datetime.now().isoformat()
-        }
+        # 在线程池中读取，避免阻塞事件循环
+        html_content = await asyncio.to_thread(artifact.path.read_text, encoding="utf-8")
 
+        return FastJSONResponse(
+            content={
+                "visualization_id": viz_id,
+                "html_content": html_content,
+                "title": f"可视化 - {viz_id}",
+                "created_at": artifact.created_at.isoformat()
+            },
+            headers=cache_headers
+        )
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取可视化失败: {str(e)}")
 
@@ -536,54 +917,355 @@ async def get_visualization(viz_id: str):
 # 后台任务处理
 # ==============================
 
+async def claim_idempotency_key(
+    idempotency_key: Optional[str],
+    kind: str,
+    args: List[Any],
+    generation_id: str
+) -> Optional[Response]:
+    """
+    占用 Idempotency-Key
+
+    Args:
+        idempotency_key: 请求头中的幂等键（未提供时不做处理）
+        kind: 任务类型
+        args: 任务参数（用于校验重试与原请求一致）
+        generation_id: 本次请求的新任务ID
+
+    Returns:
+        Response: 键已对应一个仍存在的任务时返回该任务的响应，否则返回None（由调用方创建新任务）
+    """
+    if not idempotency_key:
+        return None
+    if len(idempotency_key) > settings.IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key 过长（上限 {settings.IDEMPOTENCY_KEY_MAX_LENGTH} 个字符）"
+        )
+
+    fingerprint = make_request_key(kind, args)
+    existing = await state.generation_store.claim_idempotency_key(idempotency_key, fingerprint, generation_id)
+    if existing is None:
+        return None
+
+    original_id, original_fingerprint = existing
+    if original_fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key 已用于内容不同的请求")
+
+    # 其他worker刚创建的任务可能尚未写入数据库，此时按处理中返回
+    record = await state.generation_store.fetch(original_id)
+    logger.info("幂等重试，返回原任务", generation_id=original_id)
+    return FastJSONResponse(
+        GenerationResponse(
+            generation_id=original_id,
+            status=record.status if record is not None else "processing",
+            message="重复请求，返回已有的生成任务",
+            html_url=record.html_url if record is not None else None
+        ).model_dump(),
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+async def submit_generation(
+    generation_id: str,
+    kind: str,
+    args: List[Any],
+    idempotency_key: Optional[str] = None,
+    client_id: Optional[str] = None
+):
+    """
+    以批量优先级提交生成任务到调度队列，队列满、过载丢弃或超出客户端并发上限时返回429
+
+    Args:
+        generation_id: 生成任务ID
+        kind: 任务类型（见 GENERATION_HANDLERS）
+        args: 处理函数除 generation_id 以外的参数
+        idempotency_key: 本次请求占用的幂等键（提交失败时释放，允许客户端重试）
+        client_id: 客户端标识
+    """
+    try:
+        state.scheduler.submit(
+            generation_id, GENERATION_HANDLERS[kind], generation_id, *args,
+            priority=BULK_PRIORITY,
+            client_id=client_id
+        )
+    except SchedulerFullError as e:
+        state.generation_store.discard(generation_id)
+        if idempotency_key:
+            await state.generation_store.release_idempotency_key(idempotency_key)
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    logger.info("生成任务已提交", generation_id=generation_id)
+
+async def run_interactive(client_id: str, handler, *args):
+    """
+    以交互优先级经调度器执行并等待结果
+
+    Args:
+        client_id: 客户端标识
+        handler: 异步处理函数
+        *args: 处理函数的参数
+
+    Returns:
+        Any: 处理函数的返回值
+    """
+    try:
+        return await state.scheduler.run(
+            str(uuid.uuid4()), handler, *args,
+            priority=INTERACTIVE_PRIORITY,
+            client_id=client_id
+        )
+    except SchedulerFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"生成超时（超过{state.scheduler.job_timeout}秒）")
+
+def make_deadline(timeout: Optional[float] = None) -> Deadline:
+    """
+    创建请求截止时间
+
+    Args:
+        timeout: X-Request-Timeout 请求头（秒），只能缩短默认预算
+
+    Returns:
+        Deadline: 截止时间
+    """
+    budget = settings.REQUEST_DEADLINE if timeout is None else min(timeout, settings.REQUEST_DEADLINE)
+    return Deadline(budget, settings.DEADLINE_DEGRADE_BELOW)
+
+def restore_deadline(deadline_at: Optional[float]) -> Optional[Deadline]:
+    """由任务参数中保存的截止时刻恢复截止时间（旧版本任务没有该参数）"""
+    if deadline_at is None:
+        return None
+    return Deadline.from_timestamp(deadline_at, settings.DEADLINE_DEGRADE_BELOW)
+
+def ensure_not_cancelled(generation_id: str):
+    """在流水线阶段之间检查取消请求和任务超时，已取消或超时时抛出 GenerationCancelled（由调度器释放worker）"""
+    if state.generation_store.is_cancel_requested(generation_id):
+        raise GenerationCancelled(generation_id)
+    ensure_job_active()
+
+def stage_reporter(generation_id: str):
+    """
+    路由阶段回调（路由在调度器线程中执行）：先检查取消请求，再把阶段进度交给事件循环线程更新
+
+    需在处理函数中（事件循环线程）创建
+    """
+    loop = asyncio.get_running_loop()
+
+    def on_stage(stage: str, progress: int):
+        ensure_not_cancelled(generation_id)
+        loop.call_soon_threadsafe(report_stage, generation_id, stage, progress)
+    return on_stage
+
+def report_stage(generation_id: str, stage: str, progress: int):
+    """更新阶段进度（任务已结束时忽略超时后线程中迟到的进度）"""
+    record = state.generation_store.get(generation_id)
+    if record is not None and not record.is_terminal:
+        state.generation_store.update(generation_id, status=stage, progress=progress)
+
+async def analyze_prompt(prompt: str) -> PromptAnalysis:
+    """分析提示词（含学科识别）并记录耗时，结果传给路由器复用，整个请求只分析一次"""
+    timings: Dict[str, float] = {}
+    with timed_stage(timings, "classify"):
+        analysis = state.router.subject_classifier.analyze(prompt)
+    stage_metrics.observe("classify", timings["classify"], analysis.subject)
+    return analysis
+
+async def store_artifact(key: str, html_content: str, subject: str, template_id: Optional[str]):
+    """保存产物并记录写入耗时，返回 (产物信息, 耗时秒数)"""
+    timings: Dict[str, float] = {}
+    with timed_stage(timings, "artifact_write"):
+        artifact = await state.artifact_store.put(key, html_content)
+    stage_metrics.observe("artifact_write", timings["artifact_write"], subject, template_id)
+    return artifact, timings["artifact_write"]
+
+def rendered_key(subject: str, template_id: Optional[str], key: str, result: Dict[str, Any]) -> str:
+    """渲染时才降级的结果按实际渲染配置保存，避免占用完整结果的内容键"""
+    if result.get("degraded"):
+        return content_key(subject, template_id, result["config"])
+    return key
+
+async def save_artifact(generation_id: str, key: str, html_content: str, subject: str, template_id: Optional[str]):
+    """保存生成结果并记录写入耗时"""
+    artifact, write_time = await store_artifact(key, html_content, subject, template_id)
+    state.generation_store.update(generation_id, write_time=round(write_time, 4))
+    return artifact
+
 async def process_visualization_generation(
     generation_id: str,
     prompt: str,
     user_preferences: Dict[str, Any],
     template_id: Optional[str],
-    parameters: Dict[str, Any]
+    parameters: Dict[str, Any],
+    deadline_at: Optional[float] = None
 ):
     """处理可视化生成 - 方案A核心逻辑"""
+    deadline = restore_deadline(deadline_at)
 
     try:
         # 1. 更新状态: 学科识别
-        state.active_generations[generation_id]["status"] = "classifying"
-        state.active_generations[generation_id]["progress"] = 10
-        await asyncio.sleep(0.5)  # 模拟处理时间
-
-        # 2. 智能路由分发
-        result = await state.router.route_request(prompt, user_preferences)
-
-        # 3. 更新状态: 生成中
-        state.active_generations[generation_id]["status"] = "generating"
-        state.active_generations[generation_id]["progress"] = 50
-        state.active_generations[generation_id]["subject"] = result["subject"]
-
-        # 4. 生成可视化HTML
-        html_content = result["html_content"]
-        viz_id = f"viz_{generation_id[:8]}"
-
-        # 5. 保存HTML文件
-        output_dir = Path("static/visualizations")
-        output_dir.mkdir(exist_ok=True)
-
-        with open(output_dir / f"{viz_id}.html", 'w', encoding='utf-8') as f:
-            f.write(html_content)
-
-        # 6. 更新完成状态
-        state.active_generations[generation_id].update({
-            "status": "completed",
-            "progress": 100,
-            "html_url": f"/api/v2/visualizations/{viz_id}",
-            "completed_at": datetime.datetime.now()
-        })
+        state.generation_store.update(generation_id, status="classifying", progress=10)
+        ensure_not_cancelled(generation_id)
+
+        # 2. 智能路由分发（在调度器线程中执行；解析/匹配/生成阶段由路由器回调推送，阶段之间检查取消请求）
+        plan = await state.scheduler.offload(
+            state.router.prepare_route,
+            prompt,
+            user_preferences,
+            on_stage=stage_reporter(generation_id),
+            template_id=template_id,
+            parameters=parameters,
+            deadline=deadline
+        )
+        if not plan["success"]:
+            raise ValueError(plan["error"])
+
+        # 3. 记录识别出的学科
+        state.generation_store.update(generation_id, subject=plan["subject"])
+
+        # 4. 相同内容直接复用已有产物，否则渲染并保存
+        template_key = plan["template"].get("id")
+        key = content_key(plan["subject"], template_key, plan["config"])
+        degraded = bool(plan["config"].get("degraded"))
+        artifact = state.artifact_store.lookup(key)
+        if artifact is None:
+            ensure_not_cancelled(generation_id)
+            result = await state.scheduler.offload(state.router.render_route, plan)
+            if not result["success"]:
+                raise ValueError(result["error"])
+            ensure_not_cancelled(generation_id)
+            degraded = result["degraded"]
+            key = rendered_key(plan["subject"], template_key, key, result)
+            artifact = await save_artifact(generation_id, key, result["html_content"], plan["subject"], template_key)
+
+        # 5. 更新完成状态
+        state.generation_store.update(
+            generation_id,
+            status="completed",
+            progress=100,
+            html_url=f"/api/v2/visualizations/{artifact.viz_id}",
+            degraded=degraded,
+            completed_at=datetime.datetime.now()
+        )
 
+    except GenerationCancelled:
+        raise
     except Exception as e:
-        state.active_generations[generation_id].update({
-            "status": "failed",
-            "error": str(e),
-            "failed_at": datetime.datetime.now()
-        })
+        state.generation_store.update(
+            generation_id,
+            status="failed",
+            error=str(e),
+            failed_at=datetime.datetime.now()
+        )
+
+async def process_batch_item(
+    runner: BatchRunner,
+    index: int,
+    item: BatchGenerationItem,
+    deadline: Deadline,
+    client_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """处理批量生成中的单个条目（经调度器以批量优先级执行），返回一行结果"""
+    started = time.perf_counter()
+    try:
+        return await state.scheduler.run(
+            str(uuid.uuid4()),
+            run_batch_item, runner, index, item, started, deadline,
+            priority=BULK_PRIORITY,
+            client_id=client_id,
+            timeout=deadline.budget
+        )
+    except asyncio.TimeoutError:
+        error = f"生成超时（超过{deadline.budget:g}秒）"
+    except Exception as e:
+        error = str(e)
+
+    return {
+        "type": "result",
+        "index": index,
+        "success": False,
+        "prompt": item.prompt,
+        "error": error,
+        "elapsed": round(time.perf_counter() - started, 3)
+    }
+
+async def run_batch_item(
+    runner: BatchRunner,
+    index: int,
+    item: BatchGenerationItem,
+    started: float,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
+    """批量条目的生成流水线，批次内可共享的步骤通过 runner.shared 复用"""
+    prompt = item.prompt
+    normalized = normalize_prompt(prompt)
+    user_preferences = item.user_preferences or {}
+    parameters = item.parameters or {}
+
+    # 1. 学科：指定学科需受支持，否则按提示词识别（重复提示词只分析一次，分析结果交给路由器复用）
+    subject = item.subject
+    if subject and subject not in state.router.agents:
+        raise ValueError(f"不支持的学科: {subject}")
+    analysis = await runner.shared(
+        ("analyze", normalized),
+        lambda: analyze_prompt(prompt)
+    )
+    subject = subject or analysis.subject
+
+    # 2. 需求解析、模板匹配、配置生成（完全相同的条目共享同一路由计划）
+    plan_key = make_request_key("plan", normalized, subject, item.template_id, parameters, user_preferences)
+    plan = await runner.shared(plan_key, lambda: state.scheduler.offload(
+        state.router.prepare_route,
+        prompt,
+        user_preferences,
+        subject=subject,
+        template_id=item.template_id,
+        parameters=parameters,
+        deadline=deadline,
+        analysis=analysis
+    ))
+    if not plan["success"]:
+        raise ValueError(plan["error"])
+
+    # 3. 相同内容直接复用已有产物，否则渲染并保存（批次内同一内容只渲染一次）
+    key = content_key(plan["subject"], plan["template"].get("id"), plan["config"])
+    artifact = state.artifact_store.lookup(key)
+    reused = artifact is not None
+    degraded = bool(plan["config"].get("degraded"))
+    if artifact is None:
+        artifact, degraded = await runner.shared(("render", key), lambda: render_and_store(plan, key))
+
+    return {
+        "type": "result",
+        "index": index,
+        "success": True,
+        "prompt": item.prompt,
+        "subject": plan["subject"],
+        "template_id": plan["template"].get("id"),
+        "visualization_id": artifact.viz_id,
+        "html_url": f"/api/v2/visualizations/{artifact.viz_id}",
+        "reused": reused,
+        "degraded": degraded,
+        "elapsed": round(time.perf_counter() - started, 3)
+    }
+
+async def render_and_store(plan: Dict[str, Any], key: str):
+    """渲染路由计划并保存产物，返回 (产物信息, 是否降级渲染)"""
+    result = await state.scheduler.offload(state.router.render_route, plan)
+    if not result["success"]:
+        raise ValueError(result["error"])
+    template_id = plan["template"].get("id")
+    key = rendered_key(plan["subject"], template_id, key, result)
+    artifact, _ = await store_artifact(key, result["html_content"], plan["subject"], template_id)
+    return artifact, result["degraded"]
 
 async def process_subject_specific_generation(
     generation_id: str,
@@ -591,74 +1273,174 @@ async def process_subject_specific_generation(
     prompt: str,
     user_preferences: Dict[str, Any],
     template_id: Optional[str],
-    parameters: Dict[str, Any]
+    parameters: Dict[str, Any],
+    deadline_at: Optional[float] = None
 ):
     """处理学科特定生成"""
+    deadline = restore_deadline(deadline_at)
 
     try:
-        # 直接使用指定学科的Agent
-        agent = state.router.agents.get(subject)
-        if not agent:
+        # 直接使用指定学科的Agent（跳过学科识别）
+        if subject not in state.router.agents:
             raise ValueError(f"不支持的学科: {subject}")
 
-        # 更新状态
-        state.active_generations[generation_id]["status"] = "parsing"
-        state.active_generations[generation_id]["progress"] = 20
-
-        # 解析需求
-        requirement = await agent.parse_requirement(prompt)
-
-        # 匹配模板
-        state.active_generations[generation_id]["status"] = "matching"
-        state.active_generations[generation_id]["progress"] = 40
-
-        template = await agent.match_template(requirement)
-
-        # 生成配置和可视化
-        state.active_generations[generation_id]["status"] = "generating"
-        state.active_generations[generation_id]["progress"] = 70
-
-        config = await agent.generate_config(requirement, template, user_preferences)
-        html_content = await agent.generate_visualization(config)
-
-        # 保存结果
-        viz_id = f"viz_{generation_id[:8]}"
-        output_dir = Path("static/visualizations")
-        output_dir.mkdir(exist_ok=True)
-
-        with open(output_dir / f"{viz_id}.html", 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        plan = await state.scheduler.offload(
+            state.router.prepare_route,
+            prompt,
+            user_preferences,
+            on_stage=stage_reporter(generation_id),
+            subject=subject,
+            template_id=template_id,
+            parameters=parameters,
+            deadline=deadline
+        )
+        if not plan["success"]:
+            raise ValueError(plan["error"])
+
+        # 相同内容直接复用已有产物，否则渲染并保存
+        template_key = plan["template"].get("id")
+        key = content_key(subject, template_key, plan["config"])
+        degraded = bool(plan["config"].get("degraded"))
+        artifact = state.artifact_store.lookup(key)
+        if artifact is None:
+            ensure_not_cancelled(generation_id)
+            result = await state.scheduler.offload(state.router.render_route, plan)
+            if not result["success"]:
+                raise ValueError(result["error"])
+            ensure_not_cancelled(generation_id)
+            degraded = result["degraded"]
+            key = rendered_key(subject, template_key, key, result)
+            artifact = await save_artifact(generation_id, key, result["html_content"], subject, template_key)
 
         # 完成状态
-        state.active_generations[generation_id].update({
-            "status": "completed",
-            "progress": 100,
-            "html_url": f"/api/v2/visualizations/{viz_id}",
-            "completed_at": datetime.datetime.now()
-        })
+        state.generation_store.update(
+            generation_id,
+            status="completed",
+            progress=100,
+            html_url=f"/api/v2/visualizations/{artifact.viz_id}",
+            degraded=degraded,
+            completed_at=datetime.datetime.now()
+        )
 
+    except GenerationCancelled:
+        raise
     except Exception as e:
-        state.active_generations[generation_id].update({
-            "status": "failed",
-            "error": str(e),
-            "failed_at": datetime.datetime.now()
-        })
+        state.generation_store.update(
+            generation_id,
+            status="failed",
+            error=str(e),
+            failed_at=datetime.datetime.now()
+        )
+
+# 任务类型 -> 处理函数（任务记录中保存类型而非函数，便于重启后恢复）
+GENERATION_HANDLERS = {
+    "universal": process_visualization_generation,
+    "subject": process_subject_specific_generation
+}
+
+def resume_generation(record: GenerationRecord):
+    """重新提交上次运行中断的任务"""
+    request = record.request or {}
+    if request.get("kind") not in GENERATION_HANDLERS:
+        state.generation_store.update(
+            record.generation_id,
+            status="failed",
+            error="服务重启，任务已中断",
+            failed_at=datetime.datetime.now()
+        )
+        return
+
+    state.generation_store.update(record.generation_id, status="queued", progress=0, started_at=None)
+    try:
+        state.scheduler.submit(
+            record.generation_id,
+            GENERATION_HANDLERS[request["kind"]],
+            record.generation_id,
+            *request["args"]
+        )
+    except SchedulerFullError:
+        state.generation_store.update(
+            record.generation_id,
+            status="failed",
+            error="服务重启后队列已满，任务未能恢复",
+            failed_at=datetime.datetime.now()
+        )
 
 # ==============================
 # 健康检查和监控
 # ==============================
 
+def routing_degraded_stats() -> Dict[str, Any]:
+    """降级渲染统计（截止时间不足时走廉价路径的次数，按触发阶段细分）"""
+    return {
+        "total": state.router.routing_stats["degraded_count"],
+        "stages": dict(state.router.routing_stats["degraded_stages"])
+    }
+
 @app.get("/health")
 async def health_check():
     """健康检查"""
+    store_stats = state.generation_store.get_stats()
     return {
         "status": "healthy",
         "version": "2.0.0",
         "agents": len(state.router.agents),
-        "active_generations": len(state.active_generations),
+        "active_generations": store_stats["active"],
+        "generation_store": store_stats,
+        "progress_streams": state.progress_broadcaster.get_stats(),
+        "artifact_store": state.artifact_store.get_stats(),
+        "artifact_writer": state.artifact_writer.get_stats(),
+        "artifact_retention": state.artifact_retention.get_stats(),
+        "request_coalescer": state.request_coalescer.get_stats(),
+        "render_cache": state.router.render_cache.get_stats(),
+        "scheduler": state.scheduler.get_stats(),
+        "logging": get_logging_stats(),
+        "stage_latency": stage_metrics.summary(),
+        "degraded_renders": routing_degraded_stats(),
         "timestamp": datetime.datetime.now()
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 指标：流水线各阶段耗时直方图与 p50/p95/p99"""
+    scheduler_stats = state.scheduler.get_stats()
+    retention_stats = state.artifact_retention.get_stats()
+    degraded_stats = routing_degraded_stats()
+    cache_stats = state.router.render_cache.get_stats()
+    gauges = [
+        "# TYPE viz_generation_queue_depth gauge",
+        f"viz_generation_queue_depth {scheduler_stats['queue_depth']}",
+        "# TYPE viz_generation_running gauge",
+        f"viz_generation_running {scheduler_stats['running']}",
+        "# TYPE viz_artifact_disk_bytes gauge",
+        f"viz_artifact_disk_bytes {retention_stats['bytes']}",
+        "# TYPE viz_artifact_reclaimed_bytes_total counter",
+        f"viz_artifact_reclaimed_bytes_total {retention_stats['reclaimed_bytes']}",
+        "# TYPE viz_artifact_reclaimed_files_total counter",
+        f"viz_artifact_reclaimed_files_total {retention_stats['reclaimed_files']}",
+        "# TYPE viz_generation_degraded_total counter",
+        f"viz_generation_degraded_total {degraded_stats['total']}",
+        "# TYPE viz_generation_shed_total counter",
+        f"viz_generation_shed_total {scheduler_stats['shed']}",
+        "# TYPE viz_render_cache_hits_total counter",
+        f"viz_render_cache_hits_total {cache_stats['hits']}",
+        "# TYPE viz_render_cache_misses_total counter",
+        f"viz_render_cache_misses_total {cache_stats['misses']}",
+        "# TYPE viz_render_cache_bytes gauge",
+        f"viz_render_cache_bytes {cache_stats['bytes']}",
+    ]
+    for name, kind in (("queued", "gauge"), ("running", "gauge"), ("oldest_queue_wait", "gauge"), ("rejected", "counter")):
+        metric = f"viz_generation_class_{name}" + ("_total" if kind == "counter" else "")
+        gauges.append(f"# TYPE {metric} {kind}")
+        gauges.extend(
+            f'{metric}{{priority="{priority}"}} {load[name]}'
+            for priority, load in scheduler_stats["classes"].items()
+        )
+    return PlainTextResponse(
+        stage_metrics.render_prometheus() + "\n".join(gauges) + "\n",
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.get("/api/v2/health")
 async def api_v2_health_check():
     """API v2 健康检查 - 匹配前端调用"""
@@ -667,15 +1449,20 @@ async def api_v2_health_check():
         "version": "2.0.0",
         "api_version": "v2",
         "agents": len(state.router.agents),
-        "active_generations": len(state.active_generations),
+        "active_generations": state.generation_store.get_stats()["active"],
         "timestamp": datetime.datetime.now(),
         "endpoints": {
             "health": "/api/v2/health",
             "generate": "/api/v2/generate",
+            "generate_batch": "/api/v2/generate/batch",
             "classify": "/api/v2/classify",
+            "classify_batch": "/api/v2/classify/batch",
             "templates": "/api/v2/templates",
             "status": "/api/v2/status/{generation_id}",
-            "visualizations": "/api/v2/visualizations/{viz_id}"
+            "cancel": "DELETE /api/v2/status/{generation_id}",
+            "status_stream": "/api/v2/status/{generation_id}/stream",
+            "visualizations": "/api/v2/visualizations/{viz_id}",
+            "visualization_html": "/api/v2/visualizations/{viz_id}.html"
         }
     }
 
@@ -698,30 +1485,53 @@ async def get_registry():
 @app.on_event("startup")
 async def startup_event():
     """应用启动事件"""
-    print("🚀 万物可视化 v2.0 启动中...")
-    print("📋 方案A: 集中式路由架构")
-    print("🤖 已加载Agent系统")
+    # 日志需在Agent初始化之前配置
+    configure_logging(
+        settings.LOG_LEVEL,
+        log_file=settings.LOG_FILE if settings.LOG_TO_FILE else None,
+        queue_size=settings.LOG_QUEUE_SIZE
+    )
+    state.initialize()
+    logger.info("万物可视化 v2.0 启动中", architecture="集中式路由", agents=len(state.router.agents))
+
+    # 确保输出、日志、数据目录存在
+    await asyncio.to_thread(ensure_directories)
 
     # 加载模板
     try:
-        loaded_count = await state.template_engine.load_templates_from_files()
-        print(f"📚 已加载 {loaded_count} 个模板")
+        await state.template_engine.load_templates_from_files()
     except Exception as e:
-        print(f"⚠️  模板加载警告: {str(e)}")
+        logger.warning("模板加载警告", error=str(e))
 
     # 将模板引擎注入到路由管理器
     state.router.set_template_engine(state.template_engine)
 
-    print("🔧 统一模板引擎已就绪")
-    print("✅ API网关已启动")
+    # 在线程中加载统计后备分类模型（文件缺失或过期时训练），请求处理时不再加载或训练
+    if settings.FALLBACK_CLASSIFIER_ENABLED:
+        await asyncio.to_thread(state.router.subject_classifier.fallback_model)
+
+    # 启动任务存储、产物写入器和生成调度器
+    await state.generation_store.start()
+    await state.artifact_writer.start()
+    await state.scheduler.start()
+
+    # 接管上次运行中断的任务
+    for record in await state.generation_store.recover():
+        resume_generation(record)
 
-    # 确保输出目录存在
-    Path("static/visualizations").mkdir(exist_ok=True)
+    # 启动产物清理（配额/最长保留时间）
+    await state.artifact_retention.start()
+    logger.info("API网关已启动", workers=state.scheduler.worker_count)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭事件"""
-    print("🛑 万物可视化 v2.0 正在关闭...")
+    logger.info("万物可视化 v2.0 正在关闭")
+    await state.scheduler.stop()
+    await state.artifact_retention.stop()
+    await state.artifact_writer.stop()
+    await state.generation_store.stop()
+    shutdown_logging()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+万物可视化 v2.0 - 学科路由基准测试
+以 VisualizationRouter.test_routing 回放带标注的提示词语料（覆盖五个学科），
+输出分类准确率、混淆矩阵、吞吐量和单条延迟分位数的JSON报告
+
+语料由三部分组成：
+1. test_cases.md 中各学科小节下的示例输入（按小节标题标注学科）
+2. requests.jsonl 中引用的中文示例提示词（只包含某一个学科的主题词时才标注，其余跳过）
+3. 下方各学科的主题词与常见句式、参数后缀组合生成的提示词（固定随机种子，可复现）
+
+可用 --min-accuracy / --min-throughput / --max-p99-ms 设定阈值，未达到时以非零状态退出，
+用于在修改分类器时同时防止准确率和速度回退。
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).parent
+
+# test_cases.md 中的小节标题 -> 学科
+SECTION_SUBJECTS = {
+    "基础输入测试": "mathematics",
+    "数学学科": "mathematics",
+    "天文学科": "astronomy",
+    "物理学科": "physics",
+    "化学学科": "chemistry",
+    "生物学科": "biology"
+}
+
+# 各学科的高中主题词（标注来源：主题所属学科）
+SUBJECT_TOPICS: Dict[str, List[str]] = {
+    "mathematics": [
+        "正态分布", "二项分布", "泊松分布", "指数分布", "均匀分布", "t分布", "卡方分布",
+        "二次函数", "一次函数", "三角函数", "指数函数", "对数函数", "幂函数", "反比例函数",
+        "函数图像", "导数", "定积分", "极限", "等差数列", "等比数列", "数列求和",
+        "矩阵乘法", "向量加法", "线性方程组", "特征值", "行列式", "概率", "统计直方图",
+        "椭圆方程", "双曲线", "抛物线的焦点", "排列组合", "条件概率", "置信区间"
+    ],
+    "astronomy": [
+        "太阳系", "行星轨道", "月相变化", "日食", "月食", "星座", "大熊座", "北斗七星",
+        "银河系", "黑洞", "恒星演化", "超新星", "红巨星", "白矮星", "彗星", "小行星带",
+        "开普勒定律", "地球公转", "地球自转", "四季成因", "潮汐", "星云", "星系碰撞",
+        "宇宙大爆炸", "哈勃定律", "光年", "木星的卫星", "土星环", "火星探测", "流星雨"
+    ],
+    "physics": [
+        "抛体运动", "平抛运动", "自由落体", "匀加速直线运动", "牛顿第二定律", "动量守恒",
+        "机械能守恒", "简谐振动", "单摆", "弹簧振子", "圆周运动", "万有引力", "摩擦力",
+        "电场线", "磁场", "电磁感应", "欧姆定律", "串联电路", "并联电路", "电磁波传播",
+        "光的折射", "光的反射", "凸透镜成像", "干涉条纹", "衍射", "多普勒效应",
+        "波的传播", "热力学第一定律", "理想气体状态方程", "浮力", "压强"
+    ],
+    "chemistry": [
+        "水分子结构", "甲烷分子", "二氧化碳分子", "氯化钠晶体", "化学键", "共价键", "离子键",
+        "氢键", "元素周期表", "电子排布", "原子结构", "化学反应速率", "化学平衡",
+        "酸碱中和", "pH值", "氧化还原反应", "电解水", "原电池", "有机化合物", "苯环结构",
+        "乙醇", "酯化反应", "燃烧反应", "催化剂", "摩尔质量", "溶解度曲线", "沉淀反应",
+        "金属活动性顺序", "同分异构体", "化学方程式配平"
+    ],
+    "biology": [
+        "细胞结构", "动物细胞", "植物细胞", "细胞膜", "线粒体", "叶绿体", "细胞核",
+        "有丝分裂", "减数分裂", "DNA双螺旋", "DNA复制", "转录", "翻译", "蛋白质合成",
+        "光合作用", "细胞呼吸", "有氧呼吸", "酶的作用", "孟德尔遗传", "基因突变",
+        "伴性遗传", "生态系统", "食物链", "食物网", "碳循环", "自然选择", "物种进化",
+        "神经系统", "血液循环", "免疫系统", "消化系统", "植物激素"
+    ]
+}
+
+# 常见句式（{topic} 为主题词）
+PHRASINGS = [
+    "{topic}",
+    "{topic}的可视化",
+    "画一个{topic}",
+    "画出{topic}的示意图",
+    "演示{topic}",
+    "请展示{topic}的过程",
+    "帮我生成{topic}的交互动画",
+    "我想理解{topic}",
+    "{topic}是什么",
+    "用图解释{topic}",
+    "高中{topic}讲解",
+    "{topic}的原理",
+    "给学生讲{topic}",
+    "可以调参数的{topic}演示",
+    "{topic} 3D模型",
+    "{topic}动态演示，需要能暂停"
+]
+
+# 参数后缀（只附加在部分提示词后，模拟用户给出的具体数值）
+SUFFIXES = ["", "", "", " 参数可调", " 初始值10", " 时间0到5秒", " 比例1:2", " n=20"]
+
+
+def test_cases_md_cases(path: Path) -> List[Dict[str, str]]:
+    """
+    test_cases.md 中各学科小节下反引号内的示例输入
+
+    Args:
+        path: test_cases.md 路径
+
+    Returns:
+        List[Dict[str, str]]: 带标注的用例
+    """
+    if not path.exists():
+        return []
+
+    cases = []
+    subject = None
+    for line in path.read_text(encoding="utf-8").splitlines():
+        heading = re.match(r"^\s*(?:#+\s*(?:\d+\.\s*)?|\*\*)([^*#:：]+?)(?:\*\*)?[:：]?\s*$", line)
+        if heading:
+            subject = SECTION_SUBJECTS.get(heading.group(1).strip())
+            continue
+        if subject:
+            cases.extend(
+                {"prompt": prompt, "expected_subject": subject, "source": "test_cases.md"}
+                for prompt in re.findall(r"`([^`\n]+)`", line)
+            )
+    return cases
+
+
+def requests_jsonl_cases(path: Path) -> Dict[str, Any]:
+    """
+    requests.jsonl 中引号内的中文示例提示词
+
+    只包含某一个学科的主题词时按该学科标注，不含或横跨多个学科的提示词不参与评测
+
+    Args:
+        path: requests.jsonl 路径
+
+    Returns:
+        Dict: cases（带标注的用例）和 skipped（无法标注的提示词）
+    """
+    cases: List[Dict[str, str]] = []
+    skipped: List[str] = []
+    if not path.exists():
+        return {"cases": cases, "skipped": skipped}
+
+    seen = set()
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        body = json.loads(line).get("body", "")
+        for prompt in re.findall(r'"([^"\n]*[一-鿿][^"\n]*)"', body):
+            if prompt in seen:
+                continue
+            seen.add(prompt)
+            subjects = [
+                subject for subject, topics in SUBJECT_TOPICS.items()
+                if any(topic in prompt for topic in topics)
+            ]
+            if len(subjects) == 1:
+                cases.append({"prompt": prompt, "expected_subject": subjects[0], "source": "requests.jsonl"})
+            else:
+                skipped.append(prompt)
+    return {"cases": cases, "skipped": skipped}
+
+
+def generated_cases(size: int, seed: int) -> List[Dict[str, str]]:
+    """
+    由主题词、句式和参数后缀组合生成的用例（各学科数量均衡，不重复）
+
+    Args:
+        size: 用例数量上限（受组合总数限制）
+        seed: 随机种子
+
+    Returns:
+        List[Dict[str, str]]: 带标注的用例
+    """
+    rng = random.Random(seed)
+    per_subject = max(1, size // len(SUBJECT_TOPICS))
+    cases = []
+    for subject, topics in SUBJECT_TOPICS.items():
+        combinations = [
+            phrasing.format(topic=topic) + suffix
+            for topic in topics for phrasing in PHRASINGS for suffix in dict.fromkeys(SUFFIXES)
+        ]
+        rng.shuffle(combinations)
+        cases.extend(
+            {"prompt": prompt, "expected_subject": subject, "source": "generated"}
+            for prompt in combinations[:per_subject]
+        )
+    rng.shuffle(cases)
+    return cases
+
+
+def build_corpus(size: int, seed: int, requests_path: Path) -> Dict[str, Any]:
+    """
+    构建评测语料
+
+    Args:
+        size: 生成用例的数量
+        seed: 随机种子
+        requests_path: requests.jsonl 路径
+
+    Returns:
+        Dict: cases（全部用例）、sources（各来源数量）、skipped（未标注的提示词）
+    """
+    md_cases = test_cases_md_cases(BACKEND_DIR / "test_cases.md")
+    request_seeds = requests_jsonl_cases(requests_path)
+    cases = md_cases + request_seeds["cases"] + generated_cases(size, seed)
+
+    sources: Dict[str, int] = {}
+    for case in cases:
+        sources[case["source"]] = sources.get(case["source"], 0) + 1
+    return {"cases": cases, "sources": sources, "skipped": request_seeds["skipped"]}
+
+
+def build_report(outcome: Dict[str, Any], corpus: Dict[str, Any], max_errors: int) -> Dict[str, Any]:
+    """
+    整理 test_routing 的结果（延迟换算为毫秒，附各学科准确率和部分误判样例）
+
+    Args:
+        outcome: test_routing 的返回值
+        corpus: build_corpus 的返回值
+        max_errors: 输出的误判样例数量上限
+
+    Returns:
+        Dict: 报告
+    """
+    per_subject = {}
+    for expected, row in sorted(outcome["confusion_matrix"].items()):
+        total = sum(row.values())
+        per_subject[expected] = {
+            "cases": total,
+            "accuracy": round(row.get(expected, 0) / total * 100, 2)
+        }
+
+    errors = [
+        {
+            "prompt": result["prompt"],
+            "expected": result["expected"],
+            "predicted": result["predicted"]
+        }
+        for result in outcome["results"] if result["correct"] is False
+    ]
+
+    return {
+        "cases": outcome["test_cases"],
+        "sources": corpus["sources"],
+        "skipped_prompts": corpus["skipped"],
+        "accuracy": round(outcome["accuracy"], 2),
+        "correct_predictions": outcome["correct_predictions"],
+        "per_subject": per_subject,
+        "confusion_matrix": outcome["confusion_matrix"],
+        "throughput": round(outcome["throughput"], 1),
+        "elapsed_s": round(outcome["elapsed"], 4),
+        "latency_ms": {name: round(seconds * 1000, 4) for name, seconds in outcome["latency"].items()},
+        "misclassified": len(errors),
+        "misclassified_examples": errors[:max_errors]
+    }
+
+
+async def run_benchmark(cases: List[Dict[str, str]], warmup: int, fallback: bool) -> Dict[str, Any]:
+    """
+    预热后回放语料
+
+    Args:
+        cases: 用例列表
+        warmup: 预热时先运行（不计入结果）的用例数
+        fallback: 是否与服务相同启用统计后备分类器
+
+    Returns:
+        Dict: test_routing 的结果
+    """
+    from agents.router_manager import VisualizationRouter
+    from config import settings
+
+    router = VisualizationRouter()
+    router.subject_classifier.set_fallback(
+        settings.FALLBACK_CLASSIFIER_PATH,
+        min_probability=settings.FALLBACK_MIN_PROBABILITY,
+        templates_dir=settings.TEMPLATES_DIR,
+        enabled=fallback and settings.FALLBACK_CLASSIFIER_ENABLED
+    )
+    # 预热：编译关键词自动机、加载（或训练）统计后备分类器
+    await router.test_routing(cases[:warmup] + [{"prompt": "随机无意义的文字"}])
+    return await router.test_routing(cases)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="学科路由基准测试")
+    parser.add_argument("--size", type=int, default=5000, help="生成用例的数量（另加 test_cases.md 与 requests.jsonl 中的用例）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--warmup", type=int, default=200, help="预热用例数")
+    parser.add_argument("--requests", type=Path, default=BACKEND_DIR.parent / "requests.jsonl", help="requests.jsonl 路径")
+    parser.add_argument("--no-fallback", action="store_true", help="只评测关键词分类（不启用统计后备分类器）")
+    parser.add_argument("--max-errors", type=int, default=20, help="报告中误判样例的数量上限")
+    parser.add_argument("--output", type=Path, help="把JSON报告写入文件（默认输出到标准输出）")
+    parser.add_argument("--min-accuracy", type=float, help="准确率阈值（%%）")
+    parser.add_argument("--min-throughput", type=float, help="吞吐量阈值（提示词/秒）")
+    parser.add_argument("--max-p99-ms", type=float, help="单条延迟 p99 阈值（毫秒）")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.size, args.seed, args.requests)
+    outcome = asyncio.run(run_benchmark(corpus["cases"], args.warmup, not args.no_fallback))
+    report = build_report(outcome, corpus, args.max_errors)
+    report["fallback_classifier"] = not args.no_fallback
+
+    failures = []
+    if args.min_accuracy is not None and report["accuracy"] < args.min_accuracy:
+        failures.append(f"准确率 {report['accuracy']}% 低于阈值 {args.min_accuracy}%")
+    if args.min_throughput is not None and report["throughput"] < args.min_throughput:
+        failures.append(f"吞吐量 {report['throughput']}/s 低于阈值 {args.min_throughput}/s")
+    if args.max_p99_ms is not None and report["latency_ms"]["p99"] > args.max_p99_ms:
+        failures.append(f"p99延迟 {report['latency_ms']['p99']}ms 超过阈值 {args.max_p99_ms}ms")
+    report["failures"] = failures
+
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(payload + "\n", encoding="utf-8")
+    else:
+        print(payload)
+
+    print(
+        f"🚀 {report['cases']} 个提示词 | 准确率 {report['accuracy']}% | "
+        f"{report['throughput']:.0f} 个/秒 | p50 {report['latency_ms']['p50']}ms p99 {report['latency_ms']['p99']}ms",
+        file=sys.stderr
+    )
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
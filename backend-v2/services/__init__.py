@@ -0,0 +1,48 @@
+"""
+万物可视化 v2.0 - 服务层模块
+为API网关提供调度、存储等运行时基础设施
+"""
+
+from .generation_scheduler import GenerationScheduler, SchedulerFullError, GenerationCancelled
+from .status_store import JobStore, GenerationStatusStore, GenerationRecord
+from .job_store import SQLiteJobStore, create_job_store
+from .progress_events import ProgressBroadcaster
+from .artifact_writer import ArtifactWriter
+from .artifact_store import ArtifactStore, ArtifactInfo, content_key
+from .artifact_retention import ArtifactRetentionManager
+from .request_coalescer import RequestCoalescer, make_request_key
+from .render_cache import RenderCache
+from .batch_runner import BatchRunner
+from .structured_logging import configure_logging, get_logger
+from .metrics import StageMetrics, stage_metrics
+from .fast_json import FastJSONResponse, dumps as fast_dumps
+from .deadline import Deadline
+
+# 导出主要类
+__all__ = [
+    "GenerationScheduler",
+    "SchedulerFullError",
+    "GenerationCancelled",
+    "JobStore",
+    "GenerationStatusStore",
+    "SQLiteJobStore",
+    "create_job_store",
+    "GenerationRecord",
+    "ProgressBroadcaster",
+    "ArtifactWriter",
+    "ArtifactStore",
+    "ArtifactInfo",
+    "content_key",
+    "ArtifactRetentionManager",
+    "RequestCoalescer",
+    "make_request_key",
+    "RenderCache",
+    "BatchRunner",
+    "configure_logging",
+    "get_logger",
+    "StageMetrics",
+    "stage_metrics",
+    "FastJSONResponse",
+    "fast_dumps",
+    "Deadline"
+]
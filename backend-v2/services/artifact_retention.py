@@ -0,0 +1,325 @@
+"""
+万物可视化 v2.0 - 产物保留策略
+后台按总字节配额和最长保留时间清理 static/visualizations，优先淘汰最久未被访问的产物；
+访问时间记录在索引文件中（不依赖文件系统 atime），仍被未过期任务引用的产物永不删除
+"""
+
+from typing import Dict, List, Optional, Any, Set, Tuple, Callable, Awaitable
+from pathlib import Path
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from .structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# 同一产物的所有文件（HTML及预压缩副本）共用 viz_id 前缀
+ARTIFACT_SUFFIX = ".html"
+
+# 一个产物的扫描结果: (总字节数, 最近修改时间, 文件路径列表)
+ArtifactEntry = Tuple[int, float, List[str]]
+
+
+def artifact_id_from_name(name: str) -> Optional[str]:
+    """
+    从文件名解析可视化ID（viz_x.html / viz_x.html.gz / viz_x.html.br）
+
+    Args:
+        name: 文件名
+
+    Returns:
+        str: 可视化ID，不是产物文件（含写入中的临时文件）时返回None
+    """
+    if name.startswith(".") or ARTIFACT_SUFFIX not in name:
+        return None
+    viz_id, _, rest = name.partition(ARTIFACT_SUFFIX)
+    if rest and not rest.startswith("."):
+        return None
+    return viz_id or None
+
+
+class ArtifactRetentionManager:
+    """产物保留管理器 - 字节配额 + 最长保留时间 + 按最近访问时间的LRU淘汰"""
+
+    def __init__(
+        self,
+        output_dir: Path,
+        max_bytes: int,
+        max_age: float,
+        sweep_interval: float = 300.0,
+        grace_period: float = 300.0,
+        index_path: Optional[Path] = None,
+        referenced_ids: Optional[Callable[[], Awaitable[Set[str]]]] = None,
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        """
+        初始化保留管理器
+
+        Args:
+            output_dir: 产物目录
+            max_bytes: 产物总字节数上限（0 表示不限制）
+            max_age: 超过该时间未被访问的产物将被删除（秒，0 表示不限制）
+            sweep_interval: 后台清理间隔（秒）
+            grace_period: 刚写入或刚访问的产物在该时间内不会被删除（秒）
+            index_path: 访问时间索引文件（None 表示只保存在内存中）
+            referenced_ids: 返回仍被未过期任务引用的可视化ID集合
+            on_evict: 产物被删除后的回调（用于清除存储层缓存）
+        """
+        self.output_dir = Path(output_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self.grace_period = grace_period
+        self.index_path = Path(index_path) if index_path else None
+        self.referenced_ids = referenced_ids
+        self.on_evict = on_evict
+
+        # viz_id -> 最近一次访问的时间戳
+        self._access: Dict[str, float] = {}
+        # 已删除、需要从索引文件中移除的ID
+        self._removed: Set[str] = set()
+        self._index_dirty = False
+        self._sweeper: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        self.disk = {
+            "artifacts": 0,
+            "bytes": 0
+        }
+        self.stats = {
+            "sweeps": 0,
+            "sweep_errors": 0,
+            "reclaimed_bytes": 0,
+            "reclaimed_files": 0,
+            "evicted_age": 0,
+            "evicted_quota": 0,
+            "protected": 0,
+            "last_sweep_duration": 0.0
+        }
+
+    async def start(self) -> None:
+        """加载访问索引并启动后台清理任务"""
+        if self._sweeper is not None:
+            return
+
+        if self.index_path is not None:
+            self._access = await asyncio.to_thread(self._load_index)
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self) -> None:
+        """停止后台清理任务并保存访问索引"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+        await self.save_index()
+
+    def touch(self, viz_id: str) -> None:
+        """记录产物被访问（写入、复用或下发时调用）"""
+        self._access[viz_id] = time.time()
+        self._index_dirty = True
+
+    async def sweep(self) -> Dict[str, int]:
+        """
+        执行一次清理
+
+        Returns:
+            Dict[str, int]: 本次删除的产物数和回收的字节数
+        """
+        async with self._lock:
+            started = time.perf_counter()
+            referenced = await self.referenced_ids() if self.referenced_ids else set()
+            entries = await asyncio.to_thread(self._scan)
+            if self.index_path is not None:
+                # 合并其他worker记录的访问时间
+                for viz_id, accessed in (await asyncio.to_thread(self._load_index)).items():
+                    if accessed > self._access.get(viz_id, 0.0):
+                        self._access[viz_id] = accessed
+            now = time.time()
+
+            by_age, by_quota, protected, remaining_bytes = self._plan(entries, referenced, now)
+            evicted = by_age + by_quota
+            reclaimed_bytes, reclaimed_files = await asyncio.to_thread(
+                self._delete, [entries[viz_id][2] for viz_id in evicted]
+            )
+
+            for viz_id in evicted:
+                if self.on_evict:
+                    self.on_evict(viz_id)
+            # 索引只保留磁盘上仍存在的产物
+            removed = set(evicted)
+            removed.update(viz_id for viz_id in self._access if viz_id not in entries)
+            for viz_id in removed:
+                self._access.pop(viz_id, None)
+            self._removed |= removed
+            self._index_dirty = True
+
+            self.disk["artifacts"] = len(entries) - len(evicted)
+            self.disk["bytes"] = remaining_bytes
+            self.stats["sweeps"] += 1
+            self.stats["reclaimed_bytes"] += reclaimed_bytes
+            self.stats["reclaimed_files"] += reclaimed_files
+            self.stats["evicted_age"] += len(by_age)
+            self.stats["evicted_quota"] += len(by_quota)
+            self.stats["protected"] = protected
+            self.stats["last_sweep_duration"] = round(time.perf_counter() - started, 4)
+
+        await self.save_index()
+        if evicted:
+            logger.info(
+                "产物清理完成",
+                evicted=len(evicted),
+                reclaimed_bytes=reclaimed_bytes,
+                remaining_bytes=remaining_bytes
+            )
+        return {"evicted": len(evicted), "reclaimed_bytes": reclaimed_bytes}
+
+    async def save_index(self) -> None:
+        """保存访问索引（与其他worker写入的索引合并，取较新的访问时间）"""
+        if self.index_path is None or not self._index_dirty:
+            return
+
+        self._index_dirty = False
+        snapshot, removed = dict(self._access), self._removed
+        self._removed = set()
+        try:
+            await asyncio.to_thread(self._write_index, snapshot, removed)
+        except OSError as e:
+            self._index_dirty = True
+            self._removed |= removed
+            logger.warning("访问索引保存失败", error=str(e))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取保留策略统计信息"""
+        return {
+            "max_bytes": self.max_bytes,
+            "max_age": self.max_age,
+            "tracked": len(self._access),
+            **self.disk,
+            **self.stats
+        }
+
+    # ---------- 内部实现 ----------
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.stats["sweep_errors"] += 1
+                logger.warning("产物清理失败", error=str(e))
+            await asyncio.sleep(self.sweep_interval)
+
+    def _plan(
+        self,
+        entries: Dict[str, ArtifactEntry],
+        referenced: Set[str],
+        now: float
+    ) -> Tuple[List[str], List[str], int, int]:
+        """
+        确定要删除的产物
+
+        Returns:
+            Tuple: (超龄删除列表, 超配额删除列表, 受保护产物数, 删除后的总字节数)
+        """
+        total_bytes = sum(size for size, _, _ in entries.values())
+        candidates = []
+        protected = 0
+        for viz_id, (size, modified, _) in entries.items():
+            last_used = max(self._access.get(viz_id, 0.0), modified)
+            if viz_id in referenced or now - last_used < self.grace_period:
+                protected += 1
+                continue
+            candidates.append((last_used, viz_id, size))
+
+        # 最久未访问的在前
+        candidates.sort()
+
+        by_age = []
+        index = 0
+        if self.max_age > 0:
+            while index < len(candidates) and now - candidates[index][0] > self.max_age:
+                by_age.append(candidates[index][1])
+                total_bytes -= candidates[index][2]
+                index += 1
+
+        by_quota = []
+        if self.max_bytes > 0:
+            while index < len(candidates) and total_bytes > self.max_bytes:
+                by_quota.append(candidates[index][1])
+                total_bytes -= candidates[index][2]
+                index += 1
+
+        return by_age, by_quota, protected, total_bytes
+
+    def _scan(self) -> Dict[str, ArtifactEntry]:
+        """扫描产物目录，按 viz_id 汇总各文件的大小与修改时间（在线程池中执行）"""
+        entries: Dict[str, ArtifactEntry] = {}
+        try:
+            iterator = os.scandir(self.output_dir)
+        except FileNotFoundError:
+            return entries
+
+        with iterator:
+            for item in iterator:
+                viz_id = artifact_id_from_name(item.name)
+                if viz_id is None:
+                    continue
+                try:
+                    stat = item.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                size, modified, paths = entries.get(viz_id, (0, 0.0, []))
+                paths.append(item.path)
+                entries[viz_id] = (size + stat.st_size, max(modified, stat.st_mtime), paths)
+        return entries
+
+    @staticmethod
+    def _delete(groups: List[List[str]]) -> Tuple[int, int]:
+        """删除文件，返回 (回收字节数, 删除文件数)"""
+        reclaimed_bytes = 0
+        reclaimed_files = 0
+        for paths in groups:
+            for path in paths:
+                try:
+                    size = os.stat(path).st_size
+                    os.unlink(path)
+                except FileNotFoundError:
+                    # 其他worker已删除
+                    continue
+                reclaimed_bytes += size
+                reclaimed_files += 1
+        return reclaimed_bytes, reclaimed_files
+
+    def _load_index(self) -> Dict[str, float]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return {str(viz_id): float(accessed) for viz_id, accessed in data.items()}
+
+    def _write_index(self, snapshot: Dict[str, float], removed: Set[str]) -> None:
+        merged = self._load_index()
+        for viz_id, accessed in snapshot.items():
+            if accessed > merged.get(viz_id, 0.0):
+                merged[viz_id] = accessed
+        for viz_id in removed:
+            merged.pop(viz_id, None)
+
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.index_path.parent, prefix=f".{self.index_path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(merged, f, separators=(",", ":"))
+            os.replace(tmp_name, self.index_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
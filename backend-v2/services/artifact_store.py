@@ -0,0 +1,337 @@
+"""
+万物可视化 v2.0 - 内容寻址可视化存储
+按 (学科, 模板ID, 规范化配置) 的哈希存放生成的HTML，相同请求直接复用已有结果
+"""
+
+from typing import Dict, Optional, Any, List, Tuple, Callable
+from pathlib import Path
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import re
+import stat
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，缺失时只生成gzip
+    brotli = None
+
+from .artifact_writer import ArtifactWriter
+
+# 不影响渲染结果、但每次都会变化的配置字段
+VOLATILE_CONFIG_KEYS = frozenset({
+    "timestamp", "created_at", "registered_at", "render_count", "agent_id"
+})
+
+# 默认标题等字段中嵌入的时间戳
+TIMESTAMP_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?")
+
+# 内容寻址的可视化ID（内容不会变化，可长期缓存）
+CONTENT_ADDRESSED_ID = re.compile(r"^viz_[0-9a-f]{32,64}$")
+
+# 预压缩编码及文件后缀，按优先级排列
+PRECOMPRESSED_ENCODINGS: List[Tuple[str, str]] = [("br", ".br"), ("gzip", ".gz")]
+
+
+def normalize_config(value: Any) -> Any:
+    """
+    规范化配置：去掉易变字段和时间戳，字典按键排序
+
+    Args:
+        value: 原始配置（任意可JSON化结构）
+
+    Returns:
+        Any: 规范化后的结构
+    """
+    if isinstance(value, dict):
+        return {
+            str(key): normalize_config(item)
+            for key, item in sorted(value.items(), key=lambda pair: str(pair[0]))
+            if key not in VOLATILE_CONFIG_KEYS
+        }
+    if isinstance(value, (list, tuple)):
+        return [normalize_config(item) for item in value]
+    if isinstance(value, str):
+        return TIMESTAMP_PATTERN.sub("", value)
+    return value
+
+
+def content_key(subject: str, template_id: Optional[str], config: Dict[str, Any]) -> str:
+    """
+    计算可视化内容键
+
+    Args:
+        subject: 学科
+        template_id: 模板ID
+        config: 可视化配置
+
+    Returns:
+        str: SHA-256 十六进制摘要
+    """
+    payload = json.dumps(
+        [subject, template_id, normalize_config(config)],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ArtifactInfo:
+    """已存储的可视化产物"""
+
+    __slots__ = ("viz_id", "path", "etag", "size", "created_at")
+
+    def __init__(self, viz_id: str, path: Path, etag: str, size: int, created_at: datetime.datetime):
+        self.viz_id = viz_id
+        self.path = path
+        self.etag = etag
+        self.size = size
+        self.created_at = created_at
+
+
+class ArtifactStore:
+    """内容寻址可视化存储"""
+
+    def __init__(
+        self,
+        output_dir: Path,
+        writer: ArtifactWriter,
+        key_length: int = 32,
+        precompress: bool = True,
+        on_access: Optional[Callable[[str], None]] = None
+    ):
+        """
+        初始化存储
+
+        Args:
+            output_dir: HTML文件输出目录
+            writer: 产物写入器（线程池原子写入）
+            key_length: viz_id 中保留的哈希位数
+            precompress: 是否同时写入 .gz/.br 预压缩文件
+            on_access: 产物被写入、复用或读取时的回调（用于保留策略记录访问时间）
+        """
+        self.output_dir = Path(output_dir)
+        self.writer = writer
+        self.key_length = key_length
+        self.precompress = precompress
+        self.on_access = on_access
+        self._artifacts: Dict[str, ArtifactInfo] = {}
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "bytes_written": 0
+        }
+
+    def viz_id_for(self, key: str) -> str:
+        """根据内容键得到可视化ID"""
+        return f"viz_{key[:self.key_length]}"
+
+    def lookup(self, key: str) -> Optional[ArtifactInfo]:
+        """
+        查找已存在的产物
+
+        Args:
+            key: content_key() 计算出的内容键
+
+        Returns:
+            ArtifactInfo: 命中时返回产物信息，否则返回None
+        """
+        info = self.get(self.viz_id_for(key))
+        if info is None:
+            self.stats["misses"] += 1
+        else:
+            self.stats["hits"] += 1
+        return info
+
+    async def put(self, key: str, html_content: str) -> ArtifactInfo:
+        """
+        保存产物（同一内容键只写一次），编码、压缩与写入均在线程池中完成
+
+        Args:
+            key: 内容键
+            html_content: HTML内容
+
+        Returns:
+            ArtifactInfo: 产物信息
+        """
+        viz_id = self.viz_id_for(key)
+        info = self._artifacts.get(viz_id)
+        if info is not None:
+            self._touch(viz_id)
+            return info
+
+        path = self._path_for(viz_id)
+        files = await self.writer.run(self._prepare_files, path, html_content)
+        await self.writer.write_files(files)
+        file_stat = await self.writer.run(path.stat)
+
+        self.stats["writes"] += 1
+        self.stats["bytes_written"] += file_stat.st_size
+
+        info = self._register(viz_id, path, file_stat)
+        self._touch(viz_id)
+        return info
+
+    def select_variant(self, info: ArtifactInfo, accept_encoding: Optional[str]) -> Tuple[Path, Optional[str], str]:
+        """
+        根据 Accept-Encoding 选择要发送的文件
+
+        Args:
+            info: 产物信息
+            accept_encoding: 请求头原始值
+
+        Returns:
+            Tuple: (文件路径, Content-Encoding 或 None, 对应表示的ETag)
+        """
+        accepted = parse_accept_encoding(accept_encoding)
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding not in accepted:
+                continue
+            variant = info.path.with_name(info.path.name + suffix)
+            if variant.is_file():
+                return variant, encoding, f'{info.etag[:-1]}-{encoding}"'
+
+        return info.path, None, info.etag
+
+    def is_immutable(self, viz_id: str) -> bool:
+        """内容寻址的产物内容永不改变"""
+        return bool(CONTENT_ADDRESSED_ID.match(viz_id))
+
+    def get(self, viz_id: str) -> Optional[ArtifactInfo]:
+        """
+        按可视化ID获取产物（包括重启前或旧版本写入的文件）；
+        冷查找只 stat 一次文件，ETag由大小和修改时间得出，不读取文件内容
+
+        Args:
+            viz_id: 可视化ID
+
+        Returns:
+            ArtifactInfo: 产物信息，文件不存在时返回None
+        """
+        info = self._artifacts.get(viz_id)
+        if info is not None:
+            if info.path.exists():
+                self._touch(viz_id)
+                return info
+            del self._artifacts[viz_id]
+
+        path = self._path_for(viz_id)
+        try:
+            file_stat = path.stat()
+        except OSError:
+            return None
+        if not stat.S_ISREG(file_stat.st_mode):
+            return None
+
+        self._touch(viz_id)
+        return self._register(viz_id, path, file_stat)
+
+    def forget(self, viz_id: str) -> None:
+        """移除已被删除产物的缓存信息"""
+        self._artifacts.pop(viz_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计信息"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "artifacts": len(self._artifacts),
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            **self.stats
+        }
+
+    def _prepare_files(self, path: Path, html_content: str) -> List[Tuple[Path, bytes]]:
+        """编码HTML并生成预压缩副本（在线程池中执行）"""
+        data = html_content.encode("utf-8")
+        files = [(path, data)]
+
+        if self.precompress:
+            files.append((path.with_name(path.name + ".gz"), gzip.compress(data, compresslevel=9, mtime=0)))
+            if brotli is not None:
+                files.append((path.with_name(path.name + ".br"), brotli.compress(data, mode=brotli.MODE_TEXT)))
+
+        return files
+
+    def _touch(self, viz_id: str) -> None:
+        if self.on_access:
+            self.on_access(viz_id)
+
+    def _path_for(self, viz_id: str) -> Path:
+        # viz_id 来自URL，只取文件名部分，防止路径穿越
+        return self.output_dir / f"{Path(viz_id).name}.html"
+
+    @staticmethod
+    def _etag_for(file_stat: os.stat_result) -> str:
+        # 产物通过临时文件 + os.replace 整体替换，内容变化必然伴随大小或修改时间变化
+        return f'"{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"'
+
+    def _register(self, viz_id: str, path: Path, file_stat: os.stat_result) -> ArtifactInfo:
+        etag = self._etag_for(file_stat)
+        created_at = datetime.datetime.fromtimestamp(file_stat.st_mtime)
+        info = ArtifactInfo(viz_id, path, etag, file_stat.st_size, created_at)
+        self._artifacts[viz_id] = info
+        return info
+
+
+def parse_accept_encoding(accept_encoding: Optional[str]) -> frozenset:
+    """
+    解析 Accept-Encoding，返回客户端接受的编码（忽略 q=0）
+
+    Args:
+        accept_encoding: 请求头原始值
+
+    Returns:
+        frozenset: 接受的编码名称（小写）
+    """
+    if not accept_encoding:
+        return frozenset()
+
+    accepted = set()
+    for item in accept_encoding.split(","):
+        parts = [part.strip() for part in item.split(";")]
+        coding = parts[0].lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding)
+
+    if "*" in accepted:
+        accepted.update(encoding for encoding, _ in PRECOMPRESSED_ENCODINGS)
+    return frozenset(accepted)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断 If-None-Match 请求头是否与ETag匹配（弱比较）
+
+    Args:
+        if_none_match: 请求头原始值
+        etag: 当前资源的ETag
+
+    Returns:
+        bool: 匹配时返回True，应响应304
+    """
+    if not if_none_match:
+        return False
+
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (candidate[2:] if candidate.startswith("W/") else candidate) == opaque
+        for candidate in candidates
+    )
@@ -0,0 +1,182 @@
+"""
+万物可视化 v2.0 - 产物写入器
+在线程池中原子写入文件（临时文件 + os.replace），可选批量fsync
+"""
+
+from typing import Dict, List, Optional, Any, Tuple, Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import asyncio
+import os
+import tempfile
+import time
+
+from .structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# fsync策略: none - 不fsync；each - 每次写入后fsync；batch - 定期批量fsync
+FSYNC_MODES = ("none", "each", "batch")
+
+
+class ArtifactWriter:
+    """产物写入器 - 文件I/O不占用事件循环，写入过程崩溃不会留下截断文件"""
+
+    def __init__(self, max_workers: int = 4, fsync_mode: str = "batch", fsync_interval: float = 1.0):
+        """
+        初始化写入器
+
+        Args:
+            max_workers: 写入线程数
+            fsync_mode: fsync策略 (none, each, batch)
+            fsync_interval: batch模式下的fsync间隔（秒）
+        """
+        if fsync_mode not in FSYNC_MODES:
+            raise ValueError(f"不支持的fsync策略: {fsync_mode}")
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="artifact-writer")
+        self.fsync_mode = fsync_mode
+        self.fsync_interval = fsync_interval
+
+        self._pending_fsync: List[Path] = []
+        self._flusher: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "writes": 0,
+            "bytes": 0,
+            "errors": 0,
+            "fsync_batches": 0,
+            "total_latency": 0.0,
+            "max_latency": 0.0
+        }
+
+    async def start(self) -> None:
+        """启动批量fsync任务"""
+        if self.fsync_mode == "batch" and self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """停止写入器，落盘所有待fsync的文件"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+
+        await self.flush()
+        self.executor.shutdown(wait=True)
+
+    async def run(self, func: Callable, *args) -> Any:
+        """在写入线程池中执行函数（用于压缩、哈希等CPU工作）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def write_files(self, files: List[Tuple[Path, bytes]]) -> float:
+        """
+        原子写入一组文件
+
+        Args:
+            files: (目标路径, 内容) 列表
+
+        Returns:
+            float: 写入耗时（秒）
+        """
+        started = time.perf_counter()
+        try:
+            await self.run(self._write_files_sync, files)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+
+        latency = time.perf_counter() - started
+        self.stats["writes"] += len(files)
+        self.stats["bytes"] += sum(len(data) for _, data in files)
+        self.stats["total_latency"] += latency
+        self.stats["max_latency"] = max(self.stats["max_latency"], latency)
+
+        if self.fsync_mode == "batch":
+            self._pending_fsync.extend(path for path, _ in files)
+        return latency
+
+    async def flush(self) -> int:
+        """立即fsync所有待落盘文件"""
+        if not self._pending_fsync:
+            return 0
+
+        paths, self._pending_fsync = self._pending_fsync, []
+        await self.run(self._fsync_paths, paths)
+        self.stats["fsync_batches"] += 1
+        return len(paths)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入统计信息"""
+        writes = self.stats["writes"]
+        return {
+            "fsync_mode": self.fsync_mode,
+            "pending_fsync": len(self._pending_fsync),
+            "avg_latency": round(self.stats["total_latency"] / writes, 4) if writes else 0.0,
+            **self.stats
+        }
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("批量fsync失败", error=str(e))
+
+    def _write_files_sync(self, files: List[Tuple[Path, bytes]]) -> None:
+        for path, data in files:
+            self._atomic_write(path, data)
+
+    def _atomic_write(self, path: Path, data: bytes) -> None:
+        """写入同目录下的临时文件后 os.replace 到目标位置"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                if self.fsync_mode == "each":
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.chmod(tmp_name, 0o644)
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+
+        if self.fsync_mode == "each":
+            self._fsync_directory(path.parent)
+
+    def _fsync_paths(self, paths: List[Path]) -> None:
+        directories = set()
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            directories.add(path.parent)
+
+        for directory in directories:
+            self._fsync_directory(directory)
+
+    @staticmethod
+    def _fsync_directory(directory: Path) -> None:
+        # 目录fsync保证rename持久化；部分平台不支持对目录fsync
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
@@ -0,0 +1,84 @@
+"""
+万物可视化 v2.0 - 批量任务执行
+每个批次独立的并发上限，按完成顺序产出结果，批次内重复的工作只执行一次
+"""
+
+from typing import Dict, List, Any, Callable, Awaitable, AsyncIterator, Tuple, Hashable
+import asyncio
+
+
+class BatchRunner:
+    """批量执行器 - 一个实例对应一个批次"""
+
+    def __init__(self, concurrency: int):
+        """
+        初始化批量执行器
+
+        Args:
+            concurrency: 批次内同时执行的条目数上限
+        """
+        self.concurrency = max(1, concurrency)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        # 批次内共享的工作（如重复提示词的学科识别）
+        self._shared: Dict[Hashable, asyncio.Future] = {}
+
+        self.stats = {
+            "shared_hits": 0,
+            "shared_misses": 0
+        }
+
+    async def shared(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行批次内共享的工作，相同key只执行一次
+
+        Args:
+            key: 共享键
+            factory: 产生实际执行协程的函数
+
+        Returns:
+            Any: 执行结果（多个条目共享同一对象，修改前请先复制）
+        """
+        task = self._shared.get(key)
+        if task is None:
+            self.stats["shared_misses"] += 1
+            task = asyncio.ensure_future(factory())
+            self._shared[key] = task
+        else:
+            self.stats["shared_hits"] += 1
+        return await asyncio.shield(task)
+
+    async def run(
+        self,
+        items: List[Any],
+        worker: Callable[[int, Any], Awaitable[Any]]
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        并发执行所有条目，按完成顺序产出 (序号, 结果)
+
+        worker 应自行捕获异常并返回错误结果；
+        迭代提前结束（如客户端断开）时取消所有未完成的条目。
+
+        Args:
+            items: 批次条目
+            worker: 处理单个条目的协程函数 (index, item)
+        """
+        async def run_one(index: int, item: Any) -> Tuple[int, Any]:
+            async with self._semaphore:
+                return index, await worker(index, item)
+
+        tasks = [asyncio.ensure_future(run_one(index, item)) for index, item in enumerate(items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            pending = [task for task in tasks + list(self._shared.values()) if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取批次共享统计信息"""
+        return {
+            "concurrency": self.concurrency,
+            **self.stats
+        }
@@ -0,0 +1,105 @@
+"""
+万物可视化 v2.0 - 请求截止时间
+每个请求携带一个时间预算，沿路由流水线传递到各Agent方法；
+剩余预算不足以走完整路径时，改用内置默认模板和降采样的廉价渲染路径，并将结果标记为降级
+"""
+
+from typing import Dict, List, Optional, Any
+import time
+
+# 降级渲染时数据点数相对完整路径的比例
+DEGRADED_SAMPLING = 0.1
+
+# 降级渲染的最少数据点数（保证曲线形状可辨认）
+MIN_SAMPLES = 16
+
+
+class Deadline:
+    """请求截止时间 - 记录剩余预算和已降级的阶段"""
+
+    __slots__ = ("budget", "expires_at", "degrade_below", "degraded_stages")
+
+    def __init__(self, budget: float, degrade_below: float = 0.0, expires_at: Optional[float] = None):
+        """
+        初始化截止时间
+
+        Args:
+            budget: 时间预算（秒）
+            degrade_below: 剩余预算低于该值时各阶段改走廉价路径（秒）
+            expires_at: 截止时刻（time.monotonic），默认为当前时刻加预算
+        """
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget if expires_at is None else expires_at
+        self.degrade_below = degrade_below
+        self.degraded_stages: List[str] = []
+
+    @classmethod
+    def from_timestamp(cls, timestamp: float, degrade_below: float = 0.0) -> "Deadline":
+        """
+        由墙钟截止时刻创建（任务参数中保存的是 time.time() 时间戳，跨进程恢复时使用）
+
+        Args:
+            timestamp: 截止时刻（time.time()）
+            degrade_below: 剩余预算低于该值时改走廉价路径（秒）
+
+        Returns:
+            Deadline: 截止时间
+        """
+        remaining = timestamp - time.time()
+        return cls(max(0.0, remaining), degrade_below, expires_at=time.monotonic() + remaining)
+
+    def remaining(self) -> float:
+        """剩余预算（秒），已超时时为0"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timestamp(self) -> float:
+        """截止时刻的墙钟时间戳（time.time()），用于随任务参数持久化"""
+        return time.time() + (self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    @property
+    def tight(self) -> bool:
+        """剩余预算是否已不足以走完整路径"""
+        return self.remaining() < self.degrade_below
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.degraded_stages)
+
+    def mark_degraded(self, stage: str) -> None:
+        """记录某阶段改走了廉价路径"""
+        if stage not in self.degraded_stages:
+            self.degraded_stages.append(stage)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "budget": round(self.budget, 3),
+            "remaining": round(self.remaining(), 3),
+            "degraded": self.degraded,
+            "degraded_stages": list(self.degraded_stages)
+        }
+
+
+def is_tight(deadline: Optional[Deadline]) -> bool:
+    """未设置截止时间时始终走完整路径"""
+    return deadline is not None and deadline.tight
+
+
+def sample_count(config: Optional[Dict[str, Any]], points: int) -> int:
+    """
+    按配置中的采样比例计算数据点数（降级渲染时减少 numpy 采样量）
+
+    Args:
+        config: 可视化配置，sampling 字段为采样比例（缺省为完整采样）
+        points: 完整路径的数据点数
+
+    Returns:
+        int: 实际使用的数据点数
+    """
+    sampling = (config or {}).get("sampling", 1.0)
+    if sampling >= 1.0:
+        return points
+    return min(points, max(MIN_SAMPLES, int(points * sampling)))
@@ -0,0 +1,79 @@
+"""
+万物可视化 v2.0 - 快速JSON序列化
+优先使用 orjson（原生支持 numpy 数组与 datetime），未安装时回退到标准库 json
+"""
+
+from typing import Any
+from pathlib import Path
+from decimal import Decimal
+import datetime
+import json
+import sys
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，缺失时使用标准库
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+if HAS_ORJSON:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    """序列化库不直接支持的类型"""
+    # 不主动导入numpy：值是numpy类型时numpy必然已被加载
+    np = sys.modules.get("numpy")
+    if np is not None:
+        if isinstance(value, np.ndarray):
+            # orjson 只原生支持C连续的数值数组，其余情况（以及标准库回退）转为列表
+            return value.tolist()
+        if isinstance(value, np.generic):
+            return value.item()
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    """
+    序列化为UTF-8编码的JSON（不转义非ASCII字符）
+
+    Args:
+        value: 任意结构，可包含 numpy 数组/标量、datetime、pydantic 模型
+
+    Returns:
+        bytes: JSON字节串
+    """
+    if HAS_ORJSON:
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def dumps_str(value: Any, **_ignored) -> str:
+    """序列化为JSON字符串（用于嵌入HTML；兼容 Jinja2 tojson 的调用方式）"""
+    return dumps(value).decode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    快速JSON响应
+
+    直接返回该响应时 FastAPI 不再执行 response_model 校验和 jsonable_encoder，
+    适合由服务端自行构建、内容较大的响应（如包含完整HTML的生成结果）。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,581 @@
+"""
+万物可视化 v2.0 - 生成任务调度器
+按优先级分类的有界队列 + 固定数量worker，限制同时运行的可视化生成流水线数量；
+各优先级按权重公平分配worker（步幅调度），并提供单客户端并发上限和最低优先级的过载丢弃。
+处理函数通过 offload 把同步计算的Agent流水线交给调度器的线程池，事件循环不被占用，任务超时才能生效
+"""
+
+from typing import Dict, Optional, Any, Callable, Awaitable, List, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import math
+import threading
+import time
+
+from .structured_logging import get_logger, bind_correlation_id, reset_correlation_id
+
+logger = get_logger(__name__)
+
+
+class SchedulerFullError(Exception):
+    """调度队列已满错误"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ClientLimitError(SchedulerFullError):
+    """单个客户端进行中的任务数已达上限"""
+
+
+class LoadShedError(SchedulerFullError):
+    """过载时拒绝最低优先级的新任务"""
+
+
+class GenerationCancelled(Exception):
+    """任务已被取消（处理函数在阶段之间检查到取消请求时抛出）"""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"生成任务已取消: {job_id}")
+        self.job_id = job_id
+
+
+# 默认优先级权重（按优先级从高到低排列，最后一个为最低优先级）
+DEFAULT_PRIORITY_WEIGHTS: Dict[str, int] = {
+    "interactive": 4,
+    "bulk": 1
+}
+
+
+class GenerationJob:
+    """排队中的生成任务"""
+
+    __slots__ = (
+        "job_id", "handler", "args", "priority", "client_id", "timeout", "future",
+        "enqueued_at", "started_at", "finished_at", "abandoned"
+    )
+
+    def __init__(
+        self,
+        job_id: str,
+        handler: Callable[..., Awaitable[Any]],
+        args: tuple,
+        priority: str,
+        client_id: Optional[str] = None,
+        timeout: Optional[float] = None
+    ):
+        self.job_id = job_id
+        self.handler = handler
+        self.args = args
+        self.priority = priority
+        self.client_id = client_id
+        self.timeout = timeout
+        # run() 提交的任务：调用方在此等待处理结果
+        self.future: Optional[asyncio.Future] = None
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # 超时后调度器不再等待，仍在线程中运行的流水线在下一阶段停止
+        self.abandoned = False
+
+    @property
+    def queue_wait(self) -> float:
+        """排队等待时间（秒），未开始的任务返回当前已等待时间"""
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+
+# 当前worker正在执行的任务（offload 复制上下文，线程中的流水线也能读取）
+_current_job: contextvars.ContextVar[Optional[GenerationJob]] = contextvars.ContextVar("generation_job", default=None)
+
+
+def ensure_job_active() -> None:
+    """
+    在流水线阶段之间检查调度器是否已放弃当前任务（超时），已放弃时抛出 GenerationCancelled
+
+    超时只能让调度器停止等待，线程中的同步计算无法被打断，需在阶段之间自行检查后停止
+    """
+    job = _current_job.get()
+    if job is not None and job.abandoned:
+        raise GenerationCancelled(job.job_id)
+
+
+class GenerationScheduler:
+    """生成任务调度器 - 分优先级有界队列、加权公平出队、固定worker数、单任务超时"""
+
+    def __init__(
+        self,
+        worker_count: int,
+        queue_size: int,
+        job_timeout: float,
+        on_start: Optional[Callable[[str, float], None]] = None,
+        on_timeout: Optional[Callable[[str, float], None]] = None,
+        is_cancelled: Optional[Callable[[str], bool]] = None,
+        on_cancel: Optional[Callable[[str], None]] = None,
+        priority_weights: Optional[Dict[str, int]] = None,
+        client_limit: int = 0,
+        shed_queue_wait: float = 0.0
+    ):
+        """
+        初始化调度器
+
+        Args:
+            worker_count: 并发worker数量
+            queue_size: 每个优先级的等待队列容量，超过后拒绝该优先级的新任务
+            job_timeout: 单个任务的最长执行时间（秒）
+            on_start: 任务开始执行时的回调 (job_id, queue_wait)
+            on_timeout: 任务超时时的回调 (job_id, job_timeout)
+            is_cancelled: 判断任务是否已被请求取消，已取消的任务出队时直接跳过
+            on_cancel: 任务被取消（跳过或执行中途停止）时的回调 (job_id)
+            priority_weights: 优先级 -> 权重，按优先级从高到低排列；
+                有空闲worker时各优先级按权重比例获得执行机会
+            client_limit: 单个客户端排队和执行中的任务总数上限（0 表示不限制）
+            shed_queue_wait: 排队最久的任务等待超过该时间时拒绝最低优先级的新任务（秒，0 表示不丢弃）
+        """
+        self.worker_count = max(1, worker_count)
+        self.queue_size = max(1, queue_size)
+        self.job_timeout = job_timeout
+        self.on_start = on_start
+        self.on_timeout = on_timeout
+        self.is_cancelled = is_cancelled
+        self.on_cancel = on_cancel
+        self.priority_weights = dict(priority_weights or DEFAULT_PRIORITY_WEIGHTS)
+        self.priorities: Tuple[str, ...] = tuple(self.priority_weights)
+        self.lowest_priority = self.priorities[-1]
+        self.client_limit = client_limit
+        self.shed_queue_wait = shed_queue_wait
+
+        self.queues: Dict[str, deque] = {priority: deque() for priority in self.priorities}
+        # 可出队任务数，worker在此等待
+        self._ready: Optional[asyncio.Semaphore] = None
+        # 步幅调度：每次出队后该优先级的行程增加 1/权重，行程最小的非空优先级先出队
+        self._pass: Dict[str, float] = {priority: 0.0 for priority in self.priorities}
+        self._virtual_time = 0.0
+        self.workers: List[asyncio.Task] = []
+        # 运行Agent流水线的线程池（见 offload），线程数与worker数相同；
+        # 每个线程复用自己的事件循环（asyncio.run 每次新建和关闭循环约需0.1毫秒），停止时关闭
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread_state = threading.local()
+        self._thread_loops: List[asyncio.AbstractEventLoop] = []
+        self._thread_loops_lock = threading.Lock()
+        self.jobs: Dict[str, GenerationJob] = {}
+        # 客户端 -> 排队和执行中的任务数
+        self.client_inflight: Dict[str, int] = {}
+
+        # 调度统计
+        self.stats = {
+            "submitted": 0,
+            "rejected": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "cancelled": 0,
+            "shed": 0,
+            "client_limited": 0,
+            "running": 0,
+            "total_queue_wait": 0.0,
+            "total_run_time": 0.0
+        }
+        self.class_stats: Dict[str, Dict[str, Any]] = {
+            priority: {
+                "submitted": 0,
+                "rejected": 0,
+                "shed": 0,
+                "started": 0,
+                "running": 0,
+                "total_queue_wait": 0.0
+            }
+            for priority in self.priorities
+        }
+
+    async def start(self) -> None:
+        """启动worker（需在事件循环内调用）"""
+        if self.workers:
+            return
+
+        self._ready = asyncio.Semaphore(0)
+        self._executor = ThreadPoolExecutor(max_workers=self.worker_count, thread_name_prefix="generation-worker")
+        self.workers = [
+            asyncio.create_task(self._worker(index))
+            for index in range(self.worker_count)
+        ]
+
+    async def stop(self) -> None:
+        """停止所有worker，丢弃尚未开始的任务"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self._ready = None
+        if self._executor is not None:
+            # 超时后仍在运行的流水线在下一阶段停止，不等待其结束
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        with self._thread_loops_lock:
+            loops, self._thread_loops = self._thread_loops, []
+        for loop in loops:
+            if not loop.is_running():
+                loop.close()
+
+        for job in self.jobs.values():
+            if job.future is not None and not job.future.done():
+                job.future.cancel()
+        for queue in self.queues.values():
+            queue.clear()
+        self.jobs.clear()
+        self.client_inflight.clear()
+
+    def submit(
+        self,
+        job_id: str,
+        handler: Callable[..., Awaitable[Any]],
+        *args,
+        priority: Optional[str] = None,
+        client_id: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> int:
+        """
+        提交任务到队列
+
+        Args:
+            job_id: 任务ID
+            handler: 异步处理函数
+            *args: 传给处理函数的参数
+            priority: 优先级（默认为最低优先级）
+            client_id: 客户端标识（用于单客户端并发上限）
+            timeout: 本任务的执行时间上限（秒，不超过 job_timeout）
+
+        Returns:
+            int: 提交后该优先级队列中等待的任务数
+
+        Raises:
+            SchedulerFullError: 队列已满（ClientLimitError / LoadShedError 为其子类）
+        """
+        job = self._enqueue(GenerationJob(job_id, handler, args, priority or self.lowest_priority, client_id, timeout))
+        return len(self.queues[job.priority])
+
+    async def run(
+        self,
+        job_id: str,
+        handler: Callable[..., Awaitable[Any]],
+        *args,
+        priority: Optional[str] = None,
+        client_id: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """
+        提交任务并等待处理结果（同步接口的请求经此与后台任务共享worker）
+
+        调用方在任务开始前放弃等待时，任务出队后直接跳过。
+
+        Args:
+            同 submit
+
+        Returns:
+            Any: 处理函数的返回值
+
+        Raises:
+            SchedulerFullError: 队列已满
+            asyncio.TimeoutError: 任务执行超时
+            Exception: 处理函数抛出的异常
+        """
+        job = GenerationJob(job_id, handler, args, priority or self.lowest_priority, client_id, timeout)
+        job.future = asyncio.get_running_loop().create_future()
+        self._enqueue(job)
+        return await job.future
+
+    async def offload(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        在调度器的线程池中运行异步函数并等待结果（线程内有独立的事件循环）
+
+        Agent的方法是不会让出事件循环的同步计算，处理函数把路由流水线交给线程执行，
+        事件循环可以继续处理其他请求，任务超时时调度器也能按时停止等待。
+        函数在线程中运行，不能直接修改绑定事件循环的对象（回调需经 call_soon_threadsafe 转交）
+
+        Args:
+            func: 异步函数（如路由器的 prepare_route / render_route）
+            *args: 位置参数
+            **kwargs: 关键字参数
+
+        Returns:
+            Any: 函数的返回值
+        """
+        if self._executor is None:
+            # 调度器未启动（如脚本中直接调用处理函数）时在当前事件循环中执行
+            return await func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            # 复制上下文，线程中的日志保留关联ID，并能检查当前任务是否已被放弃
+            contextvars.copy_context().run,
+            self._run_in_thread, functools.partial(func, *args, **kwargs)
+        )
+
+    def _run_in_thread(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """在线程池线程中运行协程函数，排队期间任务已超时的不再执行"""
+        ensure_job_active()
+        loop = getattr(self._thread_state, "loop", None)
+        if loop is None:
+            loop = self._thread_state.loop = asyncio.new_event_loop()
+            with self._thread_loops_lock:
+                self._thread_loops.append(loop)
+        try:
+            return loop.run_until_complete(call())
+        finally:
+            with self._thread_loops_lock:
+                stopped = loop not in self._thread_loops
+            if stopped:
+                # 调度器停止时仍在运行（超时后未结束）的流水线，结束后由线程自己关闭事件循环
+                self._thread_state.loop = None
+                loop.close()
+
+    def is_queued(self, job_id: str) -> bool:
+        """任务是否在本调度器的队列中且尚未开始执行"""
+        job = self.jobs.get(job_id)
+        return job is not None and job.started_at is None
+
+    def get_job_timing(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务的排队/执行耗时"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+
+        run_time = None
+        if job.started_at is not None:
+            end = job.finished_at if job.finished_at is not None else time.monotonic()
+            run_time = round(end - job.started_at, 3)
+
+        return {
+            "queue_wait": round(job.queue_wait, 3),
+            "run_time": run_time,
+            "started": job.started_at is not None
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        """所有优先级排队中的任务总数"""
+        return sum(len(queue) for queue in self.queues.values())
+
+    def oldest_queue_wait(self, priority: Optional[str] = None) -> float:
+        """
+        排队最久的任务已等待的时间（秒）
+
+        Args:
+            priority: 只看该优先级，默认为所有优先级
+
+        Returns:
+            float: 等待时间，没有排队任务时为0
+        """
+        now = time.monotonic()
+        priorities = (priority,) if priority else self.priorities
+        heads = [self.queues[name][0].enqueued_at for name in priorities if self.queues[name]]
+        return now - min(heads) if heads else 0.0
+
+    def estimate_retry_after(self) -> int:
+        """根据平均执行时间和队列深度估算重试等待秒数"""
+        finished = self.stats["completed"] + self.stats["failed"] + self.stats["timed_out"]
+        avg_run_time = self.stats["total_run_time"] / finished if finished else 1.0
+        return max(1, math.ceil(avg_run_time * (self.queue_depth + 1) / self.worker_count))
+
+    def get_load(self) -> Dict[str, Dict[str, Any]]:
+        """各优先级当前负载：权重、排队数、执行数、最久等待时间与累计计数"""
+        load = {}
+        for priority in self.priorities:
+            stats = self.class_stats[priority]
+            load[priority] = {
+                "weight": self.priority_weights[priority],
+                "queued": len(self.queues[priority]),
+                "running": stats["running"],
+                "oldest_queue_wait": round(self.oldest_queue_wait(priority), 3),
+                "avg_queue_wait": round(stats["total_queue_wait"] / stats["started"], 3) if stats["started"] else 0.0,
+                "submitted": stats["submitted"],
+                "rejected": stats["rejected"],
+                "shed": stats["shed"]
+            }
+        return load
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度统计信息"""
+        started = self.stats["completed"] + self.stats["failed"] + self.stats["timed_out"] + self.stats["running"]
+        return {
+            "workers": self.worker_count,
+            "queue_size": self.queue_size,
+            "queue_depth": self.queue_depth,
+            "running": self.stats["running"],
+            "submitted": self.stats["submitted"],
+            "rejected": self.stats["rejected"],
+            "shed": self.stats["shed"],
+            "client_limited": self.stats["client_limited"],
+            "completed": self.stats["completed"],
+            "failed": self.stats["failed"],
+            "timed_out": self.stats["timed_out"],
+            "cancelled": self.stats["cancelled"],
+            "avg_queue_wait": round(self.stats["total_queue_wait"] / started, 3) if started else 0.0,
+            "job_timeout": self.job_timeout,
+            "client_limit": self.client_limit,
+            "active_clients": len(self.client_inflight),
+            "shed_queue_wait": self.shed_queue_wait,
+            "classes": self.get_load()
+        }
+
+    def _enqueue(self, job: GenerationJob) -> GenerationJob:
+        """准入检查后加入对应优先级的队列"""
+        if self._ready is None:
+            raise RuntimeError("调度器尚未启动")
+        if job.priority not in self.queues:
+            raise ValueError(f"未知的优先级: {job.priority}")
+
+        self._admit(job)
+
+        queue = self.queues[job.priority]
+        if not queue:
+            # 空闲后重新排队的优先级不能累积之前的份额
+            self._pass[job.priority] = max(self._pass[job.priority], self._virtual_time)
+        queue.append(job)
+        self.jobs[job.job_id] = job
+        if job.client_id is not None:
+            self.client_inflight[job.client_id] = self.client_inflight.get(job.client_id, 0) + 1
+        self.stats["submitted"] += 1
+        self.class_stats[job.priority]["submitted"] += 1
+        self._ready.release()
+        return job
+
+    def _admit(self, job: GenerationJob) -> None:
+        """准入控制：单客户端上限、最低优先级过载丢弃、队列容量"""
+        class_stats = self.class_stats[job.priority]
+
+        if self.client_limit and job.client_id is not None:
+            if self.client_inflight.get(job.client_id, 0) >= self.client_limit:
+                self.stats["rejected"] += 1
+                self.stats["client_limited"] += 1
+                class_stats["rejected"] += 1
+                raise ClientLimitError(
+                    f"进行中的生成任务过多（每个客户端最多 {self.client_limit} 个），请稍后重试",
+                    self.estimate_retry_after()
+                )
+
+        if (
+            self.shed_queue_wait > 0
+            and job.priority == self.lowest_priority
+            and self.oldest_queue_wait() > self.shed_queue_wait
+        ):
+            self.stats["rejected"] += 1
+            self.stats["shed"] += 1
+            class_stats["rejected"] += 1
+            class_stats["shed"] += 1
+            raise LoadShedError(
+                "系统繁忙，暂停接收低优先级生成任务，请稍后重试",
+                self.estimate_retry_after()
+            )
+
+        if len(self.queues[job.priority]) >= self.queue_size:
+            self.stats["rejected"] += 1
+            class_stats["rejected"] += 1
+            raise SchedulerFullError(
+                f"生成队列已满（{self.queue_size}），请稍后重试",
+                self.estimate_retry_after()
+            )
+
+    def _dequeue(self) -> GenerationJob:
+        """取出行程最小的非空优先级的队首任务（调用前已确认有可出队任务）"""
+        priority = min(
+            (name for name in self.priorities if self.queues[name]),
+            key=lambda name: self._pass[name]
+        )
+        self._virtual_time = self._pass[priority]
+        self._pass[priority] += 1.0 / max(1, self.priority_weights[priority])
+        return self.queues[priority].popleft()
+
+    def _release(self, job: GenerationJob) -> None:
+        """任务结束（或被跳过）后释放客户端计数"""
+        self.jobs.pop(job.job_id, None)
+        if job.client_id is None:
+            return
+        remaining = self.client_inflight.get(job.client_id, 0) - 1
+        if remaining > 0:
+            self.client_inflight[job.client_id] = remaining
+        else:
+            self.client_inflight.pop(job.client_id, None)
+
+    async def _worker(self, index: int) -> None:
+        """worker主循环：按加权公平顺序逐个取出任务并在超时限制内执行"""
+        while True:
+            await self._ready.acquire()
+            job = self._dequeue()
+            try:
+                if job.future is not None and job.future.done():
+                    # 调用方已放弃等待
+                    self._cancelled(job.job_id)
+                    continue
+                if self.is_cancelled and self.is_cancelled(job.job_id):
+                    # 排队期间已被取消，不占用执行时间
+                    self._cancelled(job.job_id)
+                    if job.future is not None:
+                        job.future.set_exception(GenerationCancelled(job.job_id))
+                    continue
+                await self._run_job(job)
+            finally:
+                self._release(job)
+
+    async def _run_job(self, job: GenerationJob) -> None:
+        """执行单个任务，run() 提交的任务把结果或异常交给等待的调用方"""
+        job.started_at = time.monotonic()
+        queue_wait = job.queue_wait
+        class_stats = self.class_stats[job.priority]
+        self.stats["total_queue_wait"] += queue_wait
+        self.stats["running"] += 1
+        class_stats["started"] += 1
+        class_stats["running"] += 1
+        class_stats["total_queue_wait"] += queue_wait
+        timeout = min(job.timeout, self.job_timeout) if job.timeout else self.job_timeout
+        outcome: Optional[BaseException] = None
+        result = None
+
+        # worker任务不继承提交请求的上下文，以任务ID作为关联ID
+        token = bind_correlation_id(job.job_id)
+        job_token = _current_job.set(job)
+
+        if self.on_start:
+            self.on_start(job.job_id, queue_wait)
+
+        try:
+            result = await asyncio.wait_for(job.handler(*job.args), timeout=timeout)
+            self.stats["completed"] += 1
+        except GenerationCancelled as e:
+            outcome = e
+            self._cancelled(job.job_id)
+        except asyncio.TimeoutError as e:
+            outcome = e
+            job.abandoned = True
+            self.stats["timed_out"] += 1
+            if self.on_timeout:
+                self.on_timeout(job.job_id, timeout)
+        except Exception as e:
+            # 处理函数自行记录失败状态，这里只做统计
+            outcome = e
+            self.stats["failed"] += 1
+            logger.error("生成任务异常", job_id=job.job_id, error=str(e))
+        finally:
+            _current_job.reset(job_token)
+            reset_correlation_id(token)
+            job.finished_at = time.monotonic()
+            self.stats["running"] -= 1
+            class_stats["running"] -= 1
+            self.stats["total_run_time"] += job.finished_at - job.started_at
+
+        if job.future is not None and not job.future.done():
+            if outcome is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(outcome)
+
+    def _cancelled(self, job_id: str) -> None:
+        self.stats["cancelled"] += 1
+        logger.info("生成任务已取消", job_id=job_id)
+        if self.on_cancel:
+            self.on_cancel(job_id)
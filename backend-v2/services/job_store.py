@@ -0,0 +1,569 @@
+"""
+万物可视化 v2.0 - 持久化任务存储
+SQLite 后端：多个 uvicorn worker 共享任务状态，进程重启后接管中断的任务
+"""
+
+from typing import Dict, List, Optional, Any, Tuple, Set
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import asyncio
+import datetime
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+
+from .status_store import GenerationStatusStore, GenerationRecord, JobStore, TERMINAL_STATUSES
+from .structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+JOB_STORE_BACKENDS = ("memory", "sqlite")
+
+_DATETIME_FIELDS = ("created_at", "started_at", "completed_at", "failed_at")
+
+_COLUMNS = (
+    "generation_id", "status", "progress", "subject", "prompt",
+    "created_at", "started_at", "completed_at", "failed_at",
+    "queue_wait", "write_time", "html_url", "error", "degraded", "request",
+    "owner", "updated_at", "finished_at"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generation_jobs (
+    generation_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    subject TEXT,
+    prompt TEXT,
+    created_at TEXT,
+    started_at TEXT,
+    completed_at TEXT,
+    failed_at TEXT,
+    queue_wait REAL,
+    write_time REAL,
+    html_url TEXT,
+    error TEXT,
+    degraded INTEGER NOT NULL DEFAULT 0,
+    request TEXT,
+    owner TEXT,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_finished ON generation_jobs (finished_at);
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs (status);
+CREATE TABLE IF NOT EXISTS generation_idempotency (
+    idempotency_key TEXT PRIMARY KEY,
+    generation_id TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS generation_cancellations (
+    generation_id TEXT PRIMARY KEY,
+    requested_at REAL NOT NULL
+);
+"""
+
+# 旧版本数据库缺少的列: (列名, 定义)
+_MIGRATIONS = (
+    ("degraded", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+# 语句保持为常量字符串，sqlite3 按文本缓存已编译的语句
+_UPSERT_SQL = (
+    f"INSERT INTO generation_jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))}) "
+    "ON CONFLICT(generation_id) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column in _COLUMNS[1:])
+)
+_SELECT_SQL = (
+    f"SELECT {', '.join(_COLUMNS)} FROM generation_jobs "
+    "WHERE generation_id = ? AND (finished_at IS NULL OR finished_at >= ?)"
+)
+_DELETE_SQL = "DELETE FROM generation_jobs WHERE generation_id = ?"
+_SWEEP_SQL = "DELETE FROM generation_jobs WHERE finished_at IS NOT NULL AND finished_at < ?"
+_INFLIGHT_SQL = (
+    f"SELECT {', '.join(_COLUMNS)} FROM generation_jobs "
+    f"WHERE status NOT IN ({', '.join('?' * len(TERMINAL_STATUSES))})"
+)
+_REFERENCED_SQL = (
+    "SELECT html_url FROM generation_jobs "
+    "WHERE html_url IS NOT NULL AND (finished_at IS NULL OR finished_at >= ?)"
+)
+_IDEMPOTENCY_SELECT_SQL = (
+    "SELECT generation_id, fingerprint, created_at FROM generation_idempotency WHERE idempotency_key = ?"
+)
+_IDEMPOTENCY_UPSERT_SQL = (
+    "INSERT OR REPLACE INTO generation_idempotency (idempotency_key, generation_id, fingerprint, created_at) "
+    "VALUES (?, ?, ?, ?)"
+)
+_IDEMPOTENCY_DELETE_SQL = "DELETE FROM generation_idempotency WHERE idempotency_key = ?"
+_IDEMPOTENCY_SWEEP_SQL = "DELETE FROM generation_idempotency WHERE created_at < ?"
+_CANCEL_INSERT_SQL = "INSERT OR IGNORE INTO generation_cancellations (generation_id, requested_at) VALUES (?, ?)"
+_CANCEL_SELECT_SQL = "SELECT generation_id FROM generation_cancellations WHERE generation_id IN ({})"
+_CANCEL_SWEEP_SQL = "DELETE FROM generation_cancellations WHERE requested_at < ?"
+_CLAIM_SQL = "UPDATE generation_jobs SET owner = ?, updated_at = ? WHERE generation_id = ? AND owner IS ?"
+
+
+def sqlite_path_from_url(database_url: str) -> str:
+    """
+    从 DATABASE_URL 解析SQLite文件路径
+
+    Args:
+        database_url: 形如 sqlite:///./visualization.db 或 sqlite:////var/lib/viz.db
+
+    Returns:
+        str: 数据库文件路径（":memory:" 表示内存数据库）
+    """
+    parsed = urlparse(database_url)
+    if parsed.scheme != "sqlite":
+        raise ValueError(f"不支持的数据库URL: {database_url}")
+
+    # sqlite:///./viz.db 的 path 为 "/./viz.db"，sqlite:////abs/viz.db 为 "//abs/viz.db"
+    path = parsed.path[1:] if parsed.path.startswith("/") else parsed.path
+    return path or ":memory:"
+
+
+class SQLiteJobStore(GenerationStatusStore):
+    """
+    SQLite 任务存储
+
+    本进程创建的任务保存在内存中（与内存后端相同），状态变更合并后
+    按固定间隔批量写入数据库；查询不在本进程的任务时读取数据库。
+    所有数据库操作都在单独的线程中执行，不占用事件循环。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int,
+        terminal_ttl: float,
+        flush_interval: float = 0.1,
+        orphan_timeout: float = 120.0,
+        **kwargs
+    ):
+        """
+        初始化SQLite任务存储
+
+        Args:
+            path: 数据库文件路径
+            max_entries: 内存中记录数上限
+            terminal_ttl: 终态记录保留时间（秒），同时用于数据库清理
+            flush_interval: 批量写入间隔（秒）
+            orphan_timeout: 其他主机上的任务超过该时间未更新视为中断（秒）
+            **kwargs: 传给内存存储的其他参数
+        """
+        super().__init__(max_entries=max_entries, terminal_ttl=terminal_ttl, **kwargs)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.orphan_timeout = orphan_timeout
+        self.hostname = socket.gethostname()
+        # 附带每次启动生成的标识：容器重启后主机名和PID（常为1）往往不变，
+        # 仅凭二者无法区分崩溃前的自己，会导致其遗留的任务永远不被接管
+        self.owner = f"{self.hostname}:{os.getpid()}:{uuid.uuid4()}"
+
+        # 连接只在单独的数据库线程中使用
+        self._writer: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+
+        self._dirty: Dict[str, GenerationRecord] = {}
+        self._deleted: List[str] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._last_db_sweep = time.monotonic()
+
+        self.db_stats = {
+            "flushes": 0,
+            "rows_written": 0,
+            "flush_errors": 0,
+            "remote_reads": 0,
+            "remote_hits": 0,
+            "cancel_polls": 0,
+            "recovered": 0,
+            "last_flush_latency": 0.0
+        }
+
+    # ---------- 生命周期 ----------
+
+    async def start(self) -> None:
+        """打开数据库并启动批量写入任务"""
+        if self._writer is not None:
+            return
+
+        await self._run(self._open_writer)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """停止批量写入任务，写出剩余变更并关闭数据库"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+
+        if self._writer is not None:
+            await self.flush()
+            await self._run(self._writer.close)
+            self._writer = None
+        self._executor.shutdown(wait=True)
+
+    async def recover(self) -> List[GenerationRecord]:
+        """
+        接管已中断进程留下的进行中任务
+
+        本机进程已退出，或其他主机的任务超过 orphan_timeout 未更新时，
+        以比较并交换的方式改写 owner，保证多个worker同时启动时只有一个接管成功。
+
+        Returns:
+            List[GenerationRecord]: 接管到的任务记录（已加入本进程内存）
+        """
+        rows = await self._run(self._claim_orphans)
+        recovered = []
+        for row in rows:
+            record = self._record_from_row(row)
+            self._records[record.generation_id] = record
+            recovered.append(record)
+
+        self.db_stats["recovered"] += len(recovered)
+        if recovered:
+            logger.info("已接管中断的生成任务", count=len(recovered))
+        return recovered
+
+    # ---------- 存储接口 ----------
+
+    def create(
+        self,
+        generation_id: str,
+        status: str,
+        prompt: str = "",
+        subject: Optional[str] = None,
+        request: Optional[Dict[str, Any]] = None
+    ) -> GenerationRecord:
+        record = super().create(generation_id, status, prompt, subject, request)
+        self._dirty[generation_id] = record
+        return record
+
+    async def fetch(self, generation_id: str) -> Optional[GenerationRecord]:
+        """获取记录：本进程的任务读内存，其余在数据库线程中读取"""
+        record = self.get(generation_id)
+        if record is not None or self._writer is None:
+            return record
+        return await self._run(self._read_remote, generation_id)
+
+    def update(self, generation_id: str, **fields) -> Optional[GenerationRecord]:
+        record = super().update(generation_id, **fields)
+        if record is not None:
+            self._dirty[generation_id] = record
+        return record
+
+    def discard(self, generation_id: str) -> None:
+        super().discard(generation_id)
+        self._dirty.pop(generation_id, None)
+        self._deleted.append(generation_id)
+
+    async def claim_idempotency_key(self, key: str, fingerprint: str, generation_id: str) -> Optional[Tuple[str, str]]:
+        """占用幂等键（数据库事务内比较并写入，多个worker同时收到重试时只有一个占用成功）"""
+        if self._writer is None:
+            return await super().claim_idempotency_key(key, fingerprint, generation_id)
+        return await self._run(self._claim_idempotency_key, key, fingerprint, generation_id)
+
+    async def release_idempotency_key(self, key: str) -> None:
+        """释放幂等键"""
+        await super().release_idempotency_key(key)
+        if self._writer is not None:
+            await self._run(self._writer.execute, _IDEMPOTENCY_DELETE_SQL, (key,))
+
+    async def request_cancel(self, generation_id: str) -> None:
+        """请求取消任务：本进程的任务直接标记，其他worker的任务写入数据库由其在阶段之间读取"""
+        if generation_id in self._records:
+            await super().request_cancel(generation_id)
+        elif self._writer is not None:
+            await self._run(self._writer.execute, _CANCEL_INSERT_SQL, (generation_id, time.time()))
+
+    async def sync_cancellations(self) -> int:
+        """
+        读取其他worker写入的、针对本进程进行中任务的取消请求（由批量写入任务定期调用），
+        is_cancel_requested 只检查内存中的标记
+
+        Returns:
+            int: 新发现的取消请求数
+        """
+        if self._writer is None or len(self._records) <= len(self._terminal):
+            return 0
+
+        pending = [
+            generation_id for generation_id in self._records
+            if generation_id not in self._terminal and generation_id not in self._cancel_requested
+        ]
+        if not pending:
+            return 0
+
+        self.db_stats["cancel_polls"] += 1
+        cancelled = await self._run(self._select_cancellations, pending)
+        # 查询期间可能已结束或被删除的任务不再标记
+        cancelled = [generation_id for generation_id in cancelled if generation_id in self._records]
+        self._cancel_requested.update(cancelled)
+        return len(cancelled)
+
+    async def flush(self) -> int:
+        """
+        立即把所有待写入的变更写入数据库（一个事务）
+
+        Returns:
+            int: 写入的记录数
+        """
+        if self._writer is None or (not self._dirty and not self._deleted):
+            return 0
+
+        dirty, self._dirty = self._dirty, {}
+        deleted, self._deleted = self._deleted, []
+        rows = [self._row_for(record) for record in dirty.values()]
+
+        started = time.perf_counter()
+        try:
+            await self._run(self._write_batch, rows, deleted)
+        except Exception:
+            # 写入失败时保留变更，下次重试（期间的新变更优先）
+            self._dirty = {**dirty, **self._dirty}
+            self._deleted = deleted + self._deleted
+            self.db_stats["flush_errors"] += 1
+            raise
+
+        self.db_stats["flushes"] += 1
+        self.db_stats["rows_written"] += len(rows)
+        self.db_stats["last_flush_latency"] = round(time.perf_counter() - started, 6)
+        return len(rows)
+
+    async def referenced_urls(self) -> Set[str]:
+        """获取未过期任务引用的结果地址（本进程内存 + 数据库中所有worker的任务）"""
+        urls = await super().referenced_urls()
+        if self._writer is not None:
+            urls.update(await self._run(self._select_referenced_urls))
+        return urls
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计信息（含数据库写入统计）"""
+        return {
+            **super().get_stats(),
+            "backend": "sqlite",
+            "path": self.path,
+            "owner": self.owner,
+            "pending_writes": len(self._dirty) + len(self._deleted),
+            **self.db_stats
+        }
+
+    # ---------- 内部实现 ----------
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("任务状态批量写入失败", error=str(e))
+            try:
+                await self.sync_cancellations()
+            except Exception as e:
+                logger.warning("读取取消请求失败", error=str(e))
+
+    def _connect(self) -> sqlite3.Connection:
+        # 连接只在数据库线程中创建和使用
+        connection = sqlite3.connect(
+            self.path,
+            timeout=5.0,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=64
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA busy_timeout = 5000")
+        return connection
+
+    def _open_writer(self) -> None:
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode = WAL")
+        # WAL模式下NORMAL只在检查点时fsync，崩溃最多丢失最后一批状态
+        self._writer.execute("PRAGMA synchronous = NORMAL")
+        self._writer.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """为旧版本创建的任务表补充新增的列"""
+        existing = {row["name"] for row in self._writer.execute("PRAGMA table_info(generation_jobs)")}
+        for column, definition in _MIGRATIONS:
+            if column not in existing:
+                self._writer.execute(f"ALTER TABLE generation_jobs ADD COLUMN {column} {definition}")
+
+    def _write_batch(self, rows: List[Tuple], deleted: List[str]) -> None:
+        writer = self._writer
+        writer.execute("BEGIN IMMEDIATE")
+        try:
+            if rows:
+                writer.executemany(_UPSERT_SQL, rows)
+            if deleted:
+                writer.executemany(_DELETE_SQL, [(generation_id,) for generation_id in deleted])
+            if time.monotonic() - self._last_db_sweep >= self.sweep_interval:
+                now = time.time()
+                writer.execute(_SWEEP_SQL, (now - self.terminal_ttl,))
+                writer.execute(_IDEMPOTENCY_SWEEP_SQL, (now - self.idempotency_ttl,))
+                writer.execute(_CANCEL_SWEEP_SQL, (now - self.terminal_ttl,))
+                self._last_db_sweep = time.monotonic()
+            writer.execute("COMMIT")
+        except BaseException:
+            writer.execute("ROLLBACK")
+            raise
+
+    def _claim_idempotency_key(self, key: str, fingerprint: str, generation_id: str) -> Optional[Tuple[str, str]]:
+        writer = self._writer
+        now = time.time()
+        writer.execute("BEGIN IMMEDIATE")
+        try:
+            row = writer.execute(_IDEMPOTENCY_SELECT_SQL, (key,)).fetchone()
+            if row is not None and now - row["created_at"] <= self.idempotency_ttl:
+                writer.execute("COMMIT")
+                return row["generation_id"], row["fingerprint"]
+            writer.execute(_IDEMPOTENCY_UPSERT_SQL, (key, generation_id, fingerprint, now))
+            writer.execute("COMMIT")
+        except BaseException:
+            writer.execute("ROLLBACK")
+            raise
+        return None
+
+    def _claim_orphans(self) -> List[sqlite3.Row]:
+        rows = self._writer.execute(_INFLIGHT_SQL, tuple(TERMINAL_STATUSES)).fetchall()
+        now = time.time()
+
+        claimed = []
+        for row in rows:
+            owner = row["owner"]
+            if owner == self.owner or not self._is_orphaned(owner, row["updated_at"], now):
+                continue
+            cursor = self._writer.execute(_CLAIM_SQL, (self.owner, now, row["generation_id"], owner))
+            if cursor.rowcount == 1:
+                claimed.append(row)
+        return claimed
+
+    def _select_referenced_urls(self) -> List[str]:
+        rows = self._writer.execute(_REFERENCED_SQL, (time.time() - self.terminal_ttl,)).fetchall()
+        return [row["html_url"] for row in rows]
+
+    def _is_orphaned(self, owner: Optional[str], updated_at: float, now: float) -> bool:
+        """判断任务的所属进程是否已不在运行"""
+        host, _, pid = (owner or "").rpartition(":")
+        if not pid.isdigit():
+            # 主机名:PID:启动标识（不带启动标识的是旧格式）
+            host, _, pid = host.rpartition(":")
+        if host == self.hostname and pid.isdigit():
+            if int(pid) == os.getpid():
+                # PID与本进程相同但 owner 不同：同一PID下此前启动的进程，已经退出
+                return True
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                return False
+            return False
+        # 无法确认其他主机进程是否存活，按更新时间判断
+        return now - updated_at > self.orphan_timeout
+
+    def _select_cancellations(self, generation_ids: List[str]) -> List[str]:
+        cancelled = []
+        # 分批查询，避免超出SQLite的参数个数上限
+        for start in range(0, len(generation_ids), 500):
+            batch = generation_ids[start:start + 500]
+            rows = self._writer.execute(_CANCEL_SELECT_SQL.format(", ".join("?" * len(batch))), batch).fetchall()
+            cancelled.extend(row["generation_id"] for row in rows)
+        return cancelled
+
+    def _read_remote(self, generation_id: str) -> Optional[GenerationRecord]:
+        self.db_stats["remote_reads"] += 1
+        row = self._writer.execute(_SELECT_SQL, (generation_id, time.time() - self.terminal_ttl)).fetchone()
+        if row is None:
+            return None
+
+        self.db_stats["remote_hits"] += 1
+        return self._record_from_row(row)
+
+    def _row_for(self, record: GenerationRecord) -> Tuple:
+        finished_at = None
+        if record.finished_monotonic is not None:
+            finished_at = time.time() - (time.monotonic() - record.finished_monotonic)
+
+        return (
+            record.generation_id,
+            record.status,
+            record.progress,
+            record.subject,
+            record.prompt,
+            *(_format_datetime(getattr(record, name)) for name in _DATETIME_FIELDS),
+            record.queue_wait,
+            record.write_time,
+            record.html_url,
+            record.error,
+            int(record.degraded),
+            json.dumps(record.request, ensure_ascii=False, default=str) if record.request is not None else None,
+            self.owner,
+            time.time(),
+            finished_at
+        )
+
+    @staticmethod
+    def _record_from_row(row: sqlite3.Row) -> GenerationRecord:
+        record = GenerationRecord(
+            row["generation_id"],
+            row["status"],
+            row["prompt"] or "",
+            row["subject"],
+            json.loads(row["request"]) if row["request"] else None
+        )
+        record.progress = row["progress"]
+        for name in _DATETIME_FIELDS:
+            setattr(record, name, _parse_datetime(row[name]))
+        record.queue_wait = row["queue_wait"]
+        record.write_time = row["write_time"]
+        record.html_url = row["html_url"]
+        record.error = row["error"]
+        record.degraded = bool(row["degraded"])
+        if row["finished_at"] is not None:
+            record.finished_monotonic = time.monotonic() - (time.time() - row["finished_at"])
+        return record
+
+
+def _format_datetime(value: Optional[datetime.datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime.datetime]:
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def create_job_store(backend: str, database_url: str, max_entries: int, terminal_ttl: float, **kwargs) -> JobStore:
+    """
+    按配置创建任务存储
+
+    Args:
+        backend: memory 或 sqlite
+        database_url: SQLite 数据库URL（sqlite后端使用）
+        max_entries: 内存中记录数上限
+        terminal_ttl: 终态记录保留时间（秒）
+        **kwargs: 其他存储参数（on_update、flush_interval 等）
+
+    Returns:
+        JobStore: 任务存储实例
+    """
+    if backend not in JOB_STORE_BACKENDS:
+        raise ValueError(f"不支持的任务存储后端: {backend}")
+
+    if backend == "sqlite":
+        return SQLiteJobStore(sqlite_path_from_url(database_url), max_entries, terminal_ttl, **kwargs)
+
+    kwargs.pop("flush_interval", None)
+    kwargs.pop("orphan_timeout", None)
+    return GenerationStatusStore(max_entries=max_entries, terminal_ttl=terminal_ttl, **kwargs)
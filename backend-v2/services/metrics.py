@@ -0,0 +1,199 @@
+"""
+万物可视化 v2.0 - 流水线阶段耗时指标
+按 (阶段, 学科, 模板) 记录延迟直方图，并以 Prometheus 文本格式导出 p50/p95/p99
+"""
+
+from typing import Dict, List, Optional, Any, Tuple, Iterator
+from collections import deque
+from contextlib import contextmanager
+import bisect
+import math
+import threading
+import time
+
+# 直方图桶上界（秒），覆盖从内存计算到慢速渲染的范围
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+# 导出的分位数
+QUANTILES: Tuple[float, ...] = (0.5, 0.95, 0.99)
+
+# 路由流水线的阶段名称
+PIPELINE_STAGES: Tuple[str, ...] = (
+    "classify", "parse_requirement", "match_template",
+    "generate_config", "generate_visualization", "artifact_write"
+)
+
+LabelKey = Tuple[str, str, str]
+
+
+class LatencyHistogram:
+    """单个标签组合的延迟直方图 - 累计桶计数 + 最近样本窗口（用于分位数）"""
+
+    __slots__ = ("bounds", "bucket_counts", "count", "total", "window")
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS, window_size: int = 1024):
+        self.bounds = bounds
+        self.bucket_counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.window: deque = deque(maxlen=window_size)
+
+    def observe(self, seconds: float) -> None:
+        """记录一次耗时"""
+        self.bucket_counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.window.append(seconds)
+
+    def quantiles(self, quantiles: Tuple[float, ...] = QUANTILES) -> Dict[float, float]:
+        """
+        计算最近样本窗口的分位数（最近邻秩）
+
+        Returns:
+            Dict[float, float]: 分位数 -> 耗时（秒），无样本时为空
+        """
+        if not self.window:
+            return {}
+
+        samples = sorted(self.window)
+        last = len(samples) - 1
+        return {q: samples[min(last, max(0, math.ceil(q * len(samples)) - 1))] for q in quantiles}
+
+
+class StageMetrics:
+    """流水线阶段耗时指标注册表"""
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS, window_size: int = 1024):
+        """
+        初始化指标注册表
+
+        Args:
+            bounds: 直方图桶上界（秒）
+            window_size: 每个标签组合用于计算分位数的最近样本数
+        """
+        self.bounds = bounds
+        self.window_size = window_size
+        self._histograms: Dict[LabelKey, LatencyHistogram] = {}
+        # 组合面板和调度器工作线程中也会记录耗时
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, subject: Optional[str] = None, template: Optional[str] = None) -> None:
+        """
+        记录阶段耗时
+
+        Args:
+            stage: 阶段名称（见 PIPELINE_STAGES）
+            seconds: 耗时（秒）
+            subject: 学科
+            template: 模板ID
+        """
+        key = (stage, subject or "unknown", template or "none")
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram(self.bounds, self.window_size)
+            histogram.observe(seconds)
+
+    def observe_all(self, timings: Dict[str, float], subject: Optional[str] = None, template: Optional[str] = None) -> None:
+        """批量记录一次请求的各阶段耗时"""
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds, subject, template)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """按阶段汇总（合并所有学科/模板），用于 /health"""
+        merged: Dict[str, List[LatencyHistogram]] = {}
+        combined_by_stage: Dict[str, Tuple[LatencyHistogram, int, float]] = {}
+        # 在锁内复制样本，避免其他线程同时记录时迭代中的窗口被修改
+        with self._lock:
+            for (stage, _, _), histogram in self._histograms.items():
+                merged.setdefault(stage, []).append(histogram)
+            for stage, histograms in merged.items():
+                combined = LatencyHistogram(self.bounds, self.window_size * len(histograms))
+                for histogram in histograms:
+                    combined.window.extend(histogram.window)
+                count = sum(histogram.count for histogram in histograms)
+                total = sum(histogram.total for histogram in histograms)
+                combined_by_stage[stage] = (combined, count, total)
+
+        result = {}
+        for stage, (combined, count, total) in combined_by_stage.items():
+            result[stage] = {
+                "count": count,
+                "avg": round(total / count, 6) if count else 0.0,
+                **{f"p{int(q * 100)}": round(value, 6) for q, value in combined.quantiles().items()}
+            }
+        return result
+
+    def render_prometheus(self, prefix: str = "viz_stage") -> str:
+        """
+        以 Prometheus 文本格式导出
+
+        Args:
+            prefix: 指标名前缀
+
+        Returns:
+            str: text/plain; version=0.0.4 格式的指标
+        """
+        with self._lock:
+            return self._render_prometheus(prefix)
+
+    def _render_prometheus(self, prefix: str) -> str:
+        histograms = sorted(self._histograms.items())
+        lines = [
+            f"# HELP {prefix}_duration_seconds Routing pipeline stage latency.",
+            f"# TYPE {prefix}_duration_seconds histogram"
+        ]
+        for key, histogram in histograms:
+            labels = _format_labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.bounds, histogram.bucket_counts):
+                cumulative += bucket_count
+                lines.append(f'{prefix}_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{prefix}_duration_seconds_sum{{{labels}}} {histogram.total:.6f}")
+            lines.append(f"{prefix}_duration_seconds_count{{{labels}}} {histogram.count}")
+
+        lines.append(f"# HELP {prefix}_duration_quantile_seconds Stage latency quantiles over the most recent samples.")
+        lines.append(f"# TYPE {prefix}_duration_quantile_seconds gauge")
+        for key, histogram in histograms:
+            labels = _format_labels(key)
+            for q, value in histogram.quantiles().items():
+                lines.append(f'{prefix}_duration_quantile_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """清空所有指标"""
+        with self._lock:
+            self._histograms.clear()
+
+
+def _format_labels(key: LabelKey) -> str:
+    stage, subject, template = (_escape_label(value) for value in key)
+    return f'stage="{stage}",subject="{subject}",template="{template}"'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@contextmanager
+def timed_stage(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    """
+    记录代码块的单调时钟耗时
+
+    Args:
+        timings: 阶段耗时字典，结束时写入 timings[stage]（秒）
+        stage: 阶段名称
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round(time.perf_counter() - started, 6)
+
+
+# 进程级默认注册表
+stage_metrics = StageMetrics()
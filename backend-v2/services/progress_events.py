@@ -0,0 +1,76 @@
+"""
+万物可视化 v2.0 - 生成进度推送
+按 generation_id 分发状态变更事件，供 SSE / WebSocket 订阅者实时接收
+"""
+
+from typing import Dict, Set, Any, Optional
+import asyncio
+
+
+class ProgressBroadcaster:
+    """生成进度广播器 - 每个订阅者一个有界队列"""
+
+    def __init__(self, subscriber_queue_size: int = 16):
+        """
+        初始化广播器
+
+        Args:
+            subscriber_queue_size: 每个订阅者的事件缓冲上限，溢出时丢弃最旧事件
+        """
+        self.subscriber_queue_size = max(1, subscriber_queue_size)
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+        self.stats = {
+            "published": 0,
+            "dropped": 0
+        }
+
+    def subscribe(self, generation_id: str) -> asyncio.Queue:
+        """订阅指定任务的进度事件"""
+        queue = asyncio.Queue(maxsize=self.subscriber_queue_size)
+        self._subscribers.setdefault(generation_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, generation_id: str, queue: asyncio.Queue) -> None:
+        """取消订阅"""
+        queues = self._subscribers.get(generation_id)
+        if queues is None:
+            return
+
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[generation_id]
+
+    def publish(self, generation_id: str, event: Dict[str, Any]) -> None:
+        """
+        发布进度事件（非阻塞）
+
+        Args:
+            generation_id: 生成任务ID
+            event: 事件内容
+        """
+        queues = self._subscribers.get(generation_id)
+        if not queues:
+            return
+
+        self.stats["published"] += 1
+        for queue in queues:
+            if queue.full():
+                # 只关心最新状态，丢弃最旧的事件
+                queue.get_nowait()
+                self.stats["dropped"] += 1
+            queue.put_nowait(event)
+
+    def subscriber_count(self, generation_id: Optional[str] = None) -> int:
+        """获取订阅者数量"""
+        if generation_id is not None:
+            return len(self._subscribers.get(generation_id, ()))
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取广播统计信息"""
+        return {
+            "subscribers": self.subscriber_count(),
+            "watched_generations": len(self._subscribers),
+            **self.stats
+        }
@@ -0,0 +1,123 @@
+"""
+万物可视化 v2.0 - 渲染结果缓存
+按需求指纹缓存配置和HTML：措辞不同但解析出相同结构化需求的请求直接复用渲染结果；
+总字节数有上限，超出时按LRU淘汰，条目超过TTL后失效
+"""
+
+from typing import Dict, Optional, Any, Tuple
+from collections import OrderedDict
+import threading
+import time
+
+
+class RenderCache:
+    """渲染结果缓存 - 字节配额 + TTL过期 + LRU淘汰"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 600.0):
+        """
+        初始化渲染缓存
+
+        Args:
+            max_bytes: 缓存内容总字节数上限（0 表示禁用缓存）
+            ttl: 条目有效期（秒，0 表示不过期）
+        """
+        self.max_bytes = max(0, max_bytes)
+        self.ttl = ttl
+
+        # key -> (过期时刻, 字节数, 值)，最久未访问在前
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evicted_lru": 0,
+            "evicted_ttl": 0,
+            "rejected": 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        查找缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Any: 缓存的值（调用方只读），未命中或已过期时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+
+            expires_at, size, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._bytes -= size
+                self.stats["evicted_ttl"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key: str, value: Any, size: int) -> bool:
+        """
+        写入缓存，超出字节上限时淘汰最久未访问的条目
+
+        Args:
+            key: 缓存键
+            value: 缓存的值
+            size: 值占用的字节数（由调用方估算）
+
+        Returns:
+            bool: 是否已缓存（单个条目超过字节上限时不缓存）
+        """
+        if size > self.max_bytes:
+            self.stats["rejected"] += 1
+            return False
+
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else float("inf")
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+            self.stats["stores"] += 1
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.stats["evicted_lru"] += 1
+        return True
+
+    def clear(self) -> int:
+        """清空缓存，返回清除的条目数"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hit_rate": self.stats["hits"] / max(lookups, 1),
+            **self.stats
+        }
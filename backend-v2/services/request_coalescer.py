@@ -0,0 +1,123 @@
+"""
+万物可视化 v2.0 - 请求合并（single-flight）
+相同的并发请求共享同一次流水线执行，短时间内的重复请求直接复用结果
+"""
+
+from typing import Dict, Optional, Any, Callable, Awaitable, Tuple
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import time
+
+
+def normalize_prompt(prompt: str) -> str:
+    """规范化提示词：去掉首尾空白并合并连续空白（不改变大小写，元素符号等区分大小写）"""
+    return " ".join(prompt.split())
+
+
+def make_request_key(*parts: Any) -> str:
+    """
+    根据请求的各组成部分计算合并键
+
+    Args:
+        *parts: 可JSON化的请求组成部分
+
+    Returns:
+        str: SHA-256 十六进制摘要
+    """
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RequestCoalescer:
+    """请求合并器 - 进行中的相同请求共享一个任务，完成后结果短暂缓存"""
+
+    def __init__(self, result_ttl: float = 5.0, max_results: int = 256):
+        """
+        初始化请求合并器
+
+        Args:
+            result_ttl: 结果缓存时间（秒），0 表示只合并进行中的请求
+            max_results: 结果缓存条目上限
+        """
+        self.result_ttl = result_ttl
+        self.max_results = max(1, max_results)
+
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._results: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+        self.stats = {
+            "executions": 0,
+            "coalesced": 0,
+            "cache_hits": 0
+        }
+
+    async def run(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        should_cache: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        执行请求，相同key的并发请求只执行一次
+
+        Args:
+            key: 合并键（见 make_request_key）
+            factory: 产生实际执行协程的函数
+            should_cache: 判断结果是否可缓存（例如只缓存成功结果）
+
+        Returns:
+            Any: 执行结果（多个调用方共享同一对象，修改前请先复制）
+        """
+        cached = self._get_cached(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["executions"] += 1
+            # 独立任务执行：发起请求的客户端断开时不影响其他等待者
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._on_done(key, done, should_cache))
+
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计信息"""
+        return {
+            "inflight": len(self._inflight),
+            "cached_results": len(self._results),
+            **self.stats
+        }
+
+    def _get_cached(self, key: str) -> Any:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+
+        expires_at, result = entry
+        if time.monotonic() >= expires_at:
+            del self._results[key]
+            return None
+        return result
+
+    def _on_done(self, key: str, task: asyncio.Task, should_cache: Optional[Callable[[Any], bool]]) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+        if task.cancelled() or task.exception() is not None or self.result_ttl <= 0:
+            return
+
+        result = task.result()
+        if should_cache is not None and not should_cache(result):
+            return
+
+        self._results[key] = (time.monotonic() + self.result_ttl, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
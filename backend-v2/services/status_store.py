@@ -0,0 +1,385 @@
+"""
+万物可视化 v2.0 - 生成状态存储
+替代无限增长的 active_generations 字典：紧凑记录 + TTL过期 + 容量上限LRU淘汰
+"""
+
+from typing import Dict, List, Optional, Any, Iterator, Callable, Set, Tuple
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import datetime
+import sys
+import time
+
+# 终态：只有处于终态的记录才允许被淘汰
+TERMINAL_STATUSES = frozenset({"completed", "failed", "cancelled"})
+
+
+class GenerationRecord:
+    """单个生成任务的状态记录"""
+
+    __slots__ = (
+        "generation_id", "status", "progress", "subject", "prompt",
+        "created_at", "started_at", "completed_at", "failed_at",
+        "queue_wait", "write_time", "html_url", "error", "degraded", "request", "finished_monotonic"
+    )
+
+    # 允许通过 update() 修改的字段
+    FIELDS = frozenset(__slots__) - {"generation_id", "finished_monotonic"}
+
+    def __init__(
+        self,
+        generation_id: str,
+        status: str,
+        prompt: str = "",
+        subject: Optional[str] = None,
+        request: Optional[Dict[str, Any]] = None
+    ):
+        self.generation_id = generation_id
+        self.status = status
+        self.progress = 0
+        self.subject = subject
+        self.prompt = prompt
+        self.created_at = datetime.datetime.now()
+        self.started_at: Optional[datetime.datetime] = None
+        self.completed_at: Optional[datetime.datetime] = None
+        self.failed_at: Optional[datetime.datetime] = None
+        self.queue_wait: Optional[float] = None
+        self.write_time: Optional[float] = None
+        self.html_url: Optional[str] = None
+        self.error: Optional[str] = None
+        # 截止时间不足时结果走了降级渲染路径
+        self.degraded = False
+        # 重新提交任务所需的参数（进程重启后恢复用）
+        self.request = request
+        self.finished_monotonic: Optional[float] = None
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def approx_size(self) -> int:
+        """估算记录占用的字节数"""
+        size = sys.getsizeof(self)
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is not None:
+                size += sys.getsizeof(value)
+        return size
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {name: getattr(self, name) for name in self.__slots__ if name not in ("request", "finished_monotonic")}
+
+
+class JobStore(ABC):
+    """生成任务存储接口"""
+
+    @abstractmethod
+    def create(
+        self,
+        generation_id: str,
+        status: str,
+        prompt: str = "",
+        subject: Optional[str] = None,
+        request: Optional[Dict[str, Any]] = None
+    ) -> GenerationRecord:
+        """创建新记录"""
+
+    @abstractmethod
+    def get(self, generation_id: str) -> Optional[GenerationRecord]:
+        """获取本进程中的记录（不访问共享存储，可在事件循环中直接调用）"""
+
+    async def fetch(self, generation_id: str) -> Optional[GenerationRecord]:
+        """
+        获取记录，本进程中没有时查询共享存储（其他worker的任务）
+
+        Args:
+            generation_id: 生成任务ID
+
+        Returns:
+            GenerationRecord: 记录，不存在或已过期时返回None
+        """
+        return self.get(generation_id)
+
+    @abstractmethod
+    def update(self, generation_id: str, **fields) -> Optional[GenerationRecord]:
+        """更新记录字段"""
+
+    @abstractmethod
+    def discard(self, generation_id: str) -> None:
+        """删除记录"""
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计信息"""
+
+    @abstractmethod
+    async def referenced_urls(self) -> Set[str]:
+        """
+        获取未过期任务引用的结果地址（产物清理时不得删除）
+
+        Returns:
+            Set[str]: html_url 集合
+        """
+
+    @abstractmethod
+    async def claim_idempotency_key(self, key: str, fingerprint: str, generation_id: str) -> Optional[Tuple[str, str]]:
+        """
+        占用幂等键
+
+        Args:
+            key: 客户端提供的 Idempotency-Key
+            fingerprint: 请求内容指纹（同一个键只能用于相同的请求）
+            generation_id: 新任务ID
+
+        Returns:
+            Tuple[str, str]: 键已被占用且未过期时返回 (原任务ID, 原请求指纹)，占用成功返回None
+        """
+
+    @abstractmethod
+    async def release_idempotency_key(self, key: str) -> None:
+        """释放幂等键（任务未能提交时调用）"""
+
+    @abstractmethod
+    async def request_cancel(self, generation_id: str) -> None:
+        """请求取消任务（由执行任务的进程在阶段之间检查）"""
+
+    @abstractmethod
+    def is_cancel_requested(self, generation_id: str) -> bool:
+        """任务是否已被请求取消"""
+
+    async def start(self) -> None:
+        """启动后台任务（持久化后端使用）"""
+
+    async def stop(self) -> None:
+        """停止后台任务并落盘"""
+
+    async def recover(self) -> List[GenerationRecord]:
+        """
+        接管上次运行中断的任务
+
+        Returns:
+            List[GenerationRecord]: 需要重新提交的任务记录
+        """
+        return []
+
+
+class GenerationStatusStore(JobStore):
+    """内存生成状态存储 - O(1)查找，终态记录按TTL过期、超出上限时LRU淘汰"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        terminal_ttl: float,
+        sweep_interval: float = 30.0,
+        on_update: Optional[Callable[[GenerationRecord], None]] = None,
+        idempotency_ttl: Optional[float] = None
+    ):
+        """
+        初始化状态存储
+
+        Args:
+            max_entries: 记录数上限，超出后淘汰最久未访问的终态记录
+            terminal_ttl: 终态记录保留时间（秒）
+            sweep_interval: TTL清扫的最小间隔（秒）
+            on_update: 记录更新后的回调，用于推送进度
+            idempotency_ttl: 幂等键有效期（秒），默认与 terminal_ttl 相同
+        """
+        self.max_entries = max(1, max_entries)
+        self.terminal_ttl = terminal_ttl
+        self.sweep_interval = sweep_interval
+        self.on_update = on_update
+        self.idempotency_ttl = terminal_ttl if idempotency_ttl is None else idempotency_ttl
+
+        self._records: Dict[str, GenerationRecord] = {}
+        # 终态记录的LRU顺序（最久未访问在前）
+        self._terminal: "OrderedDict[str, None]" = OrderedDict()
+        # 幂等键 -> (任务ID, 请求指纹, 创建时间)
+        self._idempotency: Dict[str, Tuple[str, str, float]] = {}
+        # 已请求取消的任务（保留到记录删除，排队中已标记取消的任务出队时据此跳过）
+        self._cancel_requested: Set[str] = set()
+        self._last_sweep = time.monotonic()
+
+        self.stats = {
+            "created": 0,
+            "evicted_ttl": 0,
+            "evicted_lru": 0
+        }
+
+    def __contains__(self, generation_id: str) -> bool:
+        return self.get(generation_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._records))
+
+    def create(
+        self,
+        generation_id: str,
+        status: str,
+        prompt: str = "",
+        subject: Optional[str] = None,
+        request: Optional[Dict[str, Any]] = None
+    ) -> GenerationRecord:
+        """
+        创建新记录
+
+        Args:
+            generation_id: 生成任务ID
+            status: 初始状态
+            prompt: 用户输入
+            subject: 学科（可选）
+            request: 重新提交任务所需的参数（可选）
+
+        Returns:
+            GenerationRecord: 新建的记录
+        """
+        record = GenerationRecord(generation_id, status, prompt, subject, request)
+        self._records[generation_id] = record
+        self.stats["created"] += 1
+
+        self._maybe_sweep()
+        self._enforce_capacity()
+        return record
+
+    def get(self, generation_id: str) -> Optional[GenerationRecord]:
+        """获取记录（已过期的终态记录视为不存在）"""
+        record = self._records.get(generation_id)
+        if record is None:
+            return None
+
+        if record.is_terminal:
+            if self._is_expired(record, time.monotonic()):
+                self._remove(generation_id)
+                self.stats["evicted_ttl"] += 1
+                return None
+            self._terminal.move_to_end(generation_id)
+
+        return record
+
+    def update(self, generation_id: str, **fields) -> Optional[GenerationRecord]:
+        """
+        更新记录字段
+
+        Args:
+            generation_id: 生成任务ID
+            **fields: 需要更新的字段
+
+        Returns:
+            GenerationRecord: 更新后的记录，记录不存在时返回None
+        """
+        record = self._records.get(generation_id)
+        if record is None:
+            return None
+
+        unknown = set(fields) - GenerationRecord.FIELDS
+        if unknown:
+            raise ValueError(f"未知的状态字段: {', '.join(sorted(unknown))}")
+
+        was_terminal = record.is_terminal
+        for name, value in fields.items():
+            setattr(record, name, value)
+
+        if record.is_terminal:
+            if not was_terminal:
+                record.finished_monotonic = time.monotonic()
+            self._terminal[generation_id] = None
+            self._terminal.move_to_end(generation_id)
+        elif was_terminal:
+            record.finished_monotonic = None
+            self._terminal.pop(generation_id, None)
+
+        if self.on_update:
+            self.on_update(record)
+
+        return record
+
+    def discard(self, generation_id: str) -> None:
+        """删除记录"""
+        self._remove(generation_id)
+
+    async def claim_idempotency_key(self, key: str, fingerprint: str, generation_id: str) -> Optional[Tuple[str, str]]:
+        """占用幂等键，已被占用且未过期时返回 (原任务ID, 原请求指纹)"""
+        now = time.monotonic()
+        existing = self._idempotency.get(key)
+        if existing is not None and now - existing[2] <= self.idempotency_ttl:
+            return existing[0], existing[1]
+
+        self._idempotency[key] = (generation_id, fingerprint, now)
+        return None
+
+    async def release_idempotency_key(self, key: str) -> None:
+        """释放幂等键"""
+        self._idempotency.pop(key, None)
+
+    async def request_cancel(self, generation_id: str) -> None:
+        """请求取消任务"""
+        if generation_id in self._records:
+            self._cancel_requested.add(generation_id)
+
+    def is_cancel_requested(self, generation_id: str) -> bool:
+        """任务是否已被请求取消"""
+        return generation_id in self._cancel_requested
+
+    def evict_expired(self) -> int:
+        """清除所有超过TTL的终态记录和过期的幂等键"""
+        now = time.monotonic()
+        expired = [
+            generation_id for generation_id in self._terminal
+            if self._is_expired(self._records[generation_id], now)
+        ]
+        for generation_id in expired:
+            self._remove(generation_id)
+
+        for key in [key for key, (_, _, created) in self._idempotency.items() if now - created > self.idempotency_ttl]:
+            del self._idempotency[key]
+
+        self.stats["evicted_ttl"] += len(expired)
+        self._last_sweep = now
+        return len(expired)
+
+    async def referenced_urls(self) -> Set[str]:
+        """获取未过期任务引用的结果地址"""
+        now = time.monotonic()
+        return {
+            record.html_url for record in self._records.values()
+            if record.html_url and not self._is_expired(record, now)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储及内存使用统计"""
+        approx_bytes = sys.getsizeof(self._records) + sys.getsizeof(self._terminal)
+        approx_bytes += sum(record.approx_size() for record in self._records.values())
+
+        return {
+            "entries": len(self._records),
+            "active": len(self._records) - len(self._terminal),
+            "terminal": len(self._terminal),
+            "max_entries": self.max_entries,
+            "terminal_ttl": self.terminal_ttl,
+            "idempotency_keys": len(self._idempotency),
+            "cancel_requested": len(self._cancel_requested),
+            "approx_bytes": approx_bytes,
+            **self.stats
+        }
+
+    def _is_expired(self, record: GenerationRecord, now: float) -> bool:
+        return record.finished_monotonic is not None and now - record.finished_monotonic > self.terminal_ttl
+
+    def _maybe_sweep(self) -> None:
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.evict_expired()
+
+    def _enforce_capacity(self) -> None:
+        """超出上限时淘汰最久未访问的终态记录（进行中的任务不淘汰）"""
+        while len(self._records) > self.max_entries and self._terminal:
+            generation_id = next(iter(self._terminal))
+            self._remove(generation_id)
+            self.stats["evicted_lru"] += 1
+
+    def _remove(self, generation_id: str) -> None:
+        self._records.pop(generation_id, None)
+        self._terminal.pop(generation_id, None)
+        self._cancel_requested.discard(generation_id)
@@ -0,0 +1,191 @@
+"""
+万物可视化 v2.0 - 结构化日志
+JSON格式日志记录，经队列交给后台线程输出，请求处理路径不阻塞在I/O上；
+通过 contextvars 为每个请求/生成任务附加关联ID
+"""
+
+from typing import Dict, Optional, Any
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+import datetime
+import json
+import logging
+import queue
+import sys
+import uuid
+
+# 当前请求/任务的关联ID，asyncio任务创建时自动继承
+_correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+# LogRecord 自带的属性，其余 extra 字段视为结构化字段
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+
+
+def new_correlation_id() -> str:
+    """生成新的关联ID"""
+    return uuid.uuid4().hex
+
+
+def get_correlation_id() -> Optional[str]:
+    """获取当前上下文的关联ID"""
+    return _correlation_id.get()
+
+
+def bind_correlation_id(correlation_id: Optional[str]):
+    """
+    为当前上下文设置关联ID
+
+    Args:
+        correlation_id: 关联ID（请求ID或 generation_id）
+
+    Returns:
+        Token: 用于 reset_correlation_id 恢复之前的值
+    """
+    return _correlation_id.set(correlation_id)
+
+
+def reset_correlation_id(token) -> None:
+    """恢复 bind_correlation_id 之前的关联ID"""
+    _correlation_id.reset(token)
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志记录格式化为单行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        correlation_id = getattr(record, "correlation_id", None)
+        if correlation_id:
+            payload["correlation_id"] = correlation_id
+
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and key != "correlation_id" and not key.startswith("_"):
+                payload[key] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """有界队列处理器 - 队列满时丢弃记录并计数，不阻塞调用方"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 在调用方上下文中附加关联ID；格式化留给后台线程
+        record.correlation_id = _correlation_id.get()
+        if record.exc_info:
+            # traceback对象不跨线程保留，这里先转为文本
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StructuredLogger:
+    """结构化日志接口 - 事件消息 + 关键字字段，未启用的级别直接返回"""
+
+    __slots__ = ("_logger",)
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    def is_enabled(self, level: int) -> bool:
+        """判断级别是否启用（用于跳过构造昂贵的调试字段）"""
+        return self._logger.isEnabledFor(level)
+
+    def debug(self, event: str, **fields) -> None:
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug(event, extra=fields, stacklevel=2)
+
+    def info(self, event: str, **fields) -> None:
+        if self._logger.isEnabledFor(logging.INFO):
+            self._logger.info(event, extra=fields, stacklevel=2)
+
+    def warning(self, event: str, **fields) -> None:
+        if self._logger.isEnabledFor(logging.WARNING):
+            self._logger.warning(event, extra=fields, stacklevel=2)
+
+    def error(self, event: str, exc_info: bool = False, **fields) -> None:
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._logger.error(event, exc_info=exc_info, extra=fields, stacklevel=2)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """获取结构化日志器"""
+    return StructuredLogger(logging.getLogger(name))
+
+
+def configure_logging(level: str = "INFO", log_file: Optional[Path] = None, queue_size: int = 10000) -> None:
+    """
+    配置根日志器：队列处理器 + 后台线程输出JSON（重复调用只生效一次）
+
+    Args:
+        level: 日志级别
+        log_file: 可选的日志文件路径（同时输出到stdout）
+        queue_size: 日志队列上限，超出时丢弃新记录
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    formatter = JsonFormatter()
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    root.addHandler(_queue_handler)
+
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """停止后台输出线程并写出队列中剩余的日志"""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+
+    _listener.stop()
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener = None
+    _queue_handler = None
+
+
+def get_logging_stats() -> Dict[str, Any]:
+    """获取日志队列统计信息"""
+    if _queue_handler is None:
+        return {"configured": False}
+    return {
+        "configured": True,
+        "level": logging.getLevelName(logging.getLogger().level),
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped
+    }
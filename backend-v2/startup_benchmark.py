@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+万物可视化 v2.0 - 冷启动性能测试
+1. 导入耗时分解：以 python -X importtime 导入 main，统计总耗时与最慢的模块
+2. 首次响应耗时：启动 uvicorn 子进程，测量到 /health 首次成功响应、
+   以及首个生成请求（触发Agent创建）完成的时间
+
+可用 --max-import-ms / --max-first-response-ms 设定阈值，超出时以非零状态退出，用于防止启动性能回退。
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).parent
+
+# 冷启动时不应被导入的重依赖（首次使用时才加载）
+DEFERRED_MODULES = ("numpy", "jinja2")
+
+
+def measure_imports(module: str = "main", top: int = 15) -> Dict[str, Any]:
+    """
+    使用 -X importtime 测量导入耗时
+
+    Args:
+        module: 要导入的模块
+        top: 输出最慢模块的数量
+
+    Returns:
+        Dict: 总耗时（毫秒）、按累计耗时排序的最慢模块、被提前导入的重依赖
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "LOG_LEVEL": "WARNING"}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+
+    # 行格式: import time: self [us] | cumulative | imported package
+    rows: List[Tuple[str, int, int]] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # 去掉分隔符后的一个空格，剩余的前导空格表示嵌套深度
+        rows.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+
+    top_level = [row for row in rows if not row[0].startswith(" ")]
+    imported = {name.strip() for name, _, _ in rows}
+    slowest = sorted(rows, key=lambda row: row[2], reverse=True)[:top]
+
+    return {
+        "total_ms": round(sum(cumulative for _, _, cumulative in top_level) / 1000, 1),
+        "module_ms": next((round(c / 1000, 1) for name, _, c in top_level if name == module), None),
+        "modules_imported": len(rows),
+        "slowest": [
+            {"module": name.strip(), "depth": (len(name) - len(name.lstrip())) // 2, "cumulative_ms": round(c / 1000, 1)}
+            for name, _, c in slowest
+        ],
+        "eager_heavy_imports": [name for name in DEFERRED_MODULES if name in imported]
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _request(url: str, payload: Optional[Dict[str, Any]] = None, timeout: float = 30.0) -> int:
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+        return response.status
+
+
+def measure_first_response(startup_timeout: float = 30.0) -> Dict[str, Any]:
+    """
+    启动 uvicorn 子进程并测量首次响应时间
+
+    Args:
+        startup_timeout: 等待服务可用的最长时间（秒）
+
+    Returns:
+        Dict: 首次 /health 响应与首个生成请求的耗时（毫秒）
+    """
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "LOG_LEVEL": "WARNING",
+        "JOB_STORE_BACKEND": "memory"
+    }
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE
+    )
+
+    try:
+        health_ms = None
+        while time.perf_counter() - started < startup_timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"服务启动失败:\n{process.stderr.read().decode('utf-8', 'replace')[-2000:]}")
+            try:
+                if _request(f"{base_url}/health", timeout=1.0) == 200:
+                    health_ms = (time.perf_counter() - started) * 1000
+                    break
+            except OSError:
+                time.sleep(0.02)
+
+        if health_ms is None:
+            raise RuntimeError(f"服务在 {startup_timeout} 秒内未能响应")
+
+        request_started = time.perf_counter()
+        _request(f"{base_url}/api/v2/highschool/generate", {"prompt": "二次函数 y=x^2 的图像", "subject": "mathematics"})
+        first_generate_ms = (time.perf_counter() - request_started) * 1000
+
+        request_started = time.perf_counter()
+        _request(f"{base_url}/api/v2/highschool/generate", {"prompt": "三角函数 y=sin(x) 的图像", "subject": "mathematics"})
+        warm_generate_ms = (time.perf_counter() - request_started) * 1000
+
+        return {
+            "first_response_ms": round(health_ms, 1),
+            "first_generate_ms": round(first_generate_ms, 1),
+            "warm_generate_ms": round(warm_generate_ms, 1)
+        }
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="冷启动性能测试")
+    parser.add_argument("--runs", type=int, default=3, help="导入耗时测量次数（取中位数）")
+    parser.add_argument("--top", type=int, default=15, help="输出最慢模块的数量")
+    parser.add_argument("--skip-server", action="store_true", help="只测量导入耗时")
+    parser.add_argument("--max-import-ms", type=float, help="导入耗时阈值（毫秒）")
+    parser.add_argument("--max-first-response-ms", type=float, help="首次响应耗时阈值（毫秒）")
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果")
+    args = parser.parse_args()
+
+    runs = [measure_imports(top=args.top) for _ in range(max(1, args.runs))]
+    report: Dict[str, Any] = {
+        "import": {**runs[-1], "total_ms": statistics.median(run["total_ms"] for run in runs)}
+    }
+    if not args.skip_server:
+        report["server"] = measure_first_response()
+
+    failures = []
+    if report["import"]["eager_heavy_imports"]:
+        failures.append(f"启动时导入了应延迟加载的模块: {', '.join(report['import']['eager_heavy_imports'])}")
+    if args.max_import_ms is not None and report["import"]["total_ms"] > args.max_import_ms:
+        failures.append(f"导入耗时 {report['import']['total_ms']}ms 超过阈值 {args.max_import_ms}ms")
+    if (
+        args.max_first_response_ms is not None and "server" in report
+        and report["server"]["first_response_ms"] > args.max_first_response_ms
+    ):
+        failures.append(f"首次响应 {report['server']['first_response_ms']}ms 超过阈值 {args.max_first_response_ms}ms")
+    report["failures"] = failures
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print("🚀 冷启动性能测试")
+        print(f"\n📦 导入 main: {report['import']['total_ms']}ms（{report['import']['modules_imported']} 个模块，{args.runs} 次中位数）")
+        for item in report["import"]["slowest"]:
+            print(f"   {item['cumulative_ms']:>8.1f}ms  {'  ' * item['depth']}{item['module']}")
+        if "server" in report:
+            server = report["server"]
+            print(f"\n⏱️  启动到 /health 首次响应: {server['first_response_ms']}ms")
+            print(f"   首个生成请求（含Agent创建）: {server['first_generate_ms']}ms")
+            print(f"   后续生成请求: {server['warm_generate_ms']}ms")
+        for failure in failures:
+            print(f"\n❌ {failure}")
+        if not failures:
+            print("\n✅ 启动性能检查通过")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
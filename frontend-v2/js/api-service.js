@@ -68,7 +68,7 @@ class APIService {
      * 获取可视化结果
      */
     async getVisualization(vizId) {
-        const url = `${this.baseUrl}/visualizations/${vizId}`;
+        const url = `${this.baseUrl}/visualizations/${vizId}.html`;
         return this.getRequest(url, 'text');
     }
 
@@ -224,9 +224,63 @@ class APIService {
     }
 
     /**
-     * 轮询生成状态
+     * 是否支持服务端推送的状态流
+     */
+    supportsStatusStream() {
+        return typeof EventSource !== 'undefined';
+    }
+
+    /**
+     * 通过 SSE 订阅生成状态（服务端推送阶段变化，无需轮询）
+     */
+    streamGenerationStatus(generationId, onUpdate) {
+        const url = `${this.baseUrl}/status/${generationId}/stream`;
+
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(url);
+            let received = false;
+
+            source.addEventListener('status', (event) => {
+                received = true;
+                const status = JSON.parse(event.data);
+
+                if (onUpdate) {
+                    onUpdate(status);
+                }
+
+                if (status.status === 'completed') {
+                    source.close();
+                    resolve(status);
+                } else if (status.status === 'failed') {
+                    source.close();
+                    reject(new Error(status.error || '生成失败'));
+                }
+            });
+
+            source.onerror = () => {
+                source.close();
+                const error = new Error(received ? '状态流中断' : '状态流不可用');
+                error.streamUnavailable = true;
+                reject(error);
+            };
+        });
+    }
+
+    /**
+     * 获取生成状态：优先使用 SSE 推送，不可用时回退到轮询
      */
     async pollGenerationStatus(generationId, onUpdate, maxPolls = 60) {
+        if (this.supportsStatusStream()) {
+            try {
+                return await this.streamGenerationStatus(generationId, onUpdate);
+            } catch (error) {
+                if (!error.streamUnavailable) {
+                    throw error;
+                }
+                console.warn('⚠️ 状态流不可用，回退到轮询:', error.message);
+            }
+        }
+
         let polls = 0;
 
         const poll = async () => {
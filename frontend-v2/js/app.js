@@ -364,6 +364,36 @@ class VisualizationApp {
     }
 
     async pollGenerationStatus(generationId, originalPrompt) {
+        // 优先使用 SSE 推送，不可用时回退到轮询
+        if (window.APIService?.supportsStatusStream()) {
+            try {
+                const status = await window.APIService.streamGenerationStatus(
+                    generationId,
+                    (update) => this.updateProgress(update.progress || 0)
+                );
+
+                if (status.html_url) {
+                    await this.loadVisualizationResult(status.html_url);
+                    this.addToHistory(originalPrompt, {
+                        generation_id: generationId,
+                        html_url: status.html_url
+                    });
+                    this.showMessage('可视化生成成功！', 'success');
+                }
+                this.completeGeneration();
+                return;
+
+            } catch (error) {
+                if (!error.streamUnavailable) {
+                    console.error('❌ 状态推送错误:', error);
+                    this.showMessage(`生成失败: ${error.message}`, 'error');
+                    this.completeGeneration();
+                    return;
+                }
+                console.warn('⚠️ 状态流不可用，回退到轮询:', error.message);
+            }
+        }
+
         const maxAttempts = 60; // 最多轮询60次（约5分钟）
         let attempts = 0;
 
@@ -477,7 +507,9 @@ class VisualizationApp {
             const fullUrl = visualizationUrl.startsWith('http') 
                 ? visualizationUrl 
                 : `${baseUrl}${visualizationUrl}`;
-            const response = await fetch(fullUrl);
+            // 优先请求原始HTML（流式发送、可压缩、可缓存），避免JSON包装
+            const htmlUrl = /\/visualizations\/[^/.]+$/.test(fullUrl) ? `${fullUrl}.html` : fullUrl;
+            const response = await fetch(htmlUrl);
             if (!response.ok) {
                 throw new Error('获取可视化结果失败');
             }